@@ -0,0 +1,265 @@
+"""
+Deterministic local stand-in for the Anthropic client.
+
+Mimics the parts of the SDK the app uses (messages.create,
+messages.stream and messages.batches, plus an async create for the ASGI
+path) with configurable latency,
+throughput and output size, so routes and bulk jobs can be exercised
+and timed without an API key or network.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator
+
+# Paragraphs cycled to build plan text; they cover every rubric criterion
+PLAN_PARAGRAPHS = [
+    "## Warm-up: Tag Rush (10 minutes)\n"
+    "Setup: 20m x 20m grid, cones on each corner. Players work in teams of four.\n"
+    "Coaching points: What space is opening up? How can we move the ball faster?\n"
+    "Safety: Two-handed tag only, check the area is clear of obstacles.\n",
+
+    "## Main Activity: Passing Channels (15 minutes)\n"
+    "Organisation: three channels, 5 metres wide. Duration: 3 rounds of 4 minutes.\n"
+    "Key point: hands up early, step before pass. Question: Why did that gap close?\n"
+    "Challenge: score a point for every completed pass under pressure - make it fun.\n",
+
+    "## Game: Conditioned Touch (15 minutes)\n"
+    "Play 6v6 with a 3-second possession rule. Teams swap roles every 5 minutes.\n"
+    "Teaching point: support lines and communication. Competition: first to five tries.\n"
+    "Controlled contact only; coaches monitor injury risk throughout.\n",
+
+    "## Cool-down (5 minutes)\n"
+    "Light jog and stretches for recovery. Players share one thing they learned.\n"
+    "How did your decisions change during the game? What would you try next time?\n"
+]
+
+
+def make_plan_text(prompt: str, output_tokens: int) -> str:
+    """
+    Build deterministic plan text of roughly output_tokens tokens.
+
+    Args:
+        prompt: Prompt the plan answers (seeds the paragraph order)
+        output_tokens: Target size, at roughly four characters per token
+
+    Returns:
+        Plan text
+    """
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    target_chars = output_tokens * 4
+    parts = []
+    size = 0
+    index = seed
+    while size < target_chars:
+        paragraph = PLAN_PARAGRAPHS[index % len(PLAN_PARAGRAPHS)]
+        parts.append(paragraph)
+        size += len(paragraph)
+        index += 1
+    return '\n'.join(parts)[:target_chars]
+
+
+def _prompt_text(kwargs: Dict) -> str:
+    """Concatenate the system and user text of a messages call."""
+    parts = []
+    system = kwargs.get('system')
+    if isinstance(system, str):
+        parts.append(system)
+    elif isinstance(system, list):
+        parts.extend(block.get('text', '') for block in system)
+    for message in kwargs.get('messages', []):
+        content = message['content']
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content)
+    return '\n'.join(parts)
+
+
+class FakeStream:
+    """Context manager mimicking MessageStream."""
+
+    def __init__(self, messages: 'FakeMessages', kwargs: Dict):
+        self._messages = messages
+        self._kwargs = kwargs
+        self._response = None
+        self._input_tokens = 0
+        self._streamed_chars = 0
+
+    def __enter__(self) -> 'FakeStream':
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        fake = self._messages
+        time.sleep(fake.latency)
+        response = fake._build_response(self._kwargs)
+        self._input_tokens = response.usage.input_tokens
+        text = response.content[0].text
+        chunk_chars = fake.stream_chunk_tokens * 4
+        delay = fake.stream_chunk_tokens / fake.tokens_per_second if fake.tokens_per_second else 0
+        for start in range(0, len(text), chunk_chars):
+            if delay:
+                time.sleep(delay)
+            self._streamed_chars = min(len(text), start + chunk_chars)
+            yield text[start:start + chunk_chars]
+        self._response = response
+
+    @property
+    def current_message_snapshot(self) -> SimpleNamespace:
+        """Message accumulated so far, as after an interrupted stream."""
+        if self._response is not None:
+            return self._response
+        return SimpleNamespace(usage=SimpleNamespace(
+            input_tokens=self._input_tokens,
+            output_tokens=self._streamed_chars // 4,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=0
+        ))
+
+    def get_final_message(self) -> SimpleNamespace:
+        if self._response is None:
+            for _ in self.text_stream:
+                pass
+        return self._response
+
+
+class FakeBatches:
+    """
+    Fake messages.batches resource.
+
+    A batch reports 'in_progress' on its first retrieve() and 'ended'
+    afterwards; results are generated when the batch is created.
+    """
+
+    def __init__(self, messages: 'FakeMessages'):
+        self._messages = messages
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def create(self, requests) -> SimpleNamespace:
+        results = [
+            SimpleNamespace(
+                custom_id=item['custom_id'],
+                result=SimpleNamespace(
+                    type='succeeded',
+                    message=self._messages._build_response(item['params'])
+                )
+            )
+            for item in requests
+        ]
+        with self._lock:
+            batch_id = f'msgbatch_fake_{len(self._batches) + 1}'
+            self._batches[batch_id] = {'results': results, 'polls': 0}
+        return self.retrieve(batch_id)
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        with self._lock:
+            batch = self._batches[batch_id]
+            ended = batch['polls'] > 0
+            batch['polls'] += 1
+            total = len(batch['results'])
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status='ended' if ended else 'in_progress',
+            request_counts=SimpleNamespace(
+                processing=0 if ended else total,
+                succeeded=total if ended else 0,
+                errored=0,
+                canceled=0,
+                expired=0
+            )
+        )
+
+    def results(self, batch_id: str) -> Iterator[SimpleNamespace]:
+        return iter(self._batches[batch_id]['results'])
+
+
+class FakeMessages:
+    """Fake messages resource with create(), stream() and batches."""
+
+    def __init__(self, latency: float, tokens_per_second: float, output_tokens: int,
+                 stream_chunk_tokens: int):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.stream_chunk_tokens = stream_chunk_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.batches = FakeBatches(self)
+
+    def _build_response(self, kwargs: Dict) -> SimpleNamespace:
+        with self._lock:
+            self.calls += 1
+        prompt = _prompt_text(kwargs)
+        # A trailing assistant message is a prefill being continued:
+        # only the rest of the plan is still to come
+        messages = kwargs.get('messages', [])
+        prefill = messages[-1]['content'] if messages and messages[-1]['role'] == 'assistant' else ''
+        wanted = max(1, self.output_tokens - len(prefill) // 4)
+        output_tokens = min(wanted, kwargs.get('max_tokens', wanted))
+        text = make_plan_text(prompt, output_tokens)
+        return SimpleNamespace(
+            model=kwargs.get('model'),
+            content=[SimpleNamespace(type='text', text=text)],
+            stop_reason='max_tokens' if output_tokens < wanted else 'end_turn',
+            usage=SimpleNamespace(
+                input_tokens=len(prompt) // 4,
+                output_tokens=output_tokens,
+                cache_creation_input_tokens=0,
+                cache_read_input_tokens=0
+            )
+        )
+
+    def create(self, **kwargs) -> SimpleNamespace:
+        response = self._build_response(kwargs)
+        generation_time = (response.usage.output_tokens / self.tokens_per_second
+                           if self.tokens_per_second else 0)
+        time.sleep(self.latency + generation_time)
+        return response
+
+    def stream(self, **kwargs) -> FakeStream:
+        return FakeStream(self, kwargs)
+
+
+class FakeAnthropic:
+    """
+    Drop-in replacement for anthropic.Anthropic in benchmarks.
+
+    Args:
+        latency: Seconds before the first token
+        tokens_per_second: Output throughput (0 for instant generation)
+        output_tokens: Tokens in a complete plan, capped by max_tokens (a
+            call continuing an assistant prefill produces the remainder)
+        stream_chunk_tokens: Tokens per streamed text delta
+    """
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 0,
+                 output_tokens: int = 800, stream_chunk_tokens: int = 8):
+        self.messages = FakeMessages(latency, tokens_per_second, output_tokens, stream_chunk_tokens)
+
+
+class AsyncFakeMessages(FakeMessages):
+    """Fake async messages resource: create() is a coroutine."""
+
+    async def create(self, **kwargs) -> SimpleNamespace:
+        response = self._build_response(kwargs)
+        generation_time = (response.usage.output_tokens / self.tokens_per_second
+                           if self.tokens_per_second else 0)
+        await asyncio.sleep(self.latency + generation_time)
+        return response
+
+
+class AsyncFakeAnthropic:
+    """Drop-in replacement for anthropic.AsyncAnthropic (same arguments as FakeAnthropic)."""
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 0,
+                 output_tokens: int = 800, stream_chunk_tokens: int = 8):
+        self.messages = AsyncFakeMessages(latency, tokens_per_second, output_tokens,
+                                          stream_chunk_tokens)
@@ -0,0 +1,375 @@
+"""
+Offline performance benchmarks for the session plan app.
+
+Swaps the app's client for FakeAnthropic, drives the Flask routes with
+concurrent requests, times score_plan on synthetic plans of 1 KB to 1 MB,
+times cold imports of the app and the scoring CLIs in fresh interpreters,
+and compares the results with a stored baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                  # run and compare
+    python benchmarks/run_benchmarks.py --save-baseline  # record new baseline
+    python benchmarks/run_benchmarks.py --only scoring --tolerance 0.5
+    python benchmarks/run_benchmarks.py --only startup --startup-budget-scale 2
+
+Exits with status 1 if any benchmark regresses beyond the tolerance
+(p95 latency up, or throughput down, by more than that fraction), or if
+a cold import's median exceeds its budget in STARTUP_TARGETS. A startup
+benchmark fails outright if the import loads a module it must not (the
+scoring CLIs must not load Flask or the Anthropic SDK, and the app must
+not load the SDK until a client is needed). Timings are machine
+specific: record the baseline on the machine that runs the comparison.
+Each result records the run parameters that shape it (requests,
+concurrency and fake API settings for routes, interpreter runs for
+startup); a result whose parameters differ from its baseline entry is
+reported as not comparable instead of being compared.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# Configure the app for offline runs before it is imported
+os.environ.setdefault('ANTHROPIC_API_KEY', 'offline-benchmark')
+os.environ.setdefault('PLAN_CACHE_ENABLED', 'false')
+os.environ.setdefault('DEBATE_DB', '')
+
+from fake_anthropic import FakeAnthropic, make_plan_text  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+SCORING_SIZES = [('1KB', 1024), ('10KB', 10 * 1024), ('100KB', 100 * 1024), ('1MB', 1024 * 1024)]
+
+# Cold-start checks: (name, statement timed in a fresh interpreter,
+# modules it must not load, budget for the median in ms)
+NO_WEB_STACK = ('flask', 'anthropic')
+STARTUP_TARGETS = [
+    ('scoring', 'import scoring', NO_WEB_STACK, 150),
+    ('batch_scoring', 'import batch_scoring', NO_WEB_STACK, 250),
+    ('rubric_sweep', 'import rubric_sweep', NO_WEB_STACK, 500),
+    ('plan_library', 'import plan_library', NO_WEB_STACK, 250),
+    ('season_batch', 'import season_batch', NO_WEB_STACK, 250),
+    ('app', 'import app', ('anthropic',), 1000),
+    ('create_app', 'import app; app.create_app(preload_client=False)', ('anthropic',), 1500),
+]
+
+STARTUP_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {forbidden!r} if name in sys.modules]}}))
+"""
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 of a list of samples."""
+    ordered = sorted(samples)
+    result = {}
+    for point in (50, 95, 99):
+        rank = max(0, min(len(ordered) - 1, -(-point * len(ordered) // 100) - 1))
+        result[f'p{point}'] = ordered[rank]
+    return result
+
+
+def summarise(latencies: List[float], wall_time: float, peak_bytes: int) -> Dict:
+    """Build a result row from per-operation latencies in seconds."""
+    stats = {key: round(value * 1000, 3) for key, value in percentiles(latencies).items()}
+    return {
+        'p50_ms': stats['p50'],
+        'p95_ms': stats['p95'],
+        'p99_ms': stats['p99'],
+        'ops_per_sec': round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        'peak_mem_mb': round(peak_bytes / (1024 * 1024), 3),
+        'samples': len(latencies)
+    }
+
+
+def measure_peak_memory(operation: Callable[[], None]) -> int:
+    """Peak bytes allocated by Python while running one operation."""
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_route(flask_app, method: str, path: str, requests: int, concurrency: int) -> Dict:
+    """
+    Time concurrent requests against one route.
+
+    Each request uses a distinct objective so caches and coalescing do not
+    short-circuit the generation path.
+    """
+    local = threading.local()
+
+    def form(index: int) -> Dict:
+        return {
+            'age_group': 'U10',
+            'objective': f'Improve passing under pressure #{index}',
+            'duration': '60',
+            'players': '16'
+        }
+
+    def send(index: int) -> float:
+        if not hasattr(local, 'client'):
+            local.client = flask_app.test_client()
+        start = time.perf_counter()
+        if method == 'POST':
+            response = local.client.post(path, data=form(index))
+        else:
+            response = local.client.get(path, query_string=form(index))
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} returned {response.status_code}')
+        return elapsed
+
+    peak = measure_peak_memory(lambda: send(-1))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(send, range(requests)))
+    wall_time = time.perf_counter() - start
+
+    return summarise(latencies, wall_time, peak)
+
+
+def bench_scoring(size: int) -> Dict:
+    """Time score_plan on a synthetic plan of the given size in bytes."""
+    from scoring import score_plan
+
+    text = make_plan_text(f'synthetic-{size}', size // 4)
+    iterations = max(5, min(500, (20 * 1024 * 1024) // size))
+
+    peak = measure_peak_memory(lambda: score_plan(text))
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        score_plan(text)
+        latencies.append(time.perf_counter() - t0)
+    wall_time = time.perf_counter() - start
+
+    return summarise(latencies, wall_time, peak)
+
+
+def bench_startup(statement: str, forbidden: tuple, runs: int) -> Dict:
+    """
+    Time a statement (an import) in fresh interpreters.
+
+    Raises:
+        RuntimeError: If the statement fails or loads a forbidden module
+    """
+    script = STARTUP_SCRIPT.format(src=SRC_DIR, statement=statement, forbidden=tuple(forbidden))
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                   env=os.environ.copy())
+        if completed.returncode != 0:
+            raise RuntimeError(f'{statement!r} failed: {completed.stderr.strip()[-500:]}')
+        outcome = json.loads(completed.stdout.strip().splitlines()[-1])
+        if outcome['loaded']:
+            raise RuntimeError(f"{statement!r} loaded {', '.join(outcome['loaded'])}")
+        latencies.append(outcome['seconds'])
+    wall_time = time.perf_counter() - start
+    return summarise(latencies, wall_time, 0)
+
+
+def check_startup_budgets(results: Dict[str, Dict], scale: float) -> List[str]:
+    """
+    Compare startup medians with their STARTUP_TARGETS budgets.
+
+    Returns:
+        List of budget violations (empty if none)
+    """
+    violations = []
+    for name, _, _, budget_ms in STARTUP_TARGETS:
+        row = results.get(f'startup:{name}')
+        if row is not None and row['p50_ms'] > budget_ms * scale:
+            violations.append(f"startup:{name}: median {row['p50_ms']} ms over budget {budget_ms * scale:g} ms")
+    return violations
+
+
+def run_parameters(args, group: str) -> Dict:
+    """Settings that shape a benchmark group's numbers; results are only comparable when they match."""
+    if group == 'routes':
+        return {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'latency': args.latency,
+            'tokens_per_second': args.tokens_per_second,
+            'output_tokens': args.output_tokens
+        }
+    if group == 'startup':
+        return {'startup_runs': args.startup_runs}
+    return {}
+
+
+def run(args) -> Dict[str, Dict]:
+    """Run the selected benchmark groups and return results by name, each with its run parameters."""
+    results = {}
+
+    if args.only in (None, 'routes'):
+        import app as app_module
+        from llm_client import create_llm_client_from_env
+
+        # Wrap the fake like the real client so limiter/breaker overhead is measured
+        app_module.set_client(create_llm_client_from_env(FakeAnthropic(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            output_tokens=args.output_tokens
+        )))
+        flask_app = app_module.create_app(preload_client=False)
+        # Per-request INFO logging would dominate the output
+        logging.getLogger().setLevel(logging.WARNING)
+        routes = [
+            ('generate', 'POST', '/generate'),
+            ('generate_dual', 'POST', '/generate-dual'),
+            ('generate_dual_stream', 'GET', '/generate-dual/stream')
+        ]
+        for name, method, path in routes:
+            results[f'route:{name}'] = dict(bench_route(
+                flask_app, method, path, args.requests, args.concurrency
+            ), params=run_parameters(args, 'routes'))
+
+    if args.only in (None, 'scoring'):
+        for label, size in SCORING_SIZES:
+            results[f'score_plan:{label}'] = dict(bench_scoring(size), params=run_parameters(args, 'scoring'))
+
+    if args.only in (None, 'startup'):
+        for name, statement, forbidden, _ in STARTUP_TARGETS:
+            results[f'startup:{name}'] = dict(bench_startup(statement, forbidden, args.startup_runs),
+                                              params=run_parameters(args, 'startup'))
+
+    return results
+
+
+def comparable(current: Dict, previous: Dict) -> bool:
+    """Whether a result and its baseline entry were produced with the same run parameters."""
+    return previous.get('params') == current.get('params')
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            tolerance: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare results with a baseline.
+
+    Results whose run parameters differ from the baseline entry (or whose
+    baseline entry predates recorded parameters) are not compared.
+
+    Returns:
+        Tuple of (regression descriptions, parameter mismatch descriptions)
+    """
+    regressions = []
+    mismatches = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if not comparable(current, previous):
+            mismatches.append(f"{name}: run with {current.get('params')}, "
+                              f"baseline recorded with {previous.get('params', 'unknown parameters')}")
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']} ms vs baseline {previous['p95_ms']} ms"
+            )
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['ops_per_sec']} ops/s vs baseline {previous['ops_per_sec']} ops/s"
+            )
+    return regressions, mismatches
+
+
+def print_table(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    """Print results, with the baseline p95 alongside where available and comparable."""
+    header = f"{'benchmark':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak MB':>10}{'base p95':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, row in results.items():
+        previous = baseline.get(name)
+        base = previous['p95_ms'] if previous is not None and comparable(row, previous) else '-'
+        print(f"{name:<28}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+              f"{row['ops_per_sec']:>10}{row['peak_mem_mb']:>10}{base:>10}")
+
+
+def main(argv=None) -> int:
+    """Command-line entry point. Returns a process exit code."""
+    parser = argparse.ArgumentParser(description='Run offline performance benchmarks.')
+    parser.add_argument('--only', choices=['routes', 'scoring', 'startup'], help='Run one benchmark group')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per route (default: 40)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Fake API time to first token in seconds (default: 0.05)')
+    parser.add_argument('--tokens-per-second', type=float, default=2000,
+                        help='Fake API output throughput (default: 2000)')
+    parser.add_argument('--output-tokens', type=int, default=800,
+                        help='Fake API tokens per response (default: 800)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON path')
+    parser.add_argument('--save-baseline', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional regression before failing (default: 0.25)')
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help='Fresh interpreters per startup benchmark (default: 5)')
+    parser.add_argument('--startup-budget-scale', type=float, default=1.0,
+                        help='Multiplier on the startup budgets, for slower machines (default: 1.0)')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    over_budget = check_startup_budgets(results, args.startup_budget_scale)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        if over_budget:
+            print('\nOver startup budget:')
+            for violation in over_budget:
+                print(f'  - {violation}')
+            return 1
+        return 0
+
+    regressions, mismatches = compare(results, baseline, args.tolerance)
+    regressions += over_budget
+    if mismatches:
+        print('\nNot compared (run parameters differ from the baseline; re-record it with --save-baseline):')
+        for mismatch in mismatches:
+            print(f'  - {mismatch}')
+    if regressions:
+        print('\nRegressions beyond tolerance:')
+        for regression in regressions:
+            print(f'  - {regression}')
+        return 1
+
+    print('\nNo regressions.' if baseline else '\nNo baseline found; run with --save-baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,563 @@
+"""
+Per-club admission control for generation requests.
+
+Without it every request is served in arrival order, so one club
+bulk-generating a season fills the coach workers and spends the account
+rate limit while everyone else waits. FairScheduler sits in front of the
+generation calls and decides, per club (tenant):
+
+- Budgets: each club has its own requests-per-minute and tokens-per-minute
+  buckets. An interactive request that would overdraw them is rejected at
+  once with the seconds until it would fit; background work waits instead.
+- Fair queuing: at most `capacity` coach calls run at a time (a dual
+  request takes two slots, a tournament one per entrant). Waiting requests
+  are ordered by weighted fair queuing (WFQ): each gets a virtual finish
+  tag of its club's previous tag plus cost / weight, so a club's share of
+  the slots follows its weight and its requests' token cost, however many
+  requests it has queued.
+- Priority: interactive requests (someone waiting on a page) are
+  dispatched before bulk ones (jobs, tournaments), and bulk traffic may
+  hold at most `bulk_share` of the slots, so interactive latency stays
+  flat while a bulk run is in progress.
+- Load shedding: when a queue is full, or an interactive request has
+  waited `max_wait` seconds, it is rejected with AdmissionRejected carrying
+  a retry hint, which the routes turn into HTTP 429 with Retry-After.
+
+Each admission is charged its estimated tokens up front; settle() corrects
+the club's token bucket once actual usage is known (cached plans cost
+nothing).
+
+Club ids come from the caller and are not authenticated, so only clubs
+configured with a weight (ADMISSION_CLUB_WEIGHTS) are honoured; any other
+id counts as the shared public club (see normalize_tenant()). Otherwise a
+caller could rotate ids for fresh budgets, or push idle clubs out of the
+tracked set and reset their budgets.
+
+admit() blocks a thread (the Flask app); admit_async() awaits on an event
+loop (the ASGI app). Both share one scheduler.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from typing import Container, Dict, List, Optional
+
+from llm_client import TokenBucket
+
+PRIORITIES = ('interactive', 'bulk')
+
+# Tenant for requests that do not name a configured club
+DEFAULT_TENANT = 'public'
+
+_TENANT_ID = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+# Clubs tracked before idle ones are forgotten
+MAX_TENANTS = 1000
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted.
+
+    Attributes:
+        reason: 'budget', 'queue_full' or 'timeout'
+        retry_after: Whole seconds after which a retry may succeed (at least 1)
+    """
+
+    def __init__(self, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+def normalize_tenant(value: Optional[str], clubs: Container[str]) -> str:
+    """
+    The club a header or form field names, if it is a configured club.
+
+    Args:
+        value: Caller-supplied club id
+        clubs: Configured club ids (FairScheduler.weights)
+
+    Returns:
+        value, or DEFAULT_TENANT if it is missing or not configured
+    """
+    value = (value or '').strip()
+    return value if value in clubs else DEFAULT_TENANT
+
+
+class _Tenant:
+    """Budgets, weight and fair-queuing position of one club."""
+
+    __slots__ = ('weight', 'requests', 'tokens', 'finish', 'active', 'queued', 'admitted', 'rejected',
+                 'last_seen')
+
+    def __init__(self, weight: float, requests_per_minute: float, tokens_per_minute: float):
+        self.weight = weight
+        # A weight-2 club gets twice the budget as well as twice the share
+        self.requests = TokenBucket(requests_per_minute * weight)
+        self.tokens = TokenBucket(tokens_per_minute * weight)
+        # Virtual finish tag of the club's last queued request, per priority
+        self.finish = {priority: 0.0 for priority in PRIORITIES}
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.last_seen = time.monotonic()
+
+    def refund(self, cost: int) -> None:
+        """Give back a request's charge (reserve() caps amounts at capacity)."""
+        self.requests.refund(1)
+        self.tokens.refund(min(cost, self.tokens.capacity))
+
+
+class _Waiter:
+    """A queued request; _dispatch() sets granted and calls notify()."""
+
+    __slots__ = ('tenant', 'priority', 'slots', 'granted', 'cancelled', 'notify')
+
+    def __init__(self, tenant: str, priority: str, slots: int, notify):
+        self.tenant = tenant
+        self.priority = priority
+        self.slots = slots
+        self.granted = False
+        self.cancelled = False
+        self.notify = notify
+
+
+class Admission:
+    """
+    Slots granted to one request. Release them (or leave the with-block)
+    when the generation ends; settle() the token charge once usage is known.
+    """
+
+    def __init__(self, scheduler: 'FairScheduler', tenant: str, priority: str, slots: int,
+                 cost: int, waited: float):
+        self.scheduler = scheduler
+        self.tenant = tenant
+        self.priority = priority
+        self.slots = slots
+        self.cost = cost
+        self.waited = waited
+        self.started = time.monotonic()
+        self._released = False
+        self._settled = False
+
+    def settle(self, actual_tokens: int) -> None:
+        """Replace the estimated token charge with the tokens actually used (once)."""
+        if not self._settled:
+            self._settled = True
+            self.scheduler._settle(self.tenant, self.cost, actual_tokens)
+
+    def release(self) -> None:
+        """Free the slots (idempotent)."""
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self.tenant, self.priority, self.slots,
+                                    time.monotonic() - self.started)
+
+    def __enter__(self) -> 'Admission':
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.release()
+        return False
+
+
+class FairScheduler:
+    """
+    Weighted fair queuing of coach calls across clubs, with budgets and priorities.
+
+    Args:
+        capacity: Coach calls admitted at once (normally the coach worker count)
+        bulk_share: Largest fraction of capacity bulk requests may hold
+            (at least one slot)
+        max_queue: Requests waiting per priority before new ones are rejected
+        tenant_max_queue: Requests one club may have waiting
+        max_wait: Seconds an interactive request waits for slots before it
+            is rejected (unbounded admissions wait as long as it takes)
+        requests_per_minute: Per-club request budget (0 = unlimited)
+        tokens_per_minute: Per-club token budget (0 = unlimited)
+        weights: Club id -> weight (default 1); also the clubs callers may
+            name (see normalize_tenant())
+    """
+
+    # Starting estimate of how long a request holds its slots, for Retry-After
+    INITIAL_HOLD_SECONDS = 10.0
+
+    def __init__(self, capacity: int = 8, bulk_share: float = 0.5, max_queue: int = 100,
+                 tenant_max_queue: int = 20, max_wait: float = 30.0, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0, weights: Optional[Dict[str, float]] = None):
+        self.capacity = max(1, capacity)
+        self.bulk_limit = max(1, int(self.capacity * bulk_share))
+        self.max_queue = max_queue
+        self.tenant_max_queue = tenant_max_queue
+        self.max_wait = max_wait
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.weights = dict(weights or {})
+        self._tenants: Dict[str, _Tenant] = {}
+        # Per priority: heap of (finish tag, sequence, waiter), waiter count,
+        # virtual time (tag of the last dispatched waiter) and slots in use
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._active = {priority: 0 for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._hold_seconds = self.INITIAL_HOLD_SECONDS
+        self._lock = threading.Lock()
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = {'budget': 0, 'queue_full': 0, 'timeout': 0}
+
+    def _slot_limit(self, priority: str) -> int:
+        return self.capacity if priority == 'interactive' else self.bulk_limit
+
+    def _tenant(self, tenant: str) -> _Tenant:
+        """The club's state, created on first sight. Caller holds the lock."""
+        state = self._tenants.get(tenant)
+        if state is None:
+            if len(self._tenants) >= MAX_TENANTS:
+                self._prune()
+            state = self._tenants[tenant] = _Tenant(self.weights.get(tenant, 1.0),
+                                                    self.requests_per_minute, self.tokens_per_minute)
+        state.last_seen = time.monotonic()
+        return state
+
+    def _prune(self) -> None:
+        """Forget the older half of the clubs with nothing running or queued. Caller holds the lock."""
+        idle = sorted((state.last_seen, tenant) for tenant, state in self._tenants.items()
+                      if not state.active and not state.queued)
+        for _, tenant in idle[:max(1, len(idle) // 2)]:
+            del self._tenants[tenant]
+
+    def _reject(self, state: _Tenant, reason: str, retry_after: float, message: str) -> AdmissionRejected:
+        """Count a rejection and build its exception. Caller holds the lock."""
+        state.rejected += 1
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, retry_after, message)
+
+    def _queue_wait(self, priority: str) -> float:
+        """Rough seconds until a newly queued request would start. Caller holds the lock."""
+        ahead = self._queued['interactive'] + (self._queued['bulk'] if priority == 'bulk' else 0)
+        return (ahead + 1) / self._slot_limit(priority) * self._hold_seconds
+
+    def _fits(self, priority: str, slots: int) -> bool:
+        """Whether slots could start now without passing a queued request. Caller holds the lock."""
+        if self._active['interactive'] + self._active['bulk'] + slots > self.capacity:
+            return False
+        if priority == 'bulk':
+            return (not self._queued['interactive'] and not self._queued['bulk']
+                    and self._active['bulk'] + slots <= self.bulk_limit)
+        return not self._queued['interactive']
+
+    def _charge(self, tenant: str, state: _Tenant, priority: str, slots: int, cost: int,
+                bounded: bool) -> float:
+        """
+        Take one request and cost tokens from the club's budgets, and check
+        there is queue room. Caller holds the lock.
+
+        Returns:
+            Seconds an unbounded admission must wait for its budget (0 if none)
+
+        Raises:
+            AdmissionRejected: If a bounded admission is over budget, or the
+                queues are full
+        """
+        delay = max(state.requests.reserve(1), state.tokens.reserve(cost))
+        if delay > 0 and bounded:
+            state.refund(cost)
+            raise self._reject(state, 'budget', delay,
+                               f'Club {tenant} is over its generation budget; retry in {math.ceil(delay)}s')
+        if self._fits(priority, slots) and not delay:
+            return 0.0
+        if self._queued[priority] >= self.max_queue or state.queued >= self.tenant_max_queue:
+            state.refund(cost)
+            scope = 'Club' if state.queued >= self.tenant_max_queue else 'Server'
+            raise self._reject(state, 'queue_full', self._queue_wait(priority),
+                               f'{scope} generation queue is full; please retry shortly')
+        return delay
+
+    def _enqueue(self, tenant: str, state: _Tenant, priority: str, slots: int, cost: int,
+                 notify) -> _Waiter:
+        """Queue a request under its WFQ finish tag, then dispatch. Caller holds the lock."""
+        waiter = _Waiter(tenant, priority, slots, notify)
+        start = max(self._virtual_time[priority], state.finish[priority])
+        tag = start + max(1, cost) / state.weight
+        state.finish[priority] = tag
+        state.queued += 1
+        self._queued[priority] += 1
+        heapq.heappush(self._queues[priority], (tag, next(self._sequence), waiter))
+        self._dispatch()
+        return waiter
+
+    def _head(self, priority: str) -> Optional[_Waiter]:
+        """First live waiter of a priority, dropping withdrawn ones. Caller holds the lock."""
+        queue = self._queues[priority]
+        while queue and queue[0][2].cancelled:
+            heapq.heappop(queue)
+        return queue[0][2] if queue else None
+
+    def _dispatch(self) -> None:
+        """
+        Grant slots to queue heads: interactive first, bulk within its share.
+        A head that does not fit blocks its queue, so wide requests are not
+        starved by narrow ones. Caller holds the lock.
+        """
+        while True:
+            free = self.capacity - self._active['interactive'] - self._active['bulk']
+            waiter = self._head('interactive')
+            if waiter is None:
+                waiter = self._head('bulk')
+                if waiter is not None and self._active['bulk'] + waiter.slots > self.bulk_limit:
+                    return
+            if waiter is None or waiter.slots > free:
+                return
+            tag, _, _ = heapq.heappop(self._queues[waiter.priority])
+            self._virtual_time[waiter.priority] = tag
+            self._queued[waiter.priority] -= 1
+            state = self._tenants[waiter.tenant]
+            state.queued -= 1
+            self._start(state, waiter.priority, waiter.slots)
+            waiter.granted = True
+            waiter.notify()
+
+    def _start(self, state: _Tenant, priority: str, slots: int) -> None:
+        """Count a request as running. Caller holds the lock."""
+        self._active[priority] += slots
+        state.active += 1
+        state.admitted += 1
+        self.admitted[priority] += 1
+
+    def _withdraw(self, waiter: _Waiter, cost: int) -> bool:
+        """
+        Stop waiting: the waiter is dropped lazily and its charge refunded.
+        Caller holds the lock.
+
+        Returns:
+            True if the waiter had already been granted (it then holds its slots)
+        """
+        if waiter.granted:
+            return True
+        waiter.cancelled = True
+        self._queued[waiter.priority] -= 1
+        state = self._tenants[waiter.tenant]
+        state.queued -= 1
+        state.refund(cost)
+        # A withdrawn head may have been blocking narrower requests
+        self._dispatch()
+        return False
+
+    def _timed_out(self, waiter: _Waiter, cost: int) -> Optional[AdmissionRejected]:
+        """Withdraw after max_wait: the rejection, or None if granted meanwhile."""
+        with self._lock:
+            if self._withdraw(waiter, cost):
+                return None
+            return self._reject(self._tenants[waiter.tenant], 'timeout', self._queue_wait(waiter.priority),
+                                'Server busy: timed out waiting for a generation slot')
+
+    def _begin(self, tenant: str, priority: str, slots: int, cost: int, bounded: bool):
+        """Validate and charge a request. Returns (slots, budget delay)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority {priority!r}')
+        slots = max(1, min(slots, self._slot_limit(priority)))
+        with self._lock:
+            delay = self._charge(tenant, self._tenant(tenant), priority, slots, cost, bounded)
+        return slots, delay
+
+    def admit(self, tenant: str, priority: str = 'interactive', cost: int = 0, slots: int = 1,
+              bounded: bool = True) -> Admission:
+        """
+        Wait for slots for one request.
+
+        Args:
+            tenant: Club id (see normalize_tenant())
+            priority: 'interactive' or 'bulk'
+            cost: Estimated tokens (prompts plus output budgets)
+            slots: Coach calls the request runs at once (capped at what its
+                priority may hold)
+            bounded: False waits for budget and slots as long as it takes,
+                for background work with nobody waiting on it
+
+        Returns:
+            Admission; release it when the generation ends
+
+        Raises:
+            AdmissionRejected: Over budget, queue full, or waited max_wait seconds
+        """
+        started = time.monotonic()
+        slots, delay = self._begin(tenant, priority, slots, cost, bounded)
+        if delay:
+            time.sleep(delay)
+        event = threading.Event()
+        with self._lock:
+            waiter = self._enqueue(tenant, self._tenant(tenant), priority, slots, cost, event.set)
+        if not event.wait(self.max_wait if bounded else None):
+            rejection = self._timed_out(waiter, cost)
+            if rejection is not None:
+                raise rejection
+        return Admission(self, tenant, priority, slots, cost, time.monotonic() - started)
+
+    async def admit_async(self, tenant: str, priority: str = 'interactive', cost: int = 0,
+                          slots: int = 1, bounded: bool = True) -> Admission:
+        """admit() for coroutines: waits on the event loop instead of blocking a thread."""
+        started = time.monotonic()
+        slots, delay = self._begin(tenant, priority, slots, cost, bounded)
+        if delay:
+            await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        with self._lock:
+            waiter = self._enqueue(tenant, self._tenant(tenant), priority, slots, cost, notify)
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.max_wait if bounded else None)
+        except asyncio.TimeoutError:
+            rejection = self._timed_out(waiter, cost)
+            if rejection is not None:
+                raise rejection
+        except asyncio.CancelledError:
+            with self._lock:
+                granted_meanwhile = self._withdraw(waiter, cost)
+            if granted_meanwhile:
+                self._release(tenant, priority, slots, 0.0)
+            raise
+        return Admission(self, tenant, priority, slots, cost, time.monotonic() - started)
+
+    def check(self, tenant: str, cost: int = 0) -> None:
+        """
+        Reject now if the club's budgets or queue could not take a request,
+        without charging it (for work admitted later, like queued jobs).
+
+        Raises:
+            AdmissionRejected: Over budget or club queue full
+        """
+        with self._lock:
+            state = self._tenant(tenant)
+            waits = [(min(amount, bucket.capacity) - bucket.available()) * 60.0 / bucket.rate_per_minute
+                     for bucket, amount in ((state.requests, 1), (state.tokens, cost))
+                     if bucket.rate_per_minute]
+            delay = max(waits, default=0.0)
+            if delay > 0:
+                raise self._reject(state, 'budget', delay,
+                                   f'Club {tenant} is over its generation budget; retry in {math.ceil(delay)}s')
+            if state.queued >= self.tenant_max_queue:
+                raise self._reject(state, 'queue_full', self._queue_wait('bulk'),
+                                   'Club generation queue is full; please retry shortly')
+
+    def _release(self, tenant: str, priority: str, slots: int, held: float) -> None:
+        with self._lock:
+            self._active[priority] -= slots
+            state = self._tenants.get(tenant)
+            if state is not None:
+                state.active -= 1
+            # Moving average of how long requests hold slots, for Retry-After
+            self._hold_seconds += 0.1 * (held - self._hold_seconds)
+            self._dispatch()
+
+    def _settle(self, tenant: str, estimated: int, actual: int) -> None:
+        with self._lock:
+            state = self._tenants.get(tenant)
+        if state is None:
+            return
+        difference = min(estimated, state.tokens.capacity) - actual
+        if difference > 0:
+            state.tokens.refund(difference)
+        elif difference < 0:
+            state.tokens.reserve(-difference)
+
+    def queued(self) -> Dict[str, int]:
+        """Waiting requests per priority."""
+        with self._lock:
+            return dict(self._queued)
+
+    def stats(self) -> Dict:
+        """Slots, queues, decisions and the busiest clubs, for the health endpoint."""
+        with self._lock:
+            busiest = sorted(self._tenants.items(),
+                             key=lambda item: (item[1].active + item[1].queued, item[1].admitted),
+                             reverse=True)[:20]
+            return {
+                'capacity': self.capacity,
+                'bulk_limit': self.bulk_limit,
+                'active_slots': dict(self._active),
+                'queued': dict(self._queued),
+                'admitted': dict(self.admitted),
+                'rejected': dict(self.rejected),
+                'hold_seconds': round(self._hold_seconds, 2),
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'tenants': len(self._tenants),
+                'clubs': {
+                    tenant: {
+                        'weight': state.weight,
+                        'active': state.active,
+                        'queued': state.queued,
+                        'admitted': state.admitted,
+                        'rejected': state.rejected,
+                        'tokens_available': (round(state.tokens.available())
+                                             if state.tokens.rate_per_minute else None)
+                    }
+                    for tenant, state in busiest
+                }
+            }
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    Parse 'club-a:2,club-b:0.5' into a weight mapping.
+
+    Raises:
+        ValueError: If an entry is malformed or a weight is not positive
+    """
+    weights = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        tenant, sep, weight = item.rpartition(':')
+        if not sep or not _TENANT_ID.match(tenant.strip()) or float(weight) <= 0:
+            raise ValueError(f'Invalid club weight {item!r}; expected club:weight')
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+
+def create_scheduler_from_env(default_capacity: int) -> Optional[FairScheduler]:
+    """
+    Build the admission scheduler from environment variables.
+
+    Args:
+        default_capacity: Slots if ADMISSION_MAX_CONCURRENT is unset
+
+    Environment:
+        ADMISSION_CONTROL: 'false' disables admission control (default on)
+        ADMISSION_MAX_CONCURRENT: Coach calls admitted at once
+        ADMISSION_BULK_SHARE: Largest fraction of slots bulk traffic may hold (default 0.5)
+        ADMISSION_MAX_QUEUE: Waiting requests per priority (default 100)
+        ADMISSION_CLUB_MAX_QUEUE: Waiting requests per club (default 20)
+        ADMISSION_MAX_WAIT_SECONDS: Longest an interactive request waits (default 30)
+        ADMISSION_CLUB_REQUESTS_PER_MINUTE: Per-club request budget, 0 = unlimited (default 0)
+        ADMISSION_CLUB_TOKENS_PER_MINUTE: Per-club token budget, 0 = unlimited (default 0)
+        ADMISSION_CLUB_WEIGHTS: 'club:weight,...' clubs with their own budgets, and their
+            shares and budget multipliers; other club ids share the public club's
+
+    Returns:
+        Configured FairScheduler, or None if disabled
+    """
+    if os.getenv('ADMISSION_CONTROL', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    return FairScheduler(
+        capacity=int(os.getenv('ADMISSION_MAX_CONCURRENT', str(default_capacity))),
+        bulk_share=float(os.getenv('ADMISSION_BULK_SHARE', '0.5')),
+        max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', '100')),
+        tenant_max_queue=int(os.getenv('ADMISSION_CLUB_MAX_QUEUE', '20')),
+        max_wait=float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', '30')),
+        requests_per_minute=float(os.getenv('ADMISSION_CLUB_REQUESTS_PER_MINUTE', '0')),
+        tokens_per_minute=float(os.getenv('ADMISSION_CLUB_TOKENS_PER_MINUTE', '0')),
+        weights=parse_weights(os.getenv('ADMISSION_CLUB_WEIGHTS', ''))
+    )
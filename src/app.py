@@ -4,56 +4,1392 @@ Rugby Session Plan Generator - Stage 3: Heuristic Judge
 A Flask application that generates rugby session plans using Claude AI.
 Supports single coach (Stage 1), dual coach debate (Stage 2), and
 heuristic judging (Stage 3).
+
+Routes live on a Blueprint and create_app() builds the application;
+`app.app` is a default instance built on first access (for `flask run`,
+WSGI servers and asgi.py). Importing this module does not build the app
+or import the Anthropic SDK: the client is created by get_client() on
+first use.
 """
 
 import os
+import json
+import time
+import queue
 import logging
-from flask import Flask, render_template, request, flash, redirect, url_for
-from anthropic import Anthropic, APIError
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+from flask import (Blueprint, Flask, Response, g, render_template, request, flash, redirect,
+                   stream_with_context, url_for)
 from dotenv import load_dotenv
-from prompts import get_base_session_prompt, get_coach_a_prompt, get_coach_b_prompt
-from scoring import compare_plans, get_limitations_text
+from prompts import (AGE_GROUPS, PERSONA_SYSTEM_PROMPTS, PROMPT_VERSION, get_persona_prompt,
+                     registry as prompt_registry)
+from scoring import (RANKING_METHODS, PlanScorer, compare_plans, get_limitations_text, rank_plans,
+                     score_plan)
+from plan_parser import parse_plan
+from plan_cache import create_plan_cache_from_env, make_cache_key
+import plan_library
+from jobs import JobQueue, QueueFullError
+from admission import (DEFAULT_TENANT, Admission, AdmissionRejected, create_scheduler_from_env,
+                       normalize_tenant)
+from single_flight import SingleFlight
+from token_budget import COMPLETE_STOP_REASONS, create_token_budget_from_env, generate_complete
+from llm_client import api_errors, create_llm_client_from_env, extract_result, message_params
+from debate_store import build_debate_document, create_debate_store_from_env
+import metrics
 
-# Load environment variables
+# Load environment variables (the configuration below reads them)
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
 # Template and static folders are at project root, not in src/
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'templates'))
 static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
-app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
-app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
 
-# Initialize Anthropic client
-try:
-    client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-    logger.info("Anthropic client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Anthropic client: {e}")
-    client = None
+# Every route; create_app() registers it on a Flask app
+bp = Blueprint('plans', __name__)
+
+# Anthropic client (pooled connections, retries, rate limits, circuit
+# breaker), created by get_client() on first use
+_client = None
+_client_created = False
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The shared Claude client, created on first call.
+
+    Creating it imports the Anthropic SDK (over a second), so processes
+    that never call the API do not pay for it.
+
+    Returns:
+        ResilientClient, or None if it could not be created (e.g. no API key)
+    """
+    global _client, _client_created
+    if not _client_created:
+        with _client_lock:
+            if not _client_created:
+                try:
+                    _client = create_llm_client_from_env()
+                    logger.info("Anthropic client initialized successfully")
+                except Exception as e:
+                    logger.error(f"Failed to initialize Anthropic client: {e}")
+                    _client = None
+                _client_created = True
+    return _client
+
+
+def set_client(client) -> None:
+    """Use the given client instead (e.g. a wrapped fake in benchmarks)."""
+    global _client, _client_created
+    with _client_lock:
+        _client = client
+        _client_created = True
 
 # Configuration
 MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-sonnet-4-20250514')
 MAX_TOKENS = int(os.getenv('MAX_TOKENS_GENERATION', '1500'))
+PROMPT_CACHING = os.getenv('PROMPT_CACHING', 'true').lower() not in ('0', 'false', 'no')
+
+# Output budgets sized per persona and duration, learned from complete
+# plans; a plan stopped by max_tokens is continued up to TOKEN_CONTINUATIONS times
+token_budget = create_token_budget_from_env(MAX_TOKENS)
+TOKEN_CONTINUATIONS = int(os.getenv('TOKEN_CONTINUATIONS', '2'))
+
+# Ask for JSON plans on the non-streaming routes (streamed text stays readable)
+STRUCTURED_PLANS = os.getenv('STRUCTURED_PLANS', 'false').lower() in ('1', 'true', 'yes')
+
+# Live judging: partial plans are scored every PARTIAL_SCORE_CHARS characters,
+# and early-stopping streams end once a full-marks plan reaches EARLY_STOP_MIN_CHARS
+PARTIAL_SCORE_CHARS = int(os.getenv('PARTIAL_SCORE_CHARS', '256'))
+EARLY_STOP_MIN_CHARS = int(os.getenv('EARLY_STOP_MIN_CHARS', '2000'))
+
+# Tournament size limits (entrants = coaches x samples)
+TOURNAMENT_MAX_SAMPLES = int(os.getenv('TOURNAMENT_MAX_SAMPLES', '4'))
+TOURNAMENT_MAX_ENTRANTS = int(os.getenv('TOURNAMENT_MAX_ENTRANTS', '12'))
+
+# Cache of generated plans keyed by rendered prompt (None if disabled)
+plan_cache = create_plan_cache_from_env()
+
+# Index of generated plans by objective similarity, so paraphrased
+# objectives reuse an earlier plan (None if disabled). The module pulls in
+# NumPy, so it is only imported when enabled.
+semantic_cache = None
+if os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+    from semantic_cache import create_semantic_cache_from_env
+    semantic_cache = create_semantic_cache_from_env()
+
+# Identical generations in flight at the same time share one API call
+# (None if disabled); followers wait up to COALESCE_WAIT_SECONDS
+COALESCE_WAIT_SECONDS = float(os.getenv('COALESCE_WAIT_SECONDS', '90'))
+in_flight = (SingleFlight(COALESCE_WAIT_SECONDS)
+             if os.getenv('COALESCE_REQUESTS', 'true').lower() not in ('0', 'false', 'no') else None)
+
+# Persistent history of dual-coach debates (None if disabled)
+debate_store = create_debate_store_from_env()
+
+# Shared pool for running Coach A and Coach B calls side by side.
+# Each dual request uses two workers, so this caps concurrent debates.
+COACH_MAX_WORKERS = int(os.getenv('COACH_MAX_WORKERS', '8'))
+coach_executor = ThreadPoolExecutor(max_workers=COACH_MAX_WORKERS, thread_name_prefix='coach')
+
+# Per-club admission control in front of generation: fair shares of the
+# coach workers, interactive before bulk, per-club budgets and 429s when
+# the queues are full (None if disabled)
+scheduler = create_scheduler_from_env(COACH_MAX_WORKERS)
+
+# Background job queue: POST /jobs/* returns immediately and a bounded
+# worker pool performs the generation
+job_queue = JobQueue(
+    max_workers=int(os.getenv('JOB_WORKERS', '4')),
+    max_queue_depth=int(os.getenv('JOB_MAX_QUEUE_DEPTH', '50')),
+    result_ttl=float(os.getenv('JOB_RESULT_TTL_SECONDS', '3600'))
+)
+
+# Metrics exposed on /metrics
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'End-to-end request latency (streamed bodies excluded)', ('endpoint',))
+HTTP_REQUESTS = metrics.counter('http_requests_total', 'HTTP requests by endpoint and status',
+                                ('endpoint', 'status'))
+HTTP_IN_FLIGHT = metrics.gauge('http_requests_in_flight', 'HTTP requests being handled')
+LLM_REQUEST_SECONDS = metrics.histogram('llm_request_duration_seconds', 'Claude API call latency',
+                                        ('coach', 'mode'))
+LLM_IN_FLIGHT = metrics.gauge('llm_requests_in_flight', 'Claude API calls in progress')
+LLM_TOKENS = metrics.counter('llm_tokens_total', 'Tokens used by Claude API calls', ('coach', 'type'))
+LLM_ERRORS = metrics.counter('llm_errors_total', 'Failed Claude API calls by exception type', ('type',))
+LLM_CONTINUATIONS = metrics.counter('llm_continuations_total',
+                                    'Extra calls made to continue plans stopped by max_tokens', ('coach',))
+LLM_TRUNCATED = metrics.counter('llm_truncated_plans_total',
+                                'Plans still cut off by max_tokens after all continuations', ('coach',))
+PLAN_CACHE_LOOKUPS = metrics.counter('plan_cache_lookups_total', 'Plan cache lookups', ('result',))
+SEMANTIC_CACHE_LOOKUPS = metrics.counter('semantic_cache_lookups_total',
+                                         'Near-duplicate objective lookups after a plan cache miss',
+                                         ('result',))
+LLM_COALESCED = metrics.counter('llm_single_flight_total',
+                                'Uncached plan requests by single-flight role (follower = call saved)',
+                                ('role',))
+LLM_COALESCE_IN_FLIGHT = metrics.gauge('llm_single_flight_in_flight', 'Distinct generations being coalesced')
+PROMPT_RENDER_SECONDS = metrics.histogram('prompt_render_duration_seconds', 'Prompt rendering time',
+                                          ('persona',), buckets=metrics.FAST_BUCKETS)
+SCORING_SECONDS = metrics.histogram('scoring_duration_seconds', 'Heuristic scoring time',
+                                    ('operation',), buckets=metrics.FAST_BUCKETS)
+TEMPLATE_RENDER_SECONDS = metrics.histogram('template_render_duration_seconds', 'Jinja template rendering time',
+                                            ('template',), buckets=metrics.FAST_BUCKETS)
+JOBS = metrics.gauge('jobs', 'Background jobs by status', ('status',))
+LLM_CIRCUIT_OPEN = metrics.gauge('llm_circuit_open', '1 while the Claude API circuit breaker is not closed')
+ADMISSION_DECISIONS = metrics.counter('admission_decisions_total',
+                                      'Generation admission decisions (admitted or rejection reason)',
+                                      ('priority', 'outcome'))
+ADMISSION_WAIT_SECONDS = metrics.histogram('admission_wait_seconds', 'Time generations waited for coach slots',
+                                           ('priority',))
+ADMISSION_QUEUED = metrics.gauge('admission_queued', 'Generations waiting for coach slots', ('priority',))
+
+
+def sample_gauges() -> None:
+    """Refresh gauges whose values live in other components; runs on each scrape."""
+    stats = job_queue.stats()
+    JOBS.set(stats['queued'], status='queued')
+    JOBS.set(stats['running'], status='running')
+    if in_flight is not None:
+        LLM_COALESCE_IN_FLIGHT.set(in_flight.stats()['in_flight'])
+    if scheduler is not None:
+        for priority, count in scheduler.queued().items():
+            ADMISSION_QUEUED.set(count, priority=priority)
+    # Read the client only if it exists: a scrape should not create it
+    if hasattr(_client, 'breaker'):
+        LLM_CIRCUIT_OPEN.set(0 if _client.breaker.state == 'closed' else 1)
+
+
+metrics.registry.add_callback(sample_gauges)
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    # Label by view name, without the blueprint prefix
+    endpoint = (request.endpoint or 'unmatched').rpartition('.')[2]
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+@bp.teardown_app_request
+def finish_request(exc=None):
+    HTTP_IN_FLIGHT.dec()
+
+
+def build_prompt(persona: str, age_group: str, objective: str, duration: int,
+                 players: int, structured: bool = False) -> Tuple[str, str]:
+    """get_persona_prompt(), timed for the prompt render histogram."""
+    with PROMPT_RENDER_SECONDS.time(persona=persona):
+        return get_persona_prompt(persona, age_group, objective, duration, players, structured)
+
+
+def timed_score_plan(plan: str) -> Dict:
+    """score_plan(), timed for the scoring histogram."""
+    with SCORING_SECONDS.time(operation='score_plan'):
+        return score_plan(plan)
+
+
+def structure_result(result: Dict, duration: int) -> Dict:
+    """
+    Parse a generated plan into schema steps and check its timing.
+
+    JSON plans (STRUCTURED_PLANS) are replaced by their text rendering, so
+    scoring, templates and debate history keep working on plan text, and
+    re-scoring stored debates reproduces the live scores.
+
+    Args:
+        result: request_plan() result
+        duration: Requested session duration in minutes
+
+    Returns:
+        The result with 'plan' as text, plus 'structure'
+        (StructuredPlan.to_dict()) and 'duration_check'
+        (StructuredPlan.check_duration())
+    """
+    with SCORING_SECONDS.time(operation='parse_plan'):
+        structured = parse_plan(result['plan'])
+    plan = structured.to_text() if structured.source == 'json' else result['plan']
+    return dict(result, plan=plan, structure=structured.to_dict(),
+                duration_check=structured.check_duration(duration))
+
+
+def timed_compare_plans(plan_a: str, plan_b: str) -> Dict:
+    """compare_plans(), timed for the scoring histogram."""
+    with SCORING_SECONDS.time(operation='compare_plans'):
+        return compare_plans(plan_a, plan_b)
+
+
+def render_page(template: str, **context) -> str:
+    """render_template(), timed for the template render histogram."""
+    with TEMPLATE_RENDER_SECONDS.time(template=template):
+        return render_template(template, **context)
+
+
+def build_message_params(system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None) -> Dict:
+    """
+    Build Messages API arguments for a (system, user) prompt pair.
+
+    See llm_client.message_params(); the model and prompt caching come
+    from ANTHROPIC_MODEL and PROMPT_CACHING.
+
+    Args:
+        max_tokens: Output budget (default MAX_TOKENS); see plan_budget()
+    """
+    return message_params(system_prompt, user_prompt, MODEL, max_tokens or MAX_TOKENS, PROMPT_CACHING)
+
+
+def token_usage(result: Dict) -> Dict:
+    """Summarise the token counts of a request_plan() result."""
+    return {
+        'input': result['input_tokens'],
+        'output': result['output_tokens'],
+        'cache_write': result.get('cache_creation_input_tokens', 0),
+        'cache_read': result.get('cache_read_input_tokens', 0)
+    }
+
+
+def log_token_usage(label: str, result: Dict) -> None:
+    """Log token usage for a generated plan, including prompt cache activity."""
+    logger.info(
+        f"{label}: {result['input_tokens']} input, {result['output_tokens']} output, "
+        f"{result.get('cache_read_input_tokens', 0)} cache read, "
+        f"{result.get('cache_creation_input_tokens', 0)} cache write"
+    )
+
+
+def lookup_cached_plan(system_prompt: str, user_prompt: str) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Check the plan cache for a prompt.
+
+    Returns:
+        Tuple of (cache key, cached result); the key is None when caching
+        is disabled and the result is None on a miss
+    """
+    if plan_cache is None:
+        return None, None
+    cache_key = make_cache_key(system_prompt, user_prompt, MODEL, MAX_TOKENS)
+    cached = plan_cache.get(cache_key)
+    if cached is None:
+        PLAN_CACHE_LOOKUPS.inc(result='miss')
+        return cache_key, None
+    logger.info(f"Plan cache hit ({cache_key[:12]})")
+    PLAN_CACHE_LOOKUPS.inc(result='hit')
+    return cache_key, cached
+
+
+def semantic_cache_key(system_prompt: str, session: Optional[Tuple]) -> Optional[Tuple]:
+    """
+    Semantic cache partition for a request, or None if it does not apply.
+
+    The scope hashes the persona system prompt with the model and token
+    budget, so plans are only shared between requests for the same coach
+    and output format.
+
+    Args:
+        system_prompt: Static persona block
+        session: (age_group, objective, duration, players), or None
+    """
+    if semantic_cache is None or session is None:
+        return None
+    age_group, _, duration, players = session
+    scope = make_cache_key(system_prompt, '', MODEL, MAX_TOKENS)[:16]
+    return semantic_cache.partition_key(scope, age_group, duration, players)
+
+
+def lookup_similar_plan(key: Tuple, objective: str) -> Optional[Dict]:
+    """Serve a plan generated for a paraphrase of the objective, if one is close enough."""
+    match = semantic_cache.lookup(key, objective)
+    if match is None:
+        SEMANTIC_CACHE_LOOKUPS.inc(result='miss')
+        return None
+    result, matched_objective, similarity = match
+    logger.info(f"Semantic cache hit: {objective!r} ~ {matched_objective!r} ({similarity:.2f})")
+    SEMANTIC_CACHE_LOOKUPS.inc(result='hit')
+    return result
+
+
+def load_plan_library() -> Optional[Dict]:
+    """
+    Load fresh pre-generated plans (src/plan_library.py) into the plan cache.
+
+    Entries are also indexed in the semantic cache when it is enabled.
+    Runs once at startup; problems are logged rather than raised.
+
+    Returns:
+        plan_library.library_report() for the popular objectives, plus
+        'loaded'; None if the library or the plan cache is disabled
+    """
+    settings = plan_library.settings_from_env()
+    if plan_cache is None or not settings['path'] or not os.path.exists(settings['path']):
+        return None
+    try:
+        records = plan_library.read_library(settings['path'])
+        entries = list(plan_library.fresh_entries(records, MODEL, MAX_TOKENS, STRUCTURED_PLANS,
+                                                  settings['max_age']))
+        loaded = plan_cache.preload((entry['cache_key'], entry['result'], entry['generated_at'])
+                                    for entry in entries)
+        for entry in entries:
+            session = entry['session']
+            key = semantic_cache_key(entry['system_prompt'], (session['age_group'], session['objective'],
+                                                              session['duration'], session['players']))
+            if key is not None:
+                semantic_cache.add(key, session['objective'], entry['result'])
+
+        objectives = (plan_library.read_objectives(settings['objectives_path'])
+                      if os.path.exists(settings['objectives_path']) else [])
+        configurations = plan_library.library_configurations(objectives, AGE_GROUPS, settings['durations'],
+                                                             settings['players'])
+        report = plan_library.library_report(records, configurations, MODEL, MAX_TOKENS,
+                                             STRUCTURED_PLANS, settings['max_age'])
+    except Exception as e:
+        logger.error(f"Failed to load plan library: {e}", exc_info=True)
+        return None
+    logger.info(f"Loaded {loaded} library plans into the plan cache "
+                f"({report['coverage']:.0%} of popular configurations fresh, {report['stale']} stale)")
+    return dict(report, loaded=loaded)
+
+
+# Coverage of the pre-generated plan library, reported on /health
+# (set when the first app is created)
+plan_library_report = None
+
+
+def record_token_metrics(coach: str, result: Dict) -> None:
+    """Add a fresh (uncached) result's token usage to the token counters."""
+    for token_type, count in token_usage(result).items():
+        if count:
+            LLM_TOKENS.inc(count, coach=coach, type=token_type)
+
+
+def session_duration(session: Optional[Tuple]) -> Optional[int]:
+    """Duration of a (age_group, objective, duration, players) session, if given."""
+    return session[2] if session is not None else None
+
+
+def record_generation(coach: str, duration: Optional[int], result: Dict) -> None:
+    """
+    Record a fresh generation: token and continuation metrics, and its
+    length for the token budget if the model finished the plan.
+    """
+    record_token_metrics(coach, result)
+    if result.get('continuations'):
+        LLM_CONTINUATIONS.inc(result['continuations'], coach=coach)
+    if result.get('truncated'):
+        LLM_TRUNCATED.inc(coach=coach)
+        logger.warning(f"Coach {coach} plan still truncated after {result['continuations']} continuations "
+                       f"({result['output_tokens']} output tokens)")
+    elif result.get('stop_reason') in COMPLETE_STOP_REASONS:
+        token_budget.record(coach, duration, result['output_tokens'])
+
+
+def seed_token_budget(limit: int = 200) -> int:
+    """
+    Teach the token budget from recent debate history at startup.
+
+    Plans at or above MAX_TOKENS output tokens may have been cut off
+    before truncation was detected, so they are skipped.
+
+    Returns:
+        Number of plan lengths recorded
+    """
+    if debate_store is None or not token_budget.adaptive:
+        return 0
+
+    def samples():
+        for document in debate_store.iter_query(limit=limit, full=True):
+            for coach, plan in document.get('plans', {}).items():
+                output = (plan.get('tokens') or {}).get('output', 0)
+                if 0 < output < MAX_TOKENS:
+                    yield coach, document['duration'], output
+
+    try:
+        return token_budget.seed(samples())
+    except Exception as e:
+        logger.error(f"Failed to seed token budget from debate history: {e}")
+        return 0
+
+
+# coach -> (system, user) prompt, or (coach, prompt) pairs for several plans per coach
+CoachPrompts = Union[Mapping[str, Tuple[str, str]], List[Tuple[str, Tuple[str, str]]]]
+
+
+def admission_key(headers: Mapping, fields: Mapping, priority: str = 'interactive') -> Tuple[str, str]:
+    """
+    Club and priority of a generation request.
+
+    The club comes from the X-Club-Id header or a 'club' field. Only clubs
+    configured in ADMISSION_CLUB_WEIGHTS are honoured; anything else counts
+    as the shared 'public' club, so callers cannot mint fresh budgets.
+    X-Priority: bulk downgrades an interactive request; nothing upgrades a
+    bulk one.
+
+    Args:
+        headers: Request headers (looked up by lower-case name)
+        fields: Form fields or JSON body
+        priority: The route's priority
+    """
+    club = headers.get('x-club-id') or fields.get('club')
+    if str(headers.get('x-priority', '')).lower() == 'bulk':
+        priority = 'bulk'
+    clubs = scheduler.weights if scheduler is not None else ()
+    return normalize_tenant(club if isinstance(club, str) else None, clubs), priority
+
+
+def coach_calls(prompts: CoachPrompts) -> List[Tuple[str, Tuple[str, str]]]:
+    """(coach, prompt) pairs, one per plan, from a coach -> prompt mapping or a list of pairs."""
+    return list(prompts.items()) if isinstance(prompts, Mapping) else list(prompts)
+
+
+def generation_cost(prompts: CoachPrompts, duration: Optional[int]) -> int:
+    """Estimated tokens for the plans: about four prompt characters per token plus the output budget."""
+    return sum((len(system_prompt) + len(user_prompt)) // 4 + token_budget.budget(coach, duration)
+               for coach, (system_prompt, user_prompt) in coach_calls(prompts))
+
+
+def fresh_tokens(results: Iterable[Dict]) -> int:
+    """
+    Tokens the API counted for results this request paid for: not served
+    from a cache, and not coalesced onto another request's call.
+    """
+    return sum(result['input_tokens'] + result['output_tokens'] + result.get('cache_creation_input_tokens', 0)
+               for result in results if not result.get('cached') and not result.get('coalesced'))
+
+
+def admit_generation(club: str, prompts: CoachPrompts, duration: Optional[int],
+                     priority: str = 'interactive', bounded: bool = True) -> Optional[Admission]:
+    """
+    Wait for the scheduler to admit a generation of one plan per prompt.
+
+    Takes one coach slot per plan and charges the club generation_cost().
+
+    Args:
+        prompts: coach -> (system, user) mapping, or (coach, prompt) pairs
+            when a coach has several plans
+
+    Returns:
+        Admission to pass to finish_admission(), or None if admission
+        control is disabled
+
+    Raises:
+        AdmissionRejected: Over the club's budget, queue full or timed out
+    """
+    if scheduler is None:
+        return None
+    try:
+        admission = scheduler.admit(club, priority, generation_cost(prompts, duration),
+                                    len(coach_calls(prompts)), bounded)
+    except AdmissionRejected as e:
+        ADMISSION_DECISIONS.inc(priority=priority, outcome=e.reason)
+        logger.warning(f"Rejected {priority} generation for club {club}: {e}")
+        raise
+    ADMISSION_DECISIONS.inc(priority=priority, outcome='admitted')
+    ADMISSION_WAIT_SECONDS.observe(admission.waited, priority=priority)
+    return admission
+
+
+def finish_admission(admission: Optional[Admission], results: Iterable[Dict]) -> None:
+    """Charge the club for the tokens results actually used and free the slots."""
+    if admission is not None:
+        admission.settle(fresh_tokens(results))
+        admission.release()
+
+
+@contextmanager
+def generation_slot(club: str, prompts: CoachPrompts, duration: Optional[int],
+                    priority: str = 'interactive', bounded: bool = True) -> Iterator[List[Dict]]:
+    """
+    admit_generation() for a with-block. Append the request_plan()-style
+    results to the yielded list; they are settled when the block ends.
+    """
+    admission = admit_generation(club, prompts, duration, priority, bounded)
+    results: List[Dict] = []
+    try:
+        yield results
+    finally:
+        finish_admission(admission, results)
+
+
+def admitted_stream(events: Iterator[str], admission: Optional[Admission],
+                    spent: List[Dict]) -> Iterator[str]:
+    """Pass events through, finishing the admission when the stream ends, fails or is closed."""
+    try:
+        yield from events
+    finally:
+        finish_admission(admission, spent)
+
+
+def admit_streams(club: str, priority: str, prompts: Dict[str, Tuple[str, str]],
+                  duration: int) -> Tuple[Dict[str, Tuple], Optional[Admission]]:
+    """
+    Look streamed prompts up in the plan cache, then admit only the misses.
+
+    Args:
+        prompts: Stream tag ('plan', 'A', 'B') -> (system, user) prompt pair
+
+    Returns:
+        Tuple of (tag -> lookup_cached_plan() result, to pass to
+        stream_generation_events(), and the admission, or None if every
+        plan is cached or admission control is disabled)
+
+    Raises:
+        AdmissionRejected: If the misses are not admitted
+    """
+    lookups = {tag: lookup_cached_plan(*prompt) for tag, prompt in prompts.items()}
+    misses = {'base' if tag == 'plan' else tag: prompts[tag]
+              for tag, (_, cached) in lookups.items() if cached is None}
+    admission = admit_generation(club, misses, duration, priority) if misses else None
+    return lookups, admission
+
+
+def rejected_response(e: AdmissionRejected):
+    """JSON 429 with Retry-After for a rejected admission."""
+    return {'error': str(e), 'reason': e.reason}, 429, {'Retry-After': str(e.retry_after)}
+
+
+def rejected_page(e: AdmissionRejected):
+    """The form page showing a rejected admission, as 429 with Retry-After."""
+    flash(str(e), 'error')
+    return render_page('index.html', age_groups=AGE_GROUPS), 429, {'Retry-After': str(e.retry_after)}
+
+
+
+def generate_plan(system_prompt: str, user_prompt: str, coach: str = 'base',
+                  session: Optional[Tuple] = None) -> Dict:
+    """
+    Make an uncached API call for a plan, recording metrics.
+
+    max_tokens comes from the token budget for the coach and session
+    duration; a plan stopped by max_tokens is continued (up to
+    TOKEN_CONTINUATIONS extra calls) and stitched together.
+
+    Returns:
+        extract_result() dictionary, plus 'continuations' and 'truncated'
+
+    Raises:
+        APIError: If the Anthropic API call fails
+        ValueError: If the response contains no content
+    """
+    duration = session_duration(session)
+
+    def call(params: Dict) -> Dict:
+        try:
+            with LLM_IN_FLIGHT.track_inprogress(), LLM_REQUEST_SECONDS.time(coach=coach, mode='create'):
+                response = get_client().messages.create(**params)
+        except Exception as e:
+            LLM_ERRORS.inc(type=type(e).__name__)
+            raise
+        return extract_result(response)
+
+    params = build_message_params(system_prompt, user_prompt, token_budget.budget(coach, duration))
+    result = generate_complete(call, params, TOKEN_CONTINUATIONS)
+    record_generation(coach, duration, result)
+    return result
+
+
+def lookup_plan(system_prompt: str, user_prompt: str,
+                session: Optional[Tuple] = None) -> Tuple[Optional[Dict], Tuple]:
+    """
+    The cache half of request_plan(): the plan cache, then the semantic cache.
+
+    Returns:
+        Tuple of (the cached result with cached=True, or None on a miss, and
+        the cache keys to pass to generate_uncached())
+    """
+    cache_key, cached = lookup_cached_plan(system_prompt, user_prompt)
+    if cached is not None:
+        return dict(cached, cached=True), (cache_key, None)
+    similar_key = semantic_cache_key(system_prompt, session)
+    similar = lookup_similar_plan(similar_key, session[1]) if similar_key is not None else None
+    if similar is not None:
+        if cache_key is not None:
+            plan_cache.set(cache_key, similar)
+        return dict(similar, cached=True), (cache_key, similar_key)
+    return None, (cache_key, similar_key)
+
+
+def flight_key(system_prompt: str, user_prompt: str, keys: Tuple) -> str:
+    """Single-flight key of a prompt: its plan cache key from lookup_plan(), or the same hash."""
+    return keys[0] or make_cache_key(system_prompt, user_prompt, MODEL, MAX_TOKENS)
+
+
+def joins_call(system_prompt: str, user_prompt: str, keys: Tuple) -> bool:
+    """True if an identical call is in flight, so generate_uncached() would follow it."""
+    return in_flight is not None and in_flight.has_leader(flight_key(system_prompt, user_prompt, keys))
+
+
+def generate_uncached(system_prompt: str, user_prompt: str, coach: str, session: Optional[Tuple],
+                      keys: Tuple, slot: Optional[Callable[[], ContextManager[List[Dict]]]] = None) -> Dict:
+    """
+    The generation half of request_plan(), after lookup_plan() missed.
+
+    Concurrent identical requests share one in-flight API call; the ones
+    that joined another's call are marked coalesced, as its tokens are
+    already paid for (see fresh_tokens()).
+
+    Args:
+        keys: Cache keys from lookup_plan(), filled once the plan is ready
+        slot: Opens the admission (a generation_slot()) to hold while
+            making the API call. Only the caller that makes the call opens
+            it, so followers never take a coach slot. None if the caller
+            was admitted already.
+
+    Raises:
+        AdmissionRejected: If this caller's own admission is rejected (a
+            follower whose leader was rejected tries again as its own club)
+    """
+    cache_key, similar_key = keys
+    rejected = []
+
+    def call() -> Dict:
+        if slot is None:
+            result = generate_plan(system_prompt, user_prompt, coach, session)
+        else:
+            try:
+                with slot() as spent:
+                    result = generate_plan(system_prompt, user_prompt, coach, session)
+                    spent.append(result)
+            except AdmissionRejected:
+                rejected.append(True)
+                raise
+        # A cut-off plan is shown once, not served to everyone after
+        if result['truncated']:
+            return result
+        if cache_key is not None:
+            plan_cache.set(cache_key, result)
+        if similar_key is not None:
+            semantic_cache.add(similar_key, session[1], result)
+        return result
+
+    if in_flight is None:
+        return dict(call(), cached=False, coalesced=False)
+    key = flight_key(system_prompt, user_prompt, keys)
+    while True:
+        try:
+            result, role = in_flight.do(key, call)
+        except AdmissionRejected:
+            if rejected:
+                raise
+            continue
+        break
+    LLM_COALESCED.inc(role=role)
+    return dict(result, cached=False, coalesced=role == 'follower')
+
+
+def request_plan(system_prompt: str, user_prompt: str, coach: str = 'base',
+                 session: Optional[Tuple] = None, club: str = DEFAULT_TENANT,
+                 priority: str = 'interactive', bounded: bool = True) -> Dict:
+    """
+    Send a single prompt to Claude and extract the generated plan.
+
+    Identical prompts are served from the plan cache when it is enabled,
+    and concurrent identical requests share one in-flight API call. When
+    session is given and the semantic cache is enabled, a plan generated
+    for a paraphrase of the same objective is served instead of a new call.
+    Only the request that makes the API call waits for the club's
+    admission (see admit_generation()), so cached plans and requests
+    sharing another's call are never queued, shed or charged.
+    Safe to call from worker threads: it touches no Flask request state.
+
+    Args:
+        system_prompt: Static persona block (prompt-cached)
+        user_prompt: Variable session request
+        coach: Persona label for metrics ('base', 'A' or 'B')
+        session: (age_group, objective, duration, players) the prompt was
+            built from; enables the semantic cache
+        club, priority, bounded: Admission of the API call
+
+    Returns:
+        Dictionary containing:
+            - plan: Generated session plan text
+            - input_tokens: Uncached input tokens used
+            - output_tokens: Output tokens used
+            - cache_creation_input_tokens: Input tokens written to the prompt cache
+            - cache_read_input_tokens: Input tokens read from the prompt cache
+            - stop_reason: Why the (last) API call stopped
+            - continuations: Extra calls made to finish a plan cut off by max_tokens
+            - truncated: True if the plan is still cut off
+            - cached: True if the plan came from the plan or semantic cache
+            - coalesced: True if it came from an identical request's API call
+              (absent for cached plans)
+
+    Raises:
+        APIError: If the Anthropic API call fails
+        AdmissionRejected: If the API call is not admitted
+        ValueError: If the response contains no content
+    """
+    cached, keys = lookup_plan(system_prompt, user_prompt, session)
+    if cached is not None:
+        return cached
+    prompts = {coach: (system_prompt, user_prompt)}
+    return generate_uncached(system_prompt, user_prompt, coach, session, keys,
+                             lambda: generation_slot(club, prompts, session_duration(session), priority, bounded))
+
+
+def run_coaches(prompts: Dict[str, Tuple[str, str]], session: Optional[Tuple] = None,
+                club: str = DEFAULT_TENANT, priority: str = 'interactive',
+                bounded: bool = True) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """
+    Generate one plan per coach concurrently and wait for all of them.
+
+    Cache lookups run first on the calling thread; only the misses are
+    admitted (together, one slot each) and sent to the coach executor, so
+    requests queue in the scheduler rather than on executor workers. A
+    miss whose identical call is already in flight is not admitted: it
+    follows that call, and only admits itself if the call ends before it
+    joins.
+
+    Args:
+        prompts: Mapping of coach key ('A', 'B') to (system, user) prompt pair
+        session: (age_group, objective, duration, players), passed to request_plan()
+        club, priority, bounded: Admission of the cache misses
+
+    Returns:
+        Tuple of (results, errors): request_plan() results for the coaches
+        that succeeded, and a user-facing error message for each that failed
+
+    Raises:
+        AdmissionRejected: If the cache misses are not admitted
+    """
+    results = {}
+    misses = {}
+    for coach, prompt in prompts.items():
+        cached, keys = lookup_plan(*prompt, session)
+        if cached is not None:
+            results[coach] = cached
+        else:
+            misses[coach] = keys
+
+    errors = {}
+    if not misses:
+        return results, errors
+    duration = session_duration(session)
+    followers = {coach for coach, keys in misses.items() if joins_call(*prompts[coach], keys)}
+    admitted = {coach: prompts[coach] for coach in misses if coach not in followers}
+    admission = admit_generation(club, admitted, duration, priority, bounded) if admitted else None
+
+    def own_slot(coach: str) -> Optional[Callable[[], ContextManager[List[Dict]]]]:
+        if coach not in followers:
+            return None
+        return lambda: generation_slot(club, {coach: prompts[coach]}, duration, priority, bounded)
+
+    spent = []
+    try:
+        futures = {
+            coach: coach_executor.submit(generate_uncached, *prompts[coach], coach, session, keys,
+                                         own_slot(coach))
+            for coach, keys in misses.items()
+        }
+        for coach, future in futures.items():
+            try:
+                results[coach] = future.result()
+            except api_errors() as e:
+                logger.error(f"Anthropic API error for Coach {coach}: {e}")
+                errors[coach] = f'API Error: {str(e)}'
+                continue
+            except ValueError:
+                logger.error(f"No content in Coach {coach} response")
+                errors[coach] = 'No response received. Please try again.'
+                continue
+            if coach in admitted:
+                spent.append(results[coach])
+    finally:
+        finish_admission(admission, spent)
+
+    return results, errors
+
+
+def record_debate(age_group: str, objective: str, duration: int, players: int,
+                  result_a: Dict, result_b: Dict, comparison: Dict) -> Optional[str]:
+    """
+    Save a finished debate to the history store.
+
+    Storage problems are logged rather than raised, so a full disk never
+    costs the user a plan they have already waited for.
+
+    Returns:
+        The debate id, or None if history is disabled or the write failed
+    """
+    if debate_store is None:
+        return None
+    document = build_debate_document(
+        age_group, objective, duration, players,
+        result_a['plan'], result_b['plan'], comparison,
+        token_usage(result_a), token_usage(result_b), MODEL, PROMPT_VERSION
+    )
+    try:
+        return debate_store.save(document)
+    except Exception as e:
+        logger.error(f"Failed to save debate history: {e}", exc_info=True)
+        return None
+
+
+def generate_single_job(age_group: str, objective: str, duration: int, players: int,
+                        club: str = DEFAULT_TENANT) -> Dict:
+    """
+    Background job: generate and score a single session plan.
+
+    A cache miss waits (as bulk traffic, without a deadline) for the club's turn.
+
+    Returns:
+        structure_result() output plus 'score' from score_plan()
+    """
+    prompt = build_prompt('base', age_group, objective, duration, players, STRUCTURED_PLANS)
+    result = request_plan(*prompt, session=(age_group, objective, duration, players), club=club,
+                          priority='bulk', bounded=False)
+    result = structure_result(result, duration)
+    return dict(result, score=timed_score_plan(result['plan']))
+
+
+def generate_dual_job(age_group: str, objective: str, duration: int, players: int,
+                      club: str = DEFAULT_TENANT) -> Dict:
+    """
+    Background job: generate Coach A and Coach B plans and compare them.
+
+    A cache miss waits (as bulk traffic, without a deadline) for the club's turn.
+
+    Returns:
+        Dictionary with plan_a, plan_b, per-coach token usage, duration
+        checks and truncation flags, and the compare_plans() result
+
+    Raises:
+        RuntimeError: If either coach fails (message lists each failure)
+    """
+    prompts = {
+        'A': build_prompt('A', age_group, objective, duration, players, STRUCTURED_PLANS),
+        'B': build_prompt('B', age_group, objective, duration, players, STRUCTURED_PLANS)
+    }
+    results, errors = run_coaches(prompts, (age_group, objective, duration, players), club, 'bulk',
+                                  bounded=False)
+    if errors:
+        raise RuntimeError('; '.join(f'Coach {coach}: {message}' for coach, message in errors.items()))
+    results = {coach: structure_result(result, duration) for coach, result in results.items()}
+
+    comparison = timed_compare_plans(results['A']['plan'], results['B']['plan'])
+    return {
+        'plan_a': results['A']['plan'],
+        'plan_b': results['B']['plan'],
+        'tokens_a': token_usage(results['A']),
+        'tokens_b': token_usage(results['B']),
+        'duration_check_a': results['A']['duration_check'],
+        'duration_check_b': results['B']['duration_check'],
+        'truncated_a': results['A'].get('truncated', False),
+        'truncated_b': results['B'].get('truncated', False),
+        'comparison': comparison,
+        'debate_id': record_debate(age_group, objective, duration, players,
+                                   results['A'], results['B'], comparison)
+    }
+
+
+def tournament_options(data: Mapping) -> Tuple[Optional[Tuple[List[str], int, str]], Optional[str]]:
+    """
+    Read and validate the tournament fields.
+
+    Args:
+        data: JSON body or request.form; coaches may be a list or a
+            comma-separated string
+
+    Returns:
+        Tuple of ((coaches, samples, method), None) when valid, or
+        (None, error_message) when not
+    """
+    coaches = data.get('coaches') or list(PERSONA_SYSTEM_PROMPTS)
+    if isinstance(coaches, str):
+        coaches = [coach.strip() for coach in coaches.split(',') if coach.strip()]
+    unknown = [coach for coach in coaches if coach not in PERSONA_SYSTEM_PROMPTS]
+    if unknown or not coaches:
+        return None, f"Coaches must be chosen from {', '.join(PERSONA_SYSTEM_PROMPTS)}."
+    coaches = list(dict.fromkeys(coaches))
+
+    try:
+        samples = int(data.get('samples') or 1)
+    except (TypeError, ValueError):
+        return None, 'Samples must be a valid number.'
+    if samples < 1 or samples > TOURNAMENT_MAX_SAMPLES:
+        return None, f'Samples must be between 1 and {TOURNAMENT_MAX_SAMPLES}.'
+    if len(coaches) * samples < 2:
+        return None, 'A tournament needs at least two plans.'
+    if len(coaches) * samples > TOURNAMENT_MAX_ENTRANTS:
+        return None, f'A tournament is limited to {TOURNAMENT_MAX_ENTRANTS} plans (coaches x samples).'
+
+    method = data.get('method') or 'round_robin'
+    if method not in RANKING_METHODS:
+        return None, f"Method must be one of {', '.join(RANKING_METHODS)}."
+    return (coaches, samples, method), None
+
 
-# Age group options
-AGE_GROUPS = ['U7', 'U8', 'U9', 'U10', 'U11', 'U12']
+def generate_entrants(prompts: Dict[str, Tuple[str, str]], misses: Dict[str, Tuple[str, Optional[Tuple]]],
+                      session: Tuple, club: str, errors: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    Generate the tournament entrants no cache could serve.
+
+    They are admitted together as bulk traffic, one slot each up to the
+    bulk share. No more calls are submitted to the coach executor at a time
+    than the admission holds slots, so entrants waiting for a slot do not
+    tie up workers that interactive requests need. An entrant whose
+    identical call is already in flight is not admitted: it follows that
+    call (see run_coaches()).
+
+    Args:
+        prompts: Mapping of coach to (system, user) prompt pair
+        misses: Entrant id -> (coach, lookup_plan() keys, or None for a
+            fresh sample that bypasses the caches)
+        session: (age_group, objective, duration, players)
+        club: Club charged for the generation
+        errors: Filled with entrant id -> message for entrants that failed
+
+    Returns:
+        Entrant id -> result for the entrants that succeeded
+
+    Raises:
+        AdmissionRejected: If the scheduler does not admit them
+    """
+    duration = session_duration(session)
+    followers = {entrant for entrant, (coach, keys) in misses.items()
+                 if keys is not None and joins_call(*prompts[coach], keys)}
+    admitted = [(coach, prompts[coach]) for entrant, (coach, _) in misses.items() if entrant not in followers]
+    admission = admit_generation(club, admitted, duration, 'bulk') if admitted else None
+    window = threading.BoundedSemaphore(admission.slots if admission is not None else max(len(admitted), 1))
+
+    def generate(entrant: str, coach: str, keys: Optional[Tuple]) -> Dict:
+        if entrant in followers:
+            return generate_uncached(*prompts[coach], coach, session, keys,
+                                     lambda: generation_slot(club, {coach: prompts[coach]}, duration, 'bulk'))
+        try:
+            if keys is None:
+                return generate_plan(*prompts[coach], coach=coach, session=session)
+            return generate_uncached(*prompts[coach], coach, session, keys)
+        finally:
+            window.release()
+
+    results = {}
+    spent = []
+    try:
+        futures = {}
+        for entrant, (coach, keys) in misses.items():
+            if entrant not in followers:
+                window.acquire()
+            futures[entrant] = coach_executor.submit(generate, entrant, coach, keys)
+
+        for entrant, future in futures.items():
+            try:
+                results[entrant] = future.result()
+            except api_errors() as e:
+                logger.error(f"Anthropic API error for tournament entrant {entrant}: {e}")
+                errors[entrant] = f'API Error: {str(e)}'
+                continue
+            except ValueError:
+                logger.error(f"No content in tournament entrant {entrant} response")
+                errors[entrant] = 'No response received. Please try again.'
+                continue
+            if entrant not in followers:
+                spent.append(results[entrant])
+    finally:
+        finish_admission(admission, spent)
+    return results
+
+
+def run_tournament(age_group: str, objective: str, duration: int, players: int,
+                   coaches: List[str], samples: int = 1, method: str = 'round_robin',
+                   club: str = DEFAULT_TENANT) -> Dict:
+    """
+    Generate samples plans per coach concurrently, score each once and rank them.
+
+    All calls share the coach executor, so a tournament waits for free
+    workers rather than adding to the API concurrency. The first sample
+    per coach is looked up in the caches like request_plan() (and
+    coalesced with identical requests); further samples are always fresh
+    calls so they differ from it. Only the entrants that need an API call
+    are admitted, as bulk traffic for the club (see generate_entrants()).
+
+    Returns:
+        Dictionary with the session inputs, 'entrants' (id, coach, sample,
+        plan, score, tokens, cached, duration_check), 'ranking' from
+        rank_plans() and 'errors' (entrant id -> message)
+
+    Raises:
+        AdmissionRejected: If the scheduler does not admit the tournament
+    """
+    session = (age_group, objective, duration, players)
+    prompts = {coach: build_prompt(coach, age_group, objective, duration, players, STRUCTURED_PLANS)
+               for coach in coaches}
+    results = {}
+    misses = {}  # entrant -> (coach, lookup_plan() keys, or None for a fresh sample)
+    for coach, prompt in prompts.items():
+        for sample in range(samples):
+            entrant = f'{coach}{sample + 1}'
+            if sample:
+                misses[entrant] = (coach, None)
+                continue
+            cached, keys = lookup_plan(*prompt, session)
+            if cached is not None:
+                results[entrant] = cached
+            else:
+                misses[entrant] = (coach, keys)
+
+    errors = {}
+    if misses:
+        results.update(generate_entrants(prompts, misses, session, club, errors))
+
+    entrants = []
+    for coach in prompts:
+        for sample in range(samples):
+            entrant = f'{coach}{sample + 1}'
+            if entrant not in results:
+                continue
+            result = structure_result(results[entrant], duration)
+            entrants.append({
+                'id': entrant,
+                'coach': coach,
+                'sample': sample + 1,
+                'plan': result['plan'],
+                'score': timed_score_plan(result['plan']),
+                'tokens': token_usage(result),
+                'cached': result.get('cached', False),
+                'truncated': result.get('truncated', False),
+                'duration_check': result['duration_check']
+            })
+
+    with SCORING_SECONDS.time(operation='rank_plans'):
+        ranking = rank_plans({entrant['id']: entrant['score'] for entrant in entrants}, method)
+    return {
+        'age_group': age_group,
+        'objective': objective,
+        'duration': duration,
+        'players': players,
+        'entrants': entrants,
+        'ranking': ranking,
+        'errors': errors
+    }
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a streaming call when the browser has disconnected."""
+
+
+class GenerationStopped(Exception):
+    """Raised by an on_text callback to end a stream early but keep the text so far."""
+
+
+def partial_result(parts: List[str], stream) -> Dict:
+    """
+    Build a request_plan()-style result for a stream that was stopped early.
+
+    Usage comes from the stream's message snapshot. The API only reports
+    the final output token count at the end of a message, so output tokens
+    fall back to an estimate of about four characters per token.
+    """
+    plan = ''.join(parts)
+    snapshot = getattr(stream, 'current_message_snapshot', None)
+    usage = getattr(snapshot, 'usage', None)
+    return {
+        'plan': plan,
+        'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+        'output_tokens': max(getattr(usage, 'output_tokens', 0) or 0, len(plan) // 4),
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0
+    }
+
+
+def stream_plan(system_prompt: str, user_prompt: str, on_text: Callable[[str], None],
+                coach: str = 'base', duration: Optional[int] = None,
+                lookup: Optional[Tuple[Optional[str], Optional[Dict]]] = None) -> Dict:
+    """
+    Stream a plan from Claude, passing each text delta to a callback.
+
+    The streaming counterpart of request_plan(): it consults and fills the
+    same plan cache, and a cache hit is delivered as a single delta. A plan
+    stopped by max_tokens is continued in a further stream whose deltas go
+    to the same callback.
+
+    Args:
+        system_prompt: Static persona block (prompt-cached)
+        user_prompt: Variable session request
+        on_text: Called with each text delta as it arrives; may raise
+            GenerationCancelled to abandon the call, or GenerationStopped
+            to end it early and keep the text received so far
+        coach: Persona label for metrics ('base', 'A' or 'B')
+        duration: Session minutes, for the token budget
+        lookup: lookup_cached_plan() result, if the caller already looked
+            the prompt up (see admit_streams())
+
+    Returns:
+        Same dictionary as request_plan(), plus 'stopped_early'. Plans cut
+        short by GenerationStopped or still truncated are not added to the
+        plan cache.
+
+    Raises:
+        APIError: If the Anthropic API call fails
+        ValueError: If the response contains no content
+    """
+    cache_key, cached = lookup if lookup is not None else lookup_cached_plan(system_prompt, user_prompt)
+    if cached is not None:
+        try:
+            on_text(cached['plan'])
+        except GenerationStopped:
+            pass
+        return dict(cached, cached=True, stopped_early=False)
+
+    def call(params: Dict) -> Dict:
+        parts = []
+        try:
+            with LLM_IN_FLIGHT.track_inprogress(), LLM_REQUEST_SECONDS.time(coach=coach, mode='stream'):
+                with get_client().messages.stream(**params) as stream:
+                    try:
+                        for text in stream.text_stream:
+                            parts.append(text)
+                            on_text(text)
+                    except GenerationStopped:
+                        # Leaving the with-block closes the connection, ending generation
+                        return dict(partial_result(parts, stream), stop_reason=None, stopped_early=True)
+                    response = stream.get_final_message()
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            LLM_ERRORS.inc(type=type(e).__name__)
+            raise
+        return dict(extract_result(response), stopped_early=False)
+
+    params = build_message_params(system_prompt, user_prompt, token_budget.budget(coach, duration))
+    result = generate_complete(call, params, TOKEN_CONTINUATIONS)
+    record_generation(coach, duration, result)
+    if result['stopped_early']:
+        logger.info(f"Stream {coach} stopped early after {len(result['plan'])} characters")
+    elif cache_key is not None and not result['truncated']:
+        plan_cache.set(cache_key, result)
+
+    return dict(result, cached=False)
+
+
+def validate_session_inputs(form: Mapping) -> Tuple[Optional[Tuple], Optional[str]]:
+    """
+    Read and validate the session form fields.
+
+    Args:
+        form: request.form or request.args
+
+    Returns:
+        Tuple of ((age_group, objective, duration, players), None) when valid,
+        or (None, error_message) when not
+    """
+    age_group = form.get('age_group', '').strip()
+    objective = form.get('objective', '').strip()
+    duration = form.get('duration', '').strip()
+    players = form.get('players', '').strip()
+
+    # Validate inputs
+    if not all([age_group, objective, duration, players]):
+        return None, 'All fields are required.'
+
+    # Convert and validate numeric inputs
+    try:
+        duration = int(duration)
+        players = int(players)
+    except ValueError:
+        return None, 'Duration and number of players must be valid numbers.'
+
+    if duration < 30 or duration > 120:
+        return None, 'Duration must be between 30 and 120 minutes.'
+
+    if players < 6 or players > 30:
+        return None, 'Number of players must be between 6 and 30.'
+
+    return (age_group, objective, duration, players), None
 
 
-@app.route('/')
+def sse_event(event: str, data: Dict) -> str:
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_generation_events(prompts: Dict[str, Tuple[str, str]],
+                             early_stop_chars: Optional[int] = None,
+                             duration: Optional[int] = None,
+                             lookups: Optional[Dict[str, Tuple]] = None) -> Iterator[str]:
+    """
+    Run one streaming generation per prompt and interleave their events.
+
+    Each prompt is streamed on the coach executor; deltas are tagged with the
+    prompt's key ('A', 'B', or 'plan' for single coach mode) so the browser
+    can route them. Closing the generator cancels any calls still running.
+
+    With several streams (or early stopping), deltas are fed to a PlanScorer
+    per stream and its score is read every PARTIAL_SCORE_CHARS characters,
+    so judging never rescans text it has already seen. Rubric criteria are
+    keyword hits, so a partial score can only rise; once a plan scores full
+    marks and has reached early_stop_chars, its generation is stopped.
+
+    Events:
+        token: {"stream", "text"} for each text delta
+        partial_score: {"stream", "total_score", "breakdown"} when a partial score rises
+        provisional: {"scores", "leader"} current partial totals and leading stream
+        complete: {"stream", "input_tokens", "output_tokens",
+                   "cache_read_input_tokens", "cache_creation_input_tokens",
+                   "cached", "stopped_early", "continuations", "truncated"}
+        error: {"stream", "message"} if a call fails
+
+    Args:
+        prompts: Mapping of stream tag to (system, user) prompt pair
+        early_stop_chars: Stop a stream at full marks once it has this many
+            characters (None never stops early)
+        duration: Session minutes, for the token budget
+        lookups: Stream tag -> lookup_cached_plan() result from admit_streams()
+
+    Yields:
+        SSE-formatted strings
+
+    Returns:
+        Dict of completed results by tag (retrieve with ``yield from``)
+    """
+    events = queue.Queue()
+    cancelled = threading.Event()
+    results = {}
+
+    judge = early_stop_chars is not None or len(prompts) > 1
+
+    def run(tag: str, prompt: Tuple[str, str]) -> None:
+        scorer = PlanScorer()
+        state = {'size': 0, 'scored_at': 0, 'total': 0, 'max': None}
+
+        def on_text(text: str) -> None:
+            if cancelled.is_set():
+                raise GenerationCancelled()
+            events.put(('token', {'stream': tag, 'text': text}))
+            if not judge:
+                return
+
+            state['size'] += len(text)
+            if state['total'] != state['max']:
+                scorer.feed(text)
+                if state['size'] - state['scored_at'] >= PARTIAL_SCORE_CHARS:
+                    state['scored_at'] = state['size']
+                    with SCORING_SECONDS.time(operation='partial_score'):
+                        score = scorer.score()
+                    state['max'] = score['max_score']
+                    if score['total_score'] > state['total']:
+                        state['total'] = score['total_score']
+                        events.put(('partial_score', {
+                            'stream': tag,
+                            'total_score': score['total_score'],
+                            'breakdown': score['breakdown']
+                        }))
+
+            if (early_stop_chars is not None and state['total'] == state['max']
+                    and state['size'] >= early_stop_chars):
+                raise GenerationStopped()
+
+        try:
+            result = stream_plan(*prompt, on_text, coach='base' if tag == 'plan' else tag, duration=duration,
+                                 lookup=(lookups or {}).get(tag))
+            results[tag] = result
+            events.put(('complete', {
+                'stream': tag,
+                'input_tokens': result['input_tokens'],
+                'output_tokens': result['output_tokens'],
+                'cache_read_input_tokens': result['cache_read_input_tokens'],
+                'cache_creation_input_tokens': result['cache_creation_input_tokens'],
+                'cached': result['cached'],
+                'stopped_early': result['stopped_early'],
+                'continuations': result.get('continuations', 0),
+                'truncated': result.get('truncated', False)
+            }))
+        except GenerationCancelled:
+            logger.info(f"Stream {tag} cancelled by client disconnect")
+        except api_errors() as e:
+            logger.error(f"Anthropic API error for stream {tag}: {e}")
+            events.put(('error', {'stream': tag, 'message': f'API Error: {str(e)}'}))
+        except Exception as e:
+            logger.error(f"Unexpected error for stream {tag}: {e}", exc_info=True)
+            events.put(('error', {'stream': tag, 'message': f'Unexpected error: {str(e)}'}))
+        finally:
+            events.put(None)
+
+    for tag, prompt in prompts.items():
+        coach_executor.submit(run, tag, prompt)
+
+    partial_totals = {tag: 0 for tag in prompts}
+    try:
+        remaining = len(prompts)
+        while remaining:
+            item = events.get()
+            if item is None:
+                remaining -= 1
+                continue
+            yield sse_event(*item)
+            event, data = item
+            if event == 'partial_score' and len(prompts) > 1:
+                partial_totals[data['stream']] = data['total_score']
+                best = max(partial_totals.values())
+                leaders = [tag for tag, total in partial_totals.items() if total == best]
+                yield sse_event('provisional', {
+                    'scores': partial_totals,
+                    'leader': leaders[0] if len(leaders) == 1 else 'TIE'
+                })
+    finally:
+        cancelled.set()
+
+    return results
+
+
+@bp.route('/')
 def index():
     """Display the session plan generation form."""
-    return render_template('index.html', age_groups=AGE_GROUPS)
+    return render_page('index.html', age_groups=AGE_GROUPS)
 
 
-@app.route('/generate', methods=['POST'])
+@bp.route('/generate', methods=['POST'])
 def generate():
     """
     Generate a session plan using Claude AI.
@@ -65,96 +1401,80 @@ def generate():
     - players: Number of players
 
     Returns:
-        Rendered result page with generated session plan or error
+        Rendered result page with generated session plan or error (the
+        form with status 429 and Retry-After when the club is not admitted)
     """
     try:
         # Validate client initialization
-        if client is None:
+        if get_client() is None:
             flash('API client not initialized. Check your API key configuration.', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
 
-        # Get form data
-        age_group = request.form.get('age_group', '').strip()
-        objective = request.form.get('objective', '').strip()
-        duration = request.form.get('duration', '').strip()
-        players = request.form.get('players', '').strip()
+        # Get and validate form data
+        inputs, error = validate_session_inputs(request.form)
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('.index'))
+        age_group, objective, duration, players = inputs
 
-        # Validate inputs
-        if not all([age_group, objective, duration, players]):
-            flash('All fields are required.', 'error')
-            return redirect(url_for('index'))
+        logger.info(f"Generating session plan: {age_group}, {objective}, {duration}min, {players} players")
+
+        # Generate prompt (static system block + variable user message)
+        system_prompt, user_prompt = build_prompt('base', age_group, objective, duration, players,
+                                                  STRUCTURED_PLANS)
+        logger.debug(f"Prompt length: {len(system_prompt)} system + {len(user_prompt)} user characters")
 
-        # Convert and validate numeric inputs
+        # Serve an identical earlier request from cache, or call Claude API
+        # once the club's turn comes
+        club, priority = admission_key(request.headers, request.form)
         try:
-            duration = int(duration)
-            players = int(players)
+            result = request_plan(system_prompt, user_prompt, session=inputs, club=club, priority=priority)
+        except AdmissionRejected as e:
+            return rejected_page(e)
         except ValueError:
-            flash('Duration and number of players must be valid numbers.', 'error')
-            return redirect(url_for('index'))
-
-        if duration < 30 or duration > 120:
-            flash('Duration must be between 30 and 120 minutes.', 'error')
-            return redirect(url_for('index'))
-
-        if players < 6 or players > 30:
-            flash('Number of players must be between 6 and 30.', 'error')
-            return redirect(url_for('index'))
+            logger.error("No content in API response")
+            flash('No response received from API. Please try again.', 'error')
+            return redirect(url_for('.index'))
+        result = structure_result(result, duration)
 
-        logger.info(f"Generating session plan: {age_group}, {objective}, {duration}min, {players} players")
+        session_plan = result['plan']
+        logger.info(f"Session plan generated successfully. Length: {len(session_plan)} characters")
+        log_token_usage('Tokens used', result)
 
-        # Generate prompt
-        prompt = get_base_session_prompt(age_group, objective, duration, players)
-        logger.debug(f"Prompt length: {len(prompt)} characters")
-
-        # Call Claude API
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
+        # Render result page
+        return render_page(
+            'result.html',
+            age_group=age_group,
+            objective=objective,
+            duration=duration,
+            players=players,
+            session_plan=session_plan,
+            duration_check=result['duration_check'],
+            truncated=result.get('truncated', False),
+            input_tokens=result['input_tokens'],
+            output_tokens=result['output_tokens'],
+            cache_read_tokens=result['cache_read_input_tokens'],
+            cache_write_tokens=result['cache_creation_input_tokens']
         )
 
-        # Extract session plan from response
-        if response.content and len(response.content) > 0:
-            session_plan = response.content[0].text
-            logger.info(f"Session plan generated successfully. Length: {len(session_plan)} characters")
-            logger.info(f"Tokens used: {response.usage.input_tokens} input, {response.usage.output_tokens} output")
-
-            # Render result page
-            return render_template(
-                'result.html',
-                age_group=age_group,
-                objective=objective,
-                duration=duration,
-                players=players,
-                session_plan=session_plan,
-                input_tokens=response.usage.input_tokens,
-                output_tokens=response.usage.output_tokens
-            )
-        else:
-            logger.error("No content in API response")
-            flash('No response received from API. Please try again.', 'error')
-            return redirect(url_for('index'))
-
-    except APIError as e:
+    except api_errors() as e:
         logger.error(f"Anthropic API error: {e}")
         flash(f'API Error: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
         flash(f'Unexpected error: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
 
-@app.route('/generate-dual', methods=['POST'])
+@bp.route('/generate-dual', methods=['POST'])
 def generate_dual():
     """
     Generate TWO session plans using Coach A and Coach B with different philosophies.
 
     This is the Stage 2 functionality that creates competing plans for comparison.
+    Both coaches are called concurrently, so latency is that of the slower coach.
 
     Form inputs:
     - age_group: Selected age group (U7-U12)
@@ -163,105 +1483,73 @@ def generate_dual():
     - players: Number of players
 
     Returns:
-        Rendered comparison page with both session plans or error
+        Rendered comparison page with both session plans or error (the
+        form with status 429 and Retry-After when the club is not admitted)
     """
     try:
         # Validate client initialization
-        if client is None:
+        if get_client() is None:
             flash('API client not initialized. Check your API key configuration.', 'error')
-            return redirect(url_for('index'))
-
-        # Get form data
-        age_group = request.form.get('age_group', '').strip()
-        objective = request.form.get('objective', '').strip()
-        duration = request.form.get('duration', '').strip()
-        players = request.form.get('players', '').strip()
+            return redirect(url_for('.index'))
 
-        # Validate inputs
-        if not all([age_group, objective, duration, players]):
-            flash('All fields are required.', 'error')
-            return redirect(url_for('index'))
-
-        # Convert and validate numeric inputs
-        try:
-            duration = int(duration)
-            players = int(players)
-        except ValueError:
-            flash('Duration and number of players must be valid numbers.', 'error')
-            return redirect(url_for('index'))
-
-        if duration < 30 or duration > 120:
-            flash('Duration must be between 30 and 120 minutes.', 'error')
-            return redirect(url_for('index'))
-
-        if players < 6 or players > 30:
-            flash('Number of players must be between 6 and 30.', 'error')
-            return redirect(url_for('index'))
+        # Get and validate form data
+        inputs, error = validate_session_inputs(request.form)
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('.index'))
+        age_group, objective, duration, players = inputs
 
         logger.info(f"Generating DUAL session plans: {age_group}, {objective}, {duration}min, {players} players")
 
         # Generate prompts for both coaches
-        coach_a_prompt = get_coach_a_prompt(age_group, objective, duration, players)
-        coach_b_prompt = get_coach_b_prompt(age_group, objective, duration, players)
-
-        logger.debug(f"Coach A prompt length: {len(coach_a_prompt)} characters")
-        logger.debug(f"Coach B prompt length: {len(coach_b_prompt)} characters")
-
-        # Call Claude API for Coach A (Game-Based)
-        logger.info("Calling API for Coach A (Game-Based)...")
-        response_a = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            messages=[{
-                "role": "user",
-                "content": coach_a_prompt
-            }]
-        )
+        coach_a_prompt = build_prompt('A', age_group, objective, duration, players, STRUCTURED_PLANS)
+        coach_b_prompt = build_prompt('B', age_group, objective, duration, players, STRUCTURED_PLANS)
 
-        # Call Claude API for Coach B (Structured)
-        logger.info("Calling API for Coach B (Structured)...")
-        response_b = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            messages=[{
-                "role": "user",
-                "content": coach_b_prompt
-            }]
-        )
+        logger.debug(f"Coach A prompt length: {sum(map(len, coach_a_prompt))} characters")
+        logger.debug(f"Coach B prompt length: {sum(map(len, coach_b_prompt))} characters")
 
-        # Extract session plans from responses
-        if response_a.content and len(response_a.content) > 0:
-            plan_a = response_a.content[0].text
-            logger.info(f"Coach A plan generated. Length: {len(plan_a)} characters")
-            logger.info(f"Coach A tokens: {response_a.usage.input_tokens} input, {response_a.usage.output_tokens} output")
-        else:
-            logger.error("No content in Coach A response")
-            flash('No response received from Coach A. Please try again.', 'error')
-            return redirect(url_for('index'))
-
-        if response_b.content and len(response_b.content) > 0:
-            plan_b = response_b.content[0].text
-            logger.info(f"Coach B plan generated. Length: {len(plan_b)} characters")
-            logger.info(f"Coach B tokens: {response_b.usage.input_tokens} input, {response_b.usage.output_tokens} output")
-        else:
-            logger.error("No content in Coach B response")
-            flash('No response received from Coach B. Please try again.', 'error')
-            return redirect(url_for('index'))
+        # Call Claude API for both coaches concurrently (cache misses wait for the club's turn)
+        logger.info("Calling API for Coach A (Game-Based) and Coach B (Structured) concurrently...")
+        prompts = {'A': coach_a_prompt, 'B': coach_b_prompt}
+        club, priority = admission_key(request.headers, request.form)
+        try:
+            results, errors = run_coaches(prompts, inputs, club, priority)
+        except AdmissionRejected as e:
+            return rejected_page(e)
+
+        if errors:
+            for coach, message in errors.items():
+                flash(f'Coach {coach}: {message}', 'error')
+            return redirect(url_for('.index'))
+
+        result_a = structure_result(results['A'], duration)
+        result_b = structure_result(results['B'], duration)
+        plan_a = result_a['plan']
+        plan_b = result_b['plan']
+        logger.info(f"Coach A plan generated. Length: {len(plan_a)} characters")
+        log_token_usage('Coach A tokens', result_a)
+        logger.info(f"Coach B plan generated. Length: {len(plan_b)} characters")
+        log_token_usage('Coach B tokens', result_b)
 
         # Calculate total tokens
-        total_input_tokens = response_a.usage.input_tokens + response_b.usage.input_tokens
-        total_output_tokens = response_a.usage.output_tokens + response_b.usage.output_tokens
+        total_input_tokens = result_a['input_tokens'] + result_b['input_tokens']
+        total_output_tokens = result_a['output_tokens'] + result_b['output_tokens']
+        total_cache_read_tokens = result_a['cache_read_input_tokens'] + result_b['cache_read_input_tokens']
+        total_cache_write_tokens = (result_a['cache_creation_input_tokens']
+                                    + result_b['cache_creation_input_tokens'])
 
-        logger.info(f"DUAL generation complete. Total tokens: {total_input_tokens} input, {total_output_tokens} output")
+        logger.info(f"DUAL generation complete. Total tokens: {total_input_tokens} input, {total_output_tokens} output, "
+                    f"{total_cache_read_tokens} cache read, {total_cache_write_tokens} cache write")
 
         # Stage 3: Score and compare the plans
         logger.info("Scoring plans using heuristic evaluation...")
-        comparison = compare_plans(plan_a, plan_b)
+        comparison = timed_compare_plans(plan_a, plan_b)
         logger.info(f"Scoring complete. Winner: {comparison['winner']}, Margin: {comparison['margin']}")
         logger.info(f"Score A: {comparison['score_a']['total_score']}/7, Score B: {comparison['score_b']['total_score']}/7")
+        record_debate(age_group, objective, duration, players, result_a, result_b, comparison)
 
         # Render comparison page with scoring
-        return render_template(
+        return render_page(
             'comparison.html',
             age_group=age_group,
             objective=objective,
@@ -269,38 +1557,542 @@ def generate_dual():
             players=players,
             plan_a=plan_a,
             plan_b=plan_b,
-            tokens_a_input=response_a.usage.input_tokens,
-            tokens_a_output=response_a.usage.output_tokens,
-            tokens_b_input=response_b.usage.input_tokens,
-            tokens_b_output=response_b.usage.output_tokens,
+            duration_check_a=result_a['duration_check'],
+            truncated_a=result_a.get('truncated', False),
+            duration_check_b=result_b['duration_check'],
+            truncated_b=result_b.get('truncated', False),
+            tokens_a_input=result_a['input_tokens'],
+            tokens_a_output=result_a['output_tokens'],
+            tokens_b_input=result_b['input_tokens'],
+            tokens_b_output=result_b['output_tokens'],
             total_input_tokens=total_input_tokens,
             total_output_tokens=total_output_tokens,
+            total_cache_read_tokens=total_cache_read_tokens,
+            total_cache_write_tokens=total_cache_write_tokens,
             # Stage 3: Add scoring results
             comparison=comparison,
             limitations=get_limitations_text()
         )
 
-    except APIError as e:
+    except api_errors() as e:
         logger.error(f"Anthropic API error: {e}")
         flash(f'API Error: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
         flash(f'Unexpected error: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
+
+
+@bp.route('/stream')
+def stream_page():
+    """
+    Display a live page that renders plans as they are generated.
+
+    Query inputs are the same as the form fields, plus:
+    - mode: 'single' or 'dual'
+    - early_stop: '1' to stop dual-mode coaches early (see generate_dual_stream)
+
+    Returns:
+        Rendered streaming page, which connects to the matching SSE endpoint
+    """
+    inputs, error = validate_session_inputs(request.args)
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('.index'))
+    age_group, objective, duration, players = inputs
+
+    mode = 'dual' if request.args.get('mode') == 'dual' else 'single'
+    endpoint = '.generate_dual_stream' if mode == 'dual' else '.generate_stream'
+    extra = {'early_stop': '1'} if mode == 'dual' and request.args.get('early_stop') == '1' else {}
+    stream_url = url_for(endpoint, age_group=age_group, objective=objective,
+                         duration=duration, players=players, **extra)
+
+    return render_page(
+        'stream.html',
+        mode=mode,
+        stream_url=stream_url,
+        age_group=age_group,
+        objective=objective,
+        duration=duration,
+        players=players
+    )
+
+
+@bp.route('/generate/stream')
+def generate_stream():
+    """
+    Stream a single session plan as Server-Sent Events.
+
+    Emits token/complete/error events for stream 'plan', then a final
+    'score' event with the score_plan() result and a 'done' event.
+
+    Returns:
+        text/event-stream response, or JSON error with status 400/503 (429
+        with Retry-After when the club is not admitted)
+    """
+    if get_client() is None:
+        return {'error': 'API client not initialized. Check your API key configuration.'}, 503
+
+    inputs, error = validate_session_inputs(request.args)
+    if error:
+        return {'error': error}, 400
+    age_group, objective, duration, players = inputs
+
+    logger.info(f"Streaming session plan: {age_group}, {objective}, {duration}min, {players} players")
+    prompt = build_prompt('base', age_group, objective, duration, players)
+    club, priority = admission_key(request.headers, request.args)
+    try:
+        lookups, admission = admit_streams(club, priority, {'plan': prompt}, duration)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    spent = []
+
+    def events():
+        results = yield from stream_generation_events({'plan': prompt}, duration=duration, lookups=lookups)
+        spent.extend(results.values())
+        if 'plan' in results:
+            yield sse_event('score', timed_score_plan(results['plan']['plan']))
+        yield sse_event('done', {})
+
+    response = Response(
+        stream_with_context(admitted_stream(events(), admission, spent)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # The slot is held until the stream ends or the browser disconnects
+    # (or, if the body is never read, until the response is closed)
+    response.call_on_close(lambda: finish_admission(admission, spent))
+    return response
+
+
+@bp.route('/generate-dual/stream')
+def generate_dual_stream():
+    """
+    Stream Coach A and Coach B plans as two interleaved Server-Sent Event streams.
+
+    Token events are tagged 'A' or 'B'. While they stream, 'partial_score'
+    and 'provisional' events report live rubric totals and the current
+    leader. Once both coaches finish, a 'scores' event carries the
+    compare_plans() result and a 'done' event closes the stream.
+
+    Query inputs are the same as the form fields, plus:
+    - early_stop: '1' stops each coach once its plan scores full marks and
+      has reached min_chars characters (saves output tokens and latency)
+    - min_chars: length budget for early stopping (default EARLY_STOP_MIN_CHARS)
+
+    Returns:
+        text/event-stream response, or JSON error with status 400/503 (429
+        with Retry-After when the club is not admitted)
+    """
+    if get_client() is None:
+        return {'error': 'API client not initialized. Check your API key configuration.'}, 503
+
+    inputs, error = validate_session_inputs(request.args)
+    if error:
+        return {'error': error}, 400
+    age_group, objective, duration, players = inputs
+
+    early_stop_chars = None
+    if request.args.get('early_stop') in ('1', 'true', 'yes'):
+        try:
+            early_stop_chars = int(request.args.get('min_chars', EARLY_STOP_MIN_CHARS))
+        except ValueError:
+            return {'error': 'min_chars must be a number.'}, 400
+
+    logger.info(f"Streaming DUAL session plans: {age_group}, {objective}, {duration}min, {players} players"
+                + (f", early stop at {early_stop_chars} chars" if early_stop_chars is not None else ''))
+    prompts = {
+        'A': build_prompt('A', age_group, objective, duration, players),
+        'B': build_prompt('B', age_group, objective, duration, players)
+    }
+
+    club, priority = admission_key(request.headers, request.args)
+    try:
+        lookups, admission = admit_streams(club, priority, prompts, duration)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    spent = []
+
+    def events():
+        results = yield from stream_generation_events(prompts, early_stop_chars, duration, lookups)
+        spent.extend(results.values())
+        if 'A' in results and 'B' in results:
+            comparison = timed_compare_plans(results['A']['plan'], results['B']['plan'])
+            logger.info(f"Streamed scoring complete. Winner: {comparison['winner']}, Margin: {comparison['margin']}")
+            record_debate(age_group, objective, duration, players, results['A'], results['B'], comparison)
+            yield sse_event('scores', comparison)
+        yield sse_event('done', {})
+
+    response = Response(
+        stream_with_context(admitted_stream(events(), admission, spent)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(lambda: finish_admission(admission, spent))
+    return response
+
+
+def submit_generation_job(kind: str, func: Callable[..., Dict], coaches: Tuple[str, ...]):
+    """
+    Validate a job request and queue it.
+
+    Accepts form fields or a JSON body with the same names. Jobs run as
+    bulk traffic for the club named by X-Club-Id or a 'club' field; a club
+    already over its budget or queue limit is turned away here rather
+    than after queueing.
+
+    Returns:
+        Flask response: 202 with job URLs, 400 on invalid input,
+        429 with Retry-After when the queue is full or the club is over
+        its budget, 503 without a client
+    """
+    if get_client() is None:
+        return {'error': 'API client not initialized. Check your API key configuration.'}, 503
+
+    form = request.form
+    if not form:
+        form = {key: str(value) for key, value in (request.get_json(silent=True) or {}).items()}
+
+    inputs, error = validate_session_inputs(form)
+    if error:
+        return {'error': error}, 400
+    age_group, objective, duration, players = inputs
+
+    club, _ = admission_key(request.headers, form, 'bulk')
+    if scheduler is not None:
+        prompts = {coach: build_prompt(coach, age_group, objective, duration, players, STRUCTURED_PLANS)
+                   for coach in coaches}
+        try:
+            scheduler.check(club, generation_cost(prompts, duration))
+        except AdmissionRejected as e:
+            ADMISSION_DECISIONS.inc(priority='bulk', outcome=e.reason)
+            logger.warning(f"Rejected {kind} job for club {club}: {e}")
+            return rejected_response(e)
+
+    params = {'age_group': age_group, 'objective': objective, 'duration': duration, 'players': players,
+              'club': club}
+    try:
+        job = job_queue.submit(kind, params, func)
+    except QueueFullError as e:
+        logger.warning(f"Rejected {kind} job: {e}")
+        return {'error': str(e)}, 429, {'Retry-After': str(job_queue.retry_after())}
+
+    logger.info(f"Queued {kind} job {job.id}: {age_group}, {objective}, {duration}min, {players} players")
+    status_url = url_for('.job_status', job_id=job.id)
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'events_url': url_for('.job_events', job_id=job.id)
+    }, 202, {'Location': status_url}
+
+
+@bp.route('/jobs/generate', methods=['POST'])
+def generate_job():
+    """Queue a single coach generation job. See submit_generation_job()."""
+    return submit_generation_job('generate', generate_single_job, ('base',))
+
+
+@bp.route('/jobs/generate-dual', methods=['POST'])
+def generate_dual_job_route():
+    """Queue a dual coach generation job. See submit_generation_job()."""
+    return submit_generation_job('generate-dual', generate_dual_job, ('A', 'B'))
+
+
+@bp.route('/tournament', methods=['POST'])
+def tournament():
+    """
+    Run a tournament between coach personas and rank their plans.
+
+    Accepts form fields or a JSON body: the session fields of /generate
+    plus coaches (default: every persona), samples per coach (default 1)
+    and method ('round_robin' or 'bracket').
+
+    Tournaments are bulk traffic for the club named by X-Club-Id or a
+    'club' field.
+
+    Returns:
+        JSON run_tournament() result; 400 on invalid input, 429 with
+        Retry-After when the club is not admitted, 502 if fewer than two
+        plans were generated, 503 without a client
+    """
+    if get_client() is None:
+        return {'error': 'API client not initialized. Check your API key configuration.'}, 503
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = dict(request.form)
+        if len(request.form.getlist('coaches')) > 1:
+            data['coaches'] = request.form.getlist('coaches')
+    inputs, error = validate_session_inputs({key: str(value) for key, value in data.items()
+                                             if key in ('age_group', 'objective', 'duration', 'players')})
+    if not error:
+        options, error = tournament_options(data)
+    if error:
+        return {'error': error}, 400
+    age_group, objective, duration, players = inputs
+    coaches, samples, method = options
+
+    logger.info(f"Running tournament ({', '.join(coaches)} x {samples}, {method}): {age_group}, "
+                f"{objective}, {duration}min, {players} players")
+    club, _ = admission_key(request.headers, data, 'bulk')
+    try:
+        result = run_tournament(age_group, objective, duration, players, coaches, samples, method, club)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+    if len(result['entrants']) < 2:
+        return dict(result, error='Fewer than two plans were generated.'), 502
+    logger.info(f"Tournament complete. Winner: {result['ranking']['winner']}")
+    return result
+
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id: str):
+    """
+    Get a job's status, and its result or error once finished.
+
+    Returns:
+        JSON job description, or 404 if the job is unknown or expired
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'error': 'Job not found'}, 404
+    return job.to_dict()
+
+
+@bp.route('/jobs/<job_id>/events')
+def job_events(job_id: str):
+    """
+    Stream a job's status changes as Server-Sent Events.
+
+    Emits a 'status' event on every change and a final 'result' or 'error'
+    event; a comment line is sent every 15 seconds to keep proxies open.
+
+    Returns:
+        text/event-stream response, or 404 if the job is unknown
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'error': 'Job not found'}, 404
+
+    def events():
+        version = -1
+        while True:
+            current = job.wait_for_change(version, timeout=15)
+            if current == version:
+                yield ': keep-alive\n\n'
+                continue
+            version = current
+            yield sse_event('status', {'id': job.id, 'status': job.status})
+            if job.status == 'succeeded':
+                yield sse_event('result', job.result)
+                return
+            if job.status == 'failed':
+                yield sse_event('error', {'message': job.error})
+                return
+
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def debate_query_args() -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Read debate history filters from the query string.
+
+    Returns:
+        Tuple of (keyword arguments for DebateStore.iter_query, None) when
+        valid, or (None, error_message) when not
+    """
+    args = {
+        'filters': {column: request.args.get(column, '').strip() for column in ('age_group', 'objective', 'winner')},
+        'since': request.args.get('since') or None,
+        'until': request.args.get('until') or None,
+        'cursor': request.args.get('cursor') or None
+    }
+    if args['filters']['winner'] and args['filters']['winner'] not in ('A', 'B', 'TIE'):
+        return None, 'winner must be A, B or TIE.'
+    return args, None
+
+
+@bp.route('/debates')
+def list_debates():
+    """
+    One page of debate history, newest first.
+
+    Query parameters:
+    - age_group, objective, winner: exact-match filters
+    - since, until: ISO 8601 bounds on the creation time
+    - limit: page size (1-500, default 50)
+    - cursor: next_cursor from the previous page
+
+    Returns:
+        JSON with 'debates' (summary rows) and 'next_cursor'
+    """
+    if debate_store is None:
+        return {'error': 'Debate history is disabled.'}, 503
+
+    args, error = debate_query_args()
+    if error:
+        return {'error': error}, 400
+    try:
+        limit = int(request.args.get('limit', '50'))
+    except ValueError:
+        return {'error': 'limit must be a number.'}, 400
+    if limit < 1 or limit > 500:
+        return {'error': 'limit must be between 1 and 500.'}, 400
+
+    try:
+        return debate_store.query(limit=limit, **args)
+    except ValueError as e:
+        return {'error': str(e)}, 400
 
 
-@app.route('/health')
+@bp.route('/debates/export')
+def export_debates():
+    """
+    Stream every matching debate as newline-delimited JSON.
+
+    Takes the same filters as /debates (no limit). Rows are read from the
+    database as they are sent, so exports of any size use constant memory.
+    Add full=1 for complete documents instead of summary rows.
+
+    Returns:
+        application/x-ndjson response, or JSON error with status 400/503
+    """
+    if debate_store is None:
+        return {'error': 'Debate history is disabled.'}, 503
+
+    args, error = debate_query_args()
+    if error:
+        return {'error': error}, 400
+    full = request.args.get('full') in ('1', 'true', 'yes')
+    try:
+        rows = debate_store.iter_query(full=full, **args)
+        # Start the query now so a bad cursor is reported as a 400
+        first = next(rows, None)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    def lines():
+        if first is None:
+            return
+        yield json.dumps(first) + '\n'
+        for row in rows:
+            yield json.dumps(row) + '\n'
+
+    return Response(lines(), mimetype='application/x-ndjson')
+
+
+@bp.route('/debates/<debate_id>')
+def get_debate(debate_id: str):
+    """Full stored debate document, or 404."""
+    if debate_store is None:
+        return {'error': 'Debate history is disabled.'}, 503
+    document = debate_store.get(debate_id)
+    if document is None:
+        return {'error': 'Debate not found.'}, 404
+    return document
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics: latencies, tokens, errors, cache and queue state."""
+    return Response(metrics.registry.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/health')
 def health():
     """Health check endpoint."""
+    client = get_client()
     return {
         'status': 'healthy',
         'api_configured': client is not None,
-        'model': MODEL
+        'model': MODEL,
+        'prompts': prompt_registry.stats(),
+        'plan_cache': plan_cache.stats() if plan_cache is not None else None,
+        'semantic_cache': semantic_cache.stats() if semantic_cache is not None else None,
+        'plan_library': plan_library_report,
+        'single_flight': in_flight.stats() if in_flight is not None else None,
+        'token_budget': token_budget.stats(),
+        'admission': scheduler.stats() if scheduler is not None else None,
+        'jobs': job_queue.stats(),
+        'llm_client': client.stats() if hasattr(client, 'stats') else None,
+        'debates': debate_store.stats() if debate_store is not None else None
     }
 
 
+# One-time startup work shared by every app instance
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_services() -> None:
+    """
+    Load the plan library into the caches and teach the token budget from
+    debate history. Runs once per process, however many apps are created.
+    """
+    global _started, plan_library_report
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+        plan_library_report = load_plan_library()
+        seed_token_budget()
+
+
+def create_app(preload_client: bool = True) -> Flask:
+    """
+    Build the Flask application.
+
+    Configures logging, registers the routes and runs start_services().
+
+    Args:
+        preload_client: Create the Claude client on a background thread,
+            so the first generation does not wait for the SDK import while
+            the app is already serving (False leaves it to first use)
+
+    Returns:
+        Configured Flask app
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    flask_app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
+    flask_app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
+    flask_app.register_blueprint(bp)
+    start_services()
+    if preload_client:
+        threading.Thread(target=get_client, name='client-preload', daemon=True).start()
+    return flask_app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app() -> Flask:
+    """The default app instance, created by create_app() on first call."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+
+def __getattr__(name: str):
+    # `app.app` (flask run, WSGI servers, asgi.py) builds the default app lazily
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
     # Check API key on startup
     if not os.getenv('ANTHROPIC_API_KEY'):
@@ -310,4 +2102,4 @@ if __name__ == '__main__':
 
     # Run Flask app
     logger.info("Starting Flask application...")
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    get_app().run(debug=True, host='127.0.0.1', port=5000)
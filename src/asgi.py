@@ -0,0 +1,473 @@
+"""
+ASGI entry point with async generation routes.
+
+POST /generate and POST /generate-dual are served natively on the event
+loop with AsyncAnthropic, so an in-flight debate costs a coroutine and a
+pooled connection rather than a worker thread, and one process can hold
+hundreds of them. Every other route (form, streaming, jobs, history,
+metrics, health) is the unchanged Flask app, mounted through asgiref's
+WSGI adapter.
+
+The async routes share the Flask app's prompt registry, plan cache,
+debate store, metrics and templates, and their client shares its rate
+limiter and circuit breaker with the sync client, so both paths spend
+the same API budget. They wait on the same admission scheduler, so clubs
+get the same fair shares and budgets on either path.
+
+Usage:
+    pip install uvicorn asgiref
+    uvicorn asgi:application --app-dir src --host 127.0.0.1 --port 5000
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import app as webapp
+from admission import AdmissionRejected
+from llm_client import api_errors, create_async_llm_client_from_env
+from scoring import get_limitations_text
+from single_flight import AsyncSingleFlight
+from token_budget import generate_complete_async
+
+logger = logging.getLogger(__name__)
+
+# Largest form body accepted by the async routes
+MAX_FORM_BYTES = 64 * 1024
+
+try:
+    async_client = create_async_llm_client_from_env(share_with=webapp.get_client())
+    logger.info("Async Anthropic client initialized successfully")
+except Exception as e:
+    logger.error(f"Failed to initialize async Anthropic client: {e}")
+    async_client = None
+
+# Coalesces identical generations on the event loop, like app.in_flight for threads
+in_flight = AsyncSingleFlight(webapp.COALESCE_WAIT_SECONDS) if webapp.in_flight is not None else None
+
+
+class HTTPError(Exception):
+    """An error shown on the form page with the given status code and extra headers."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+async def generate_uncached_async(system_prompt: str, user_prompt: str, coach: str,
+                                  session: Optional[Tuple], keys: Tuple,
+                                  admit_call: Optional[Callable[[], Awaitable]] = None) -> Dict:
+    """
+    Async counterpart of app.generate_uncached(), after app.lookup_plan() missed.
+
+    Args:
+        admit_call: Awaits the admission to hold while making the API call
+            (see admit()). Only the caller that makes the call awaits it, so
+            followers never take a coach slot. None if already admitted.
+
+    Returns:
+        Same dictionary as app.request_plan(), with cached=False
+
+    Raises:
+        HTTPError: 429 if this caller's own admission is rejected (a
+            follower whose leader was rejected tries again as its own club)
+        APIError: If the Anthropic API call fails
+        CircuitOpenError: If the circuit breaker is open
+        ValueError: If the response contains no content
+    """
+    cache_key, similar_key = keys
+    duration = webapp.session_duration(session)
+
+    async def create(params: Dict) -> Dict:
+        try:
+            with webapp.LLM_IN_FLIGHT.track_inprogress(), \
+                    webapp.LLM_REQUEST_SECONDS.time(coach=coach, mode='async'):
+                response = await async_client.messages.create(**params)
+        except Exception as e:
+            webapp.LLM_ERRORS.inc(type=type(e).__name__)
+            raise
+        return webapp.extract_result(response)
+
+    def store(result: Dict) -> None:
+        if cache_key is not None:
+            webapp.plan_cache.set(cache_key, result)
+        if similar_key is not None:
+            webapp.semantic_cache.add(similar_key, session[1], result)
+
+    rejected = []
+
+    async def call() -> Dict:
+        params = webapp.build_message_params(system_prompt, user_prompt,
+                                             webapp.token_budget.budget(coach, duration))
+        if admit_call is None:
+            result = await generate_complete_async(create, params, webapp.TOKEN_CONTINUATIONS)
+        else:
+            try:
+                admission = await admit_call()
+            except HTTPError:
+                rejected.append(True)
+                raise
+            spent = []
+            try:
+                result = await generate_complete_async(create, params, webapp.TOKEN_CONTINUATIONS)
+                spent.append(result)
+            finally:
+                webapp.finish_admission(admission, spent)
+        webapp.record_generation(coach, duration, result)
+        # Cache writes hit SQLite and NumPy: keep them off the event loop
+        if not result['truncated']:
+            await asyncio.to_thread(store, result)
+        return result
+
+    if in_flight is None:
+        return dict(await call(), cached=False, coalesced=False)
+    key = webapp.flight_key(system_prompt, user_prompt, keys)
+    while True:
+        try:
+            result, role = await in_flight.do(key, call)
+        except HTTPError:
+            if rejected:
+                raise
+            continue
+        break
+    webapp.LLM_COALESCED.inc(role=role)
+    return dict(result, cached=False, coalesced=role == 'follower')
+
+
+async def request_plans_async(headers: Dict[str, str], form: Dict, prompts: Dict[str, Tuple[str, str]],
+                              session: Tuple) -> Dict[str, object]:
+    """
+    Async counterpart of app.request_plan() for one plan per coach.
+
+    The cache lookups (SQLite and NumPy) run on a worker thread; only the
+    misses wait for the club's admission, together, and are generated
+    concurrently. A miss whose identical call is already in flight is not
+    admitted: it follows that call, and only admits itself if the call
+    ends before it joins.
+
+    Returns:
+        Mapping of coach to its result, or to the exception its generation
+        raised
+
+    Raises:
+        HTTPError: 429 with Retry-After if the misses are not admitted
+    """
+    lookups = await asyncio.gather(*(asyncio.to_thread(webapp.lookup_plan, *prompt, session)
+                                     for prompt in prompts.values()))
+    outcomes = {}
+    misses = {}
+    for coach, (cached, keys) in zip(prompts, lookups):
+        if cached is not None:
+            outcomes[coach] = cached
+        else:
+            misses[coach] = keys
+    if not misses:
+        return outcomes
+
+    followers = {coach for coach, keys in misses.items()
+                 if in_flight is not None and in_flight.has_leader(webapp.flight_key(*prompts[coach], keys))}
+    admitted = [coach for coach in misses if coach not in followers]
+    admission = None
+    if admitted:
+        admission = await admit(headers, form, {coach: prompts[coach] for coach in admitted}, session[2])
+
+    def own_admission(coach: str) -> Optional[Callable[[], Awaitable]]:
+        if coach not in followers:
+            return None
+        return lambda: admit(headers, form, {coach: prompts[coach]}, session[2])
+
+    generated = []
+    try:
+        generated = await asyncio.gather(*(
+            generate_uncached_async(*prompts[coach], coach, session, keys, own_admission(coach))
+            for coach, keys in misses.items()
+        ), return_exceptions=True)
+    finally:
+        webapp.finish_admission(admission, [outcome for coach, outcome in zip(misses, generated)
+                                            if coach in admitted and isinstance(outcome, dict)])
+    outcomes.update(zip(misses, generated))
+    return {coach: outcomes[coach] for coach in prompts}
+
+
+def render_form_error(message: str) -> str:
+    """The form page showing one error, as a flash() + redirect would."""
+    return render('index.html', age_groups=webapp.AGE_GROUPS,
+                  get_flashed_messages=lambda with_categories=False, category_filter=():
+                  [('error', message)] if with_categories else [message])
+
+
+def render(template: str, **context) -> str:
+    """Render a Flask template without a request context, timed like render_page()."""
+    with webapp.TEMPLATE_RENDER_SECONDS.time(template=template):
+        return webapp.get_app().jinja_env.get_template(template).render(**context)
+
+
+def session_inputs(form: Dict) -> Tuple[str, str, int, int]:
+    """
+    Validate the form, raising HTTPError(400) on bad input.
+
+    Raises:
+        HTTPError: If inputs are missing or out of range, or there is no client
+    """
+    if async_client is None:
+        raise HTTPError(503, 'API client not initialized. Check your API key configuration.')
+    inputs, error = webapp.validate_session_inputs(form)
+    if error:
+        raise HTTPError(400, error)
+    return inputs
+
+
+async def admit(headers: Dict[str, str], form: Dict, prompts: Dict[str, Tuple[str, str]],
+                duration: int):
+    """
+    Async counterpart of app.admit_generation(), using the same scheduler.
+
+    Returns:
+        Admission to pass to app.finish_admission(), or None if admission
+        control is disabled
+
+    Raises:
+        HTTPError: 429 with Retry-After if the club is not admitted
+    """
+    if webapp.scheduler is None:
+        return None
+    club, priority = webapp.admission_key(headers, form)
+    try:
+        admission = await webapp.scheduler.admit_async(club, priority, webapp.generation_cost(prompts, duration),
+                                                       len(prompts))
+    except AdmissionRejected as e:
+        webapp.ADMISSION_DECISIONS.inc(priority=priority, outcome=e.reason)
+        logger.warning(f"Rejected {priority} generation for club {club}: {e}")
+        raise HTTPError(429, str(e), {'Retry-After': str(e.retry_after)})
+    webapp.ADMISSION_DECISIONS.inc(priority=priority, outcome='admitted')
+    webapp.ADMISSION_WAIT_SECONDS.observe(admission.waited, priority=priority)
+    return admission
+
+
+async def generate(form: Dict, headers: Dict[str, str]) -> str:
+    """Async POST /generate: one plan, rendered with result.html."""
+    inputs = session_inputs(form)
+    age_group, objective, duration, players = inputs
+    logger.info(f"Generating session plan (async): {age_group}, {objective}, {duration}min, {players} players")
+
+    prompt = webapp.build_prompt('base', age_group, objective, duration, players,
+                                 webapp.STRUCTURED_PLANS)
+    result = (await request_plans_async(headers, form, {'base': prompt}, inputs))['base']
+    if isinstance(result, ValueError):
+        logger.error("No content in API response")
+        raise HTTPError(502, 'No response received from API. Please try again.')
+    if isinstance(result, BaseException):
+        raise result
+    result = webapp.structure_result(result, duration)
+    webapp.log_token_usage('Tokens used', result)
+
+    return render(
+        'result.html',
+        age_group=age_group,
+        objective=objective,
+        duration=duration,
+        players=players,
+        session_plan=result['plan'],
+        duration_check=result['duration_check'],
+        truncated=result.get('truncated', False),
+        input_tokens=result['input_tokens'],
+        output_tokens=result['output_tokens'],
+        cache_read_tokens=result['cache_read_input_tokens'],
+        cache_write_tokens=result['cache_creation_input_tokens']
+    )
+
+
+async def generate_dual(form: Dict, headers: Dict[str, str]) -> str:
+    """Async POST /generate-dual: both coaches concurrently, compared and saved."""
+    inputs = session_inputs(form)
+    age_group, objective, duration, players = inputs
+    logger.info(f"Generating DUAL session plans (async): {age_group}, {objective}, {duration}min, "
+                f"{players} players")
+
+    prompts = {coach: webapp.build_prompt(coach, age_group, objective, duration, players,
+                                          webapp.STRUCTURED_PLANS)
+               for coach in ('A', 'B')}
+    outcomes = await request_plans_async(headers, form, prompts, inputs)
+
+    errors = []
+    results = {}
+    for coach, outcome in outcomes.items():
+        if isinstance(outcome, api_errors()):
+            logger.error(f"Anthropic API error for Coach {coach}: {outcome}")
+            errors.append(f'Coach {coach}: API Error: {outcome}')
+        elif isinstance(outcome, ValueError):
+            logger.error(f"No content in Coach {coach} response")
+            errors.append(f'Coach {coach}: No response received. Please try again.')
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results[coach] = webapp.structure_result(outcome, duration)
+    if errors:
+        raise HTTPError(502, '; '.join(errors))
+
+    result_a, result_b = results['A'], results['B']
+    webapp.log_token_usage('Coach A tokens', result_a)
+    webapp.log_token_usage('Coach B tokens', result_b)
+
+    comparison = webapp.timed_compare_plans(result_a['plan'], result_b['plan'])
+    logger.info(f"Scoring complete. Winner: {comparison['winner']}, Margin: {comparison['margin']}")
+    # SQLite write: keep it off the event loop
+    await asyncio.to_thread(webapp.record_debate, age_group, objective, duration, players,
+                            result_a, result_b, comparison)
+
+    return render(
+        'comparison.html',
+        age_group=age_group,
+        objective=objective,
+        duration=duration,
+        players=players,
+        plan_a=result_a['plan'],
+        plan_b=result_b['plan'],
+        duration_check_a=result_a['duration_check'],
+        truncated_a=result_a.get('truncated', False),
+        duration_check_b=result_b['duration_check'],
+        truncated_b=result_b.get('truncated', False),
+        tokens_a_input=result_a['input_tokens'],
+        tokens_a_output=result_a['output_tokens'],
+        tokens_b_input=result_b['input_tokens'],
+        tokens_b_output=result_b['output_tokens'],
+        total_input_tokens=result_a['input_tokens'] + result_b['input_tokens'],
+        total_output_tokens=result_a['output_tokens'] + result_b['output_tokens'],
+        total_cache_read_tokens=(result_a['cache_read_input_tokens']
+                                 + result_b['cache_read_input_tokens']),
+        total_cache_write_tokens=(result_a['cache_creation_input_tokens']
+                                  + result_b['cache_creation_input_tokens']),
+        comparison=comparison,
+        limitations=get_limitations_text()
+    )
+
+
+# Routes served natively: (method, path) -> (metrics endpoint name, handler
+# taking the form and the lower-cased request headers)
+ASYNC_ROUTES: Dict[Tuple[str, str], Tuple[str, Callable[[Dict, Dict[str, str]], Awaitable[str]]]] = {
+    ('POST', '/generate'): ('generate', generate),
+    ('POST', '/generate-dual'): ('generate_dual', generate_dual),
+}
+
+
+async def read_form(receive) -> Dict:
+    """
+    Read and decode an application/x-www-form-urlencoded body.
+
+    Raises:
+        HTTPError: If the body exceeds MAX_FORM_BYTES
+    """
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body = message.get('body', b'')
+        size += len(body)
+        if size > MAX_FORM_BYTES:
+            raise HTTPError(413, 'Request body too large.')
+        chunks.append(body)
+        if not message.get('more_body'):
+            break
+    return dict(parse_qsl(b''.join(chunks).decode('utf-8', 'replace'), keep_blank_values=True))
+
+
+async def send_html(send, status: int, html: str, headers: Optional[Dict[str, str]] = None) -> None:
+    body = html.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/html; charset=utf-8'),
+                    (b'content-length', str(len(body)).encode('ascii'))]
+                   + [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                      for name, value in (headers or {}).items()]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class GenerationApp:
+    """
+    ASGI application: async generation routes in front of a fallback app.
+
+    Args:
+        fallback: ASGI app for every other request (the Flask app wrapped
+            for ASGI)
+        client: Async client closed on lifespan shutdown
+    """
+
+    def __init__(self, fallback, client=None):
+        self.fallback = fallback
+        self.client = client
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        route = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if route is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        endpoint, handler = route
+        started = time.perf_counter()
+        webapp.HTTP_IN_FLIGHT.inc()
+        status = 500
+        headers = {}
+        try:
+            try:
+                request_headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                                   for name, value in scope.get('headers', [])}
+                html = await handler(await read_form(receive), request_headers)
+                status = 200
+            except HTTPError as e:
+                status = e.status
+                headers = e.headers
+                html = render_form_error(e.message)
+            except api_errors() as e:
+                logger.error(f"Anthropic API error: {e}")
+                status = 502
+                html = render_form_error(f'API Error: {str(e)}')
+            except Exception as e:
+                logger.error(f"Unexpected error: {e}", exc_info=True)
+                html = render_form_error(f'Unexpected error: {str(e)}')
+            await send_html(send, status, html, headers)
+        finally:
+            webapp.HTTP_IN_FLIGHT.dec()
+            webapp.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            webapp.HTTP_REQUESTS.inc(endpoint=endpoint, status=str(status))
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.client is not None:
+                    await self.client.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(fallback=None) -> GenerationApp:
+    """
+    Build the ASGI application.
+
+    Args:
+        fallback: ASGI app for non-generation routes (default: the Flask
+            app through asgiref.wsgi.WsgiToAsgi)
+
+    Raises:
+        ImportError: If no fallback is given and asgiref is not installed
+    """
+    if fallback is None:
+        from asgiref.wsgi import WsgiToAsgi
+        fallback = WsgiToAsgi(webapp.get_app())
+    return GenerationApp(fallback, async_client)
+
+
+application = create_asgi_app()
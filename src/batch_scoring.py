@@ -0,0 +1,223 @@
+"""
+Batch scoring of session plan corpora.
+
+Re-runs the heuristic rubric over large collections of stored plans, for
+example after the keyword tables in scoring.py change. Plans are read
+lazily, scored in chunks across a process pool with a bounded number of
+chunks in flight, and written out as JSONL in input order, so memory use
+stays flat regardless of corpus size.
+
+Usage:
+    python src/batch_scoring.py plans.jsonl -o scores.jsonl
+    python src/batch_scoring.py context/artefacts/sample_session_plans.json
+    python src/batch_scoring.py archive_dir/ --processes 8 --chunk-size 500
+    python src/batch_scoring.py debates.jsonl --compare
+
+Accepted inputs:
+- .jsonl files: one record per line
+- .json files: a single record or a list of records (loaded whole)
+- .txt/.md files: one plan per file
+- directories: every file of the above types, walked recursively
+
+A record is a plan string, an object with a 'plan'/'text' field, an object
+in the session_plan_schema.yaml shape (title, objectives, steps), or for
+--compare an object with 'plan_a' and 'plan_b' fields.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from plan_parser import plan_to_text
+from scoring import compare_plans, score_plan
+
+TEXT_EXTENSIONS = ('.txt', '.md')
+JSON_EXTENSIONS = ('.json', '.jsonl')
+
+
+def record_to_text(record) -> str:
+    """
+    Extract plan text from any supported record shape.
+
+    Args:
+        record: Plan string, {'plan': ...}/{'text': ...} object, or schema-shaped object
+
+    Returns:
+        Plan text
+
+    Raises:
+        ValueError: If the record has no recognisable plan text
+    """
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        for field in ('plan', 'text', 'session_plan'):
+            if isinstance(record.get(field), str):
+                return record[field]
+        if 'steps' in record or 'title' in record:
+            return plan_to_text(record)
+    raise ValueError(f'Unrecognised plan record: {str(record)[:80]}')
+
+
+def _iter_file_records(path: str) -> Iterator[Tuple[str, object]]:
+    """Yield (record_id, record) pairs from a single file."""
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as handle:
+            for line_number, line in enumerate(handle, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                record_id = record.get('id') if isinstance(record, dict) else None
+                yield record_id or f'{path}:{line_number}', record
+
+    elif path.endswith('.json'):
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+        records = data if isinstance(data, list) else [data]
+        for index, record in enumerate(records):
+            record_id = record.get('id') if isinstance(record, dict) else None
+            yield record_id or f'{path}[{index}]', record
+
+    else:
+        with open(path, encoding='utf-8') as handle:
+            yield path, handle.read()
+
+
+def iter_records(source: str) -> Iterator[Tuple[str, object]]:
+    """
+    Lazily yield (record_id, record) pairs from a file or directory.
+
+    Args:
+        source: Path to a supported file, or a directory to walk
+
+    Yields:
+        Tuples of (record_id, raw record)
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(TEXT_EXTENSIONS + JSON_EXTENSIONS):
+                    yield from _iter_file_records(os.path.join(root, name))
+    else:
+        yield from _iter_file_records(source)
+
+
+def _score_chunk(items: List[Tuple[str, str]]) -> List[Dict]:
+    """Score a chunk of (id, text) pairs. Runs in a worker process."""
+    return [dict(score_plan(text), id=item_id) for item_id, text in items]
+
+
+def _compare_chunk(items: List[Tuple[str, str, str]]) -> List[Dict]:
+    """Compare a chunk of (id, plan_a, plan_b) triples. Runs in a worker process."""
+    return [dict(compare_plans(plan_a, plan_b), id=item_id) for item_id, plan_a, plan_b in items]
+
+
+def _run_chunked(worker, items: Iterable, processes: Optional[int],
+                 chunk_size: int) -> Iterator[Dict]:
+    """
+    Apply a chunk worker across a process pool, yielding results in order.
+
+    At most two chunks per process are in flight, so the input iterable is
+    consumed only as fast as results are produced.
+    """
+    items = iter(items)
+    chunks = iter(lambda: list(islice(items, chunk_size)), [])
+
+    if processes == 1:
+        for chunk in chunks:
+            yield from worker(chunk)
+        return
+
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        max_in_flight = 2 * processes
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(worker, chunk))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def score_many(plans: Iterable[Tuple[str, str]], processes: Optional[int] = None,
+               chunk_size: int = 256) -> Iterator[Dict]:
+    """
+    Score many plans in parallel.
+
+    Args:
+        plans: Iterable of (plan_id, plan_text) pairs; consumed lazily
+        processes: Worker processes (default: CPU count; 1 runs in-process)
+        chunk_size: Plans per task sent to a worker
+
+    Yields:
+        score_plan() dictionaries with an added 'id' field, in input order
+    """
+    return _run_chunked(_score_chunk, plans, processes, chunk_size)
+
+
+def compare_many(pairs: Iterable[Tuple[str, str, str]], processes: Optional[int] = None,
+                 chunk_size: int = 128) -> Iterator[Dict]:
+    """
+    Compare many plan pairs in parallel.
+
+    Args:
+        pairs: Iterable of (pair_id, plan_a, plan_b) triples; consumed lazily
+        processes: Worker processes (default: CPU count; 1 runs in-process)
+        chunk_size: Pairs per task sent to a worker
+
+    Yields:
+        compare_plans() dictionaries with an added 'id' field, in input order
+    """
+    return _run_chunked(_compare_chunk, pairs, processes, chunk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns a process exit code."""
+    parser = argparse.ArgumentParser(description='Score session plans with the heuristic rubric.')
+    parser.add_argument('source', help='JSONL/JSON/text file or directory of plans')
+    parser.add_argument('-o', '--output', help='Output JSONL path (default: stdout)')
+    parser.add_argument('--compare', action='store_true',
+                        help="Compare 'plan_a'/'plan_b' pairs instead of scoring single plans")
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='Plans per worker task (default: 256)')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        items = (
+            (record_id, record_to_text(record['plan_a']), record_to_text(record['plan_b']))
+            for record_id, record in iter_records(args.source)
+        )
+        results = compare_many(items, args.processes, args.chunk_size)
+    else:
+        items = (
+            (record_id, record_to_text(record))
+            for record_id, record in iter_records(args.source)
+        )
+        results = score_many(items, args.processes, args.chunk_size)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        count = 0
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f'Scored {count} records', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
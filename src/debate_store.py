@@ -0,0 +1,348 @@
+"""
+Persistent store of Coach A vs Coach B debates.
+
+Each dual generation (both plans, the compare_plans() result and token
+usage) is written to a SQLite database in WAL mode, so history can be
+analysed later without regenerating anything.
+
+Documents follow context/artefacts/session_plan_schema.yaml (id, title,
+objectives, duration, tags, createdBy, createdAt, updatedAt, debate),
+extended with the debate inputs, both coach plans and the comparison.
+
+The columns used for filtering (age group, objective, winner, created
+time) are stored alongside the JSON document and indexed together with
+created_at, so filtered, newest-first pages are index range scans.
+Pagination is keyset-based (an opaque cursor rather than OFFSET), which
+keeps deep pages as fast as the first one.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Filters accepted by query(); each maps to an indexed column
+FILTER_COLUMNS = ('age_group', 'objective', 'winner')
+
+# Refresh planner statistics after this many writes
+ANALYZE_EVERY = 10000
+
+# Most ids per IN (...) lookup (SQLite's default variable limit is 999)
+LOOKUP_CHUNK = 500
+
+SUMMARY_COLUMNS = ('id', 'created_at', 'age_group', 'objective', 'duration', 'players',
+                   'winner', 'margin', 'score_a', 'score_b', 'model')
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as a fixed-width ISO 8601 string (sorts lexically)."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def build_debate_document(age_group: str, objective: str, duration: int, players: int,
+                          plan_a: str, plan_b: str, comparison: Dict,
+                          tokens_a: Dict, tokens_b: Dict, model: str,
+                          prompt_version: Optional[str] = None, debate_id: Optional[str] = None,
+                          created_at: Optional[str] = None) -> Dict:
+    """
+    Build a debate document in the session plan schema shape.
+
+    Args:
+        age_group, objective, duration, players: Session inputs
+        plan_a, plan_b: Coach A and Coach B plan text
+        comparison: compare_plans() result
+        tokens_a, tokens_b: Per-coach token usage dicts
+        model: Model that generated the plans
+        prompt_version: prompts.PROMPT_VERSION used for both coaches
+        debate_id: Existing id (default: new uuid4)
+        created_at: ISO 8601 timestamp (default: now)
+
+    Returns:
+        JSON-serialisable debate document
+    """
+    created_at = created_at or utc_now_iso()
+    return {
+        'id': debate_id or str(uuid.uuid4()),
+        'title': f'{age_group}: {objective}',
+        'objectives': [objective],
+        'duration': duration,
+        'tags': [age_group],
+        'createdBy': 'debate-system',
+        'createdAt': created_at,
+        'updatedAt': created_at,
+        'ageGroup': age_group,
+        'players': players,
+        'model': model,
+        'promptVersion': prompt_version,
+        'plans': {
+            'A': {'createdBy': 'CoachA', 'text': plan_a, 'tokens': tokens_a},
+            'B': {'createdBy': 'CoachB', 'text': plan_b, 'tokens': tokens_b}
+        },
+        'comparison': comparison,
+        'debate': {'comments': []}
+    }
+
+
+def encode_cursor(created_at: str, debate_id: str) -> str:
+    """Opaque pagination cursor for the row after which the next page starts."""
+    return f'{created_at}|{debate_id}'
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Split a cursor from encode_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    created_at, sep, debate_id = cursor.partition('|')
+    if not sep or not created_at or not debate_id:
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+    return created_at, debate_id
+
+
+class DebateStore:
+    """
+    SQLite-backed debate history.
+
+    Writes share one connection behind a lock. Reads use a connection per
+    thread: in WAL mode they never block (or are blocked by) the writer,
+    so a long streaming export does not stall new debates being saved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS debates ('
+            ' id TEXT PRIMARY KEY,'
+            ' created_at TEXT NOT NULL,'
+            ' age_group TEXT NOT NULL,'
+            ' objective TEXT NOT NULL,'
+            ' duration INTEGER NOT NULL,'
+            ' players INTEGER NOT NULL,'
+            ' winner TEXT NOT NULL,'
+            ' margin INTEGER NOT NULL,'
+            ' score_a INTEGER NOT NULL,'
+            ' score_b INTEGER NOT NULL,'
+            ' model TEXT,'
+            ' document TEXT NOT NULL)'
+        )
+        # Every listing is newest-first, so each index ends in (created_at, id)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_debates_created ON debates (created_at, id)')
+        for column in FILTER_COLUMNS:
+            self._conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_debates_{column} ON debates ({column}, created_at, id)'
+            )
+        self._conn.commit()
+
+        # With several filters the planner must know which index is most
+        # selective (an objective narrows far more than a winner), which
+        # needs sqlite_stat1; refresh it periodically as the table grows.
+        self._writes_since_analyze = 0
+        has_stats = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()
+        if not has_stats:
+            self._analyze()
+
+        # Win tallies for stats(): counted once here and kept current by
+        # save_many(), so health checks never scan the table. Rows written
+        # by other processes are only counted after a restart.
+        self._winners = Counter(dict(self._conn.execute(
+            'SELECT winner, COUNT(*) FROM debates GROUP BY winner'
+        ).fetchall()))
+
+    def _analyze(self) -> None:
+        """Rebuild planner statistics. Caller holds the lock (or is __init__)."""
+        self._conn.execute('ANALYZE')
+        self._conn.commit()
+        self._writes_since_analyze = 0
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(document: Dict) -> Tuple:
+        comparison = document['comparison']
+        return (
+            document['id'],
+            document['createdAt'],
+            document['ageGroup'],
+            document['objectives'][0],
+            document['duration'],
+            document['players'],
+            comparison['winner'],
+            comparison['margin'],
+            comparison['score_a']['total_score'],
+            comparison['score_b']['total_score'],
+            document.get('model'),
+            json.dumps(document)
+        )
+
+    def save_many(self, documents: Iterable[Dict]) -> int:
+        """
+        Insert (or replace) debate documents in a single transaction.
+
+        Args:
+            documents: Outputs of build_debate_document()
+
+        Returns:
+            Number of rows written
+        """
+        rows = [self._row(document) for document in documents]
+        # Winner per id as written (a later duplicate replaces an earlier one)
+        written = {row[0]: row[6] for row in rows}
+        with self._lock:
+            replaced = self._winners_of(list(written))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO debates (id, created_at, age_group, objective, duration,'
+                ' players, winner, margin, score_a, score_b, model, document)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+            self._winners.subtract(replaced)
+            self._winners.update(written.values())
+            self._writes_since_analyze += len(rows)
+            if self._writes_since_analyze >= ANALYZE_EVERY:
+                self._analyze()
+        return len(rows)
+
+    def _winners_of(self, debate_ids: List[str]) -> List[str]:
+        """Winners of the stored debates among debate_ids. Caller holds the lock."""
+        winners = []
+        for start in range(0, len(debate_ids), LOOKUP_CHUNK):
+            chunk = debate_ids[start:start + LOOKUP_CHUNK]
+            winners.extend(winner for (winner,) in self._conn.execute(
+                f'SELECT winner FROM debates WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+            ))
+        return winners
+
+    def save(self, document: Dict) -> str:
+        """Insert (or replace) one debate document. Returns its id."""
+        self.save_many([document])
+        return document['id']
+
+    def get(self, debate_id: str) -> Optional[Dict]:
+        """Full debate document by id, or None."""
+        row = self._reader().execute(
+            'SELECT document FROM debates WHERE id = ?', (debate_id,)
+        ).fetchone()
+        return json.loads(row['document']) if row else None
+
+    def _where(self, filters: Dict, since: Optional[str], until: Optional[str],
+               cursor: Optional[str]) -> Tuple[str, List]:
+        clauses = []
+        params = []
+        for column in FILTER_COLUMNS:
+            value = filters.get(column)
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until:
+            clauses.append('created_at < ?')
+            params.append(until)
+        if cursor:
+            created_at, debate_id = decode_cursor(cursor)
+            clauses.append('(created_at, id) < (?, ?)')
+            params.extend([created_at, debate_id])
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return where, params
+
+    def iter_query(self, filters: Optional[Dict] = None, since: Optional[str] = None,
+                   until: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: Optional[int] = None, full: bool = False) -> Iterator[Dict]:
+        """
+        Stream matching debates, newest first, without loading them all.
+
+        Args:
+            filters: Exact-match values for age_group, objective and/or winner
+            since: Only debates created at or after this ISO 8601 time
+            until: Only debates created before this ISO 8601 time
+            cursor: Continue after the row identified by this cursor
+            limit: Maximum rows (None for all)
+            full: Yield full documents instead of summary rows
+
+        Yields:
+            Summary dicts (SUMMARY_COLUMNS) or full documents
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        where, params = self._where(filters or {}, since, until, cursor)
+        columns = 'document' if full else ', '.join(SUMMARY_COLUMNS)
+        sql = f'SELECT {columns} FROM debates{where} ORDER BY created_at DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        rows = self._reader().execute(sql, params)
+        while True:
+            batch = rows.fetchmany(500)
+            if not batch:
+                break
+            for row in batch:
+                yield json.loads(row['document']) if full else dict(row)
+
+    def query(self, filters: Optional[Dict] = None, since: Optional[str] = None,
+              until: Optional[str] = None, cursor: Optional[str] = None,
+              limit: int = 50) -> Dict:
+        """
+        One page of summary rows.
+
+        Returns:
+            Dictionary with 'debates' (summaries) and 'next_cursor'
+            (None on the last page)
+        """
+        # Fetch one extra row to learn whether another page exists
+        rows = list(self.iter_query(filters, since, until, cursor, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return {'debates': rows, 'next_cursor': next_cursor}
+
+    def stats(self) -> Dict:
+        """Row count and win tallies for the health endpoint (kept in memory, no query)."""
+        with self._lock:
+            winners = {winner: count for winner, count in self._winners.items() if count > 0}
+        return {'debates': sum(winners.values()), 'winners': winners}
+
+
+def create_debate_store_from_env() -> Optional[DebateStore]:
+    """
+    Build the debate store from environment variables.
+
+    Environment:
+        DEBATE_DB: SQLite file path (default data/debates.sqlite3);
+            empty string disables debate history
+
+    Returns:
+        DebateStore, or None if disabled
+    """
+    default_db = os.path.join(os.path.dirname(__file__), '..', 'data', 'debates.sqlite3')
+    db_path = os.getenv('DEBATE_DB', default_db)
+    if not db_path:
+        return None
+    return DebateStore(db_path)
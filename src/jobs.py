@@ -0,0 +1,181 @@
+"""
+Background job queue for generation requests.
+
+Lets the web tier accept a generation request, return a job id
+immediately, and hand the slow LLM work to a bounded worker pool.
+Clients poll the job (or subscribe to its events) for the outcome.
+
+Backpressure: the queue holds at most max_queue_depth unfinished jobs;
+further submissions raise QueueFullError, which the routes turn into
+HTTP 429 with a Retry-After hint.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """
+    A single unit of background work and its outcome.
+
+    Every status change bumps `version` and wakes any waiters, so event
+    streams can block until something new happens.
+    """
+
+    def __init__(self, kind: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def _update(self, **fields) -> None:
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """
+        Block until the job's version differs from `version` or timeout passes.
+
+        Returns:
+            The current version
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> Dict:
+        """Serialise the job for the status endpoint."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'params': self.params,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobQueue:
+    """
+    Bounded thread-pool job queue with in-memory results.
+
+    Args:
+        max_workers: Jobs executed concurrently
+        max_queue_depth: Maximum unfinished (queued + running) jobs
+        result_ttl: Seconds a finished job stays retrievable
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_depth: int = 50, result_ttl: float = 3600):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._unfinished = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, kind: str, params: Dict, func: Callable[..., Dict]) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            kind: Job type label (e.g. 'generate', 'generate-dual')
+            params: Inputs, passed to func as keyword arguments
+            func: Callable returning a JSON-serialisable result dict
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If max_queue_depth unfinished jobs already exist
+        """
+        job = Job(kind, params)
+        with self._lock:
+            self._expire_finished()
+            if self._unfinished >= self.max_queue_depth:
+                self.rejected += 1
+                raise QueueFullError(f'Job queue full ({self.max_queue_depth} pending)')
+            self._unfinished += 1
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Dict]) -> None:
+        job._update(status='running', started_at=time.time())
+        try:
+            result = func(**job.params)
+            job._update(status='succeeded', result=result, finished_at=time.time())
+            succeeded = True
+        except Exception as e:
+            job._update(status='failed', error=str(e), finished_at=time.time())
+            succeeded = False
+        with self._lock:
+            self._unfinished -= 1
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _expire_finished(self) -> None:
+        """Drop finished jobs older than result_ttl. Caller holds the lock."""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def retry_after(self) -> int:
+        """Rough seconds until capacity frees up (assumes ~10 s per job), for Retry-After."""
+        with self._lock:
+            backlog = self._unfinished
+        return max(1, round(backlog / self.max_workers * 10))
+
+    def stats(self) -> Dict:
+        """Queue counters for the health endpoint."""
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            running = sum(1 for job in self._jobs.values() if job.status == 'running')
+            return {
+                'workers': self.max_workers,
+                'max_queue_depth': self.max_queue_depth,
+                'queued': queued,
+                'running': running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
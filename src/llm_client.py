@@ -0,0 +1,703 @@
+"""
+Resilient wrapper around the Anthropic client.
+
+Every call made through ResilientClient.messages goes through:
+- RateLimiter: token buckets for requests and tokens per minute, shared
+  by all threads, so bursts queue locally instead of hitting 429s
+- CircuitBreaker: after repeated transient failures, calls fail fast with
+  CircuitOpenError until a cool-down has passed
+- Retries: exponential backoff with full jitter on rate limits, overload,
+  5xx and connection errors, honouring the server's retry-after header
+
+The underlying client is built with a bounded HTTP connection pool and
+explicit timeouts. Any object with a compatible `messages` attribute can
+be wrapped, so tests and benchmarks can still swap in a fake client.
+
+AsyncResilientClient applies the same policy to AsyncAnthropic for the
+ASGI serving path, waiting with asyncio.sleep instead of blocking a
+thread. It can share the limiter and breaker of a sync client, so both
+paths in one process draw on the same budgets.
+
+The Anthropic SDK takes over a second to import, so it is only imported
+when a real client is built. Until then no SDK error can exist, and the
+error checks below treat the SDK as absent rather than importing it.
+"""
+
+import asyncio
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying: timeout, conflict, rate limit, server errors, overloaded
+RETRYABLE_STATUS_CODES = frozenset((408, 409, 429, 500, 502, 503, 504, 529))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open."""
+
+
+def _loaded_sdk():
+    """The anthropic module if something has imported it, else None."""
+    return sys.modules.get('anthropic')
+
+
+def api_errors() -> Tuple[type, ...]:
+    """
+    Exception types that mean a Claude call failed, for except clauses.
+
+    CircuitOpenError, plus anthropic.APIError once the SDK is loaded
+    (before that, nothing can raise it). Call it in the except clause
+    itself, so catching does not import the SDK.
+    """
+    sdk = _loaded_sdk()
+    return (sdk.APIError, CircuitOpenError) if sdk is not None else (CircuitOpenError,)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    A rate of 0 disables the bucket (reservations never wait).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add tokens for the time elapsed since the last update. Caller holds the lock."""
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` tokens, possibly going into debt.
+
+        Returns:
+            Seconds the caller must wait before the reservation is covered
+        """
+        if not self.rate_per_minute:
+            return 0.0
+        # A single request larger than the bucket would otherwise never fit
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * 60.0 / self.rate_per_minute
+
+    def refund(self, amount: float) -> None:
+        """Return unused tokens (e.g. when a reservation over-estimated usage)."""
+        if not self.rate_per_minute or amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self) -> float:
+        """Tokens currently available (negative while in debt)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for the whole process.
+
+    Callers reserve an estimated token count up front and settle it with the
+    actual usage afterwards, so the TPM bucket tracks what the API counts.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """
+        Reserve one request and `estimated_tokens` tokens without waiting.
+
+        Returns:
+            Seconds the caller must wait before making the call
+        """
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if delay > 0:
+            with self._lock:
+                self.waits += 1
+                self.wait_seconds += delay
+            logger.info(f"Rate limiter delaying call by {delay:.2f}s")
+        return delay
+
+    def acquire(self, estimated_tokens: int) -> None:
+        """Block until one request and `estimated_tokens` tokens are available."""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, estimated_tokens: int) -> None:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage is known."""
+        difference = estimated_tokens - actual_tokens
+        if difference > 0:
+            self.tokens.refund(difference)
+        elif difference < 0:
+            self.tokens.reserve(-difference)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'requests_per_minute': self.requests.rate_per_minute,
+                'tokens_per_minute': self.tokens.rate_per_minute,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 3)
+            }
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_timeout seconds. Then a single trial call is let
+    through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or a trial call is running)
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(
+                f'Claude API temporarily unavailable after repeated failures; '
+                f'retry in {max(1, round(remaining))}s'
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("Circuit breaker closed")
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed transiently (e.g. a 400)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'trips': self.trips
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for transient errors: connection problems, timeouts, 429, 5xx and overload."""
+    sdk = _loaded_sdk()
+    if sdk is None:
+        return False
+    if isinstance(error, sdk.APIConnectionError):
+        return True
+    if isinstance(error, sdk.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after headers."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        # HTTP-date form; fall back to our own backoff
+        return None
+    return None
+
+
+def message_params(system_prompt: str, user_prompt: str, model: str, max_tokens: int,
+                   prompt_caching: bool = True) -> Dict:
+    """
+    Messages API arguments for a (system, user) prompt pair.
+
+    With prompt_caching the static system block is marked with
+    cache_control, so repeated calls with the same persona read it from
+    the prompt cache. Prompts shorter than the model's minimum cacheable
+    length are simply not cached.
+    """
+    system = {'type': 'text', 'text': system_prompt}
+    if prompt_caching:
+        system['cache_control'] = {'type': 'ephemeral'}
+
+    return {
+        'model': model,
+        'max_tokens': max_tokens,
+        'system': [system],
+        'messages': [{
+            "role": "user",
+            "content": user_prompt
+        }]
+    }
+
+
+def extract_result(response) -> Dict:
+    """
+    Extract plan text, token usage and stop reason from an API response.
+
+    Raises:
+        ValueError: If the response contains no content
+    """
+    if not response.content or len(response.content) == 0:
+        raise ValueError('No content in API response')
+
+    usage = response.usage
+    return {
+        'plan': response.content[0].text,
+        'input_tokens': usage.input_tokens,
+        'output_tokens': usage.output_tokens,
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+        'stop_reason': getattr(response, 'stop_reason', None)
+    }
+
+
+def estimate_tokens(params: Dict) -> int:
+    """
+    Rough token cost of a Messages API call for the TPM bucket.
+
+    Counts prompt characters at about four per token plus the full output
+    budget; settle() corrects the estimate once usage is known.
+    """
+    chars = 0
+    system = params.get('system') or ''
+    if isinstance(system, str):
+        chars += len(system)
+    else:
+        chars += sum(len(block.get('text', '')) for block in system)
+    for message in params.get('messages', []):
+        content = message.get('content', '')
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(block.get('text', '')) for block in content)
+    return chars // 4 + params.get('max_tokens', 0)
+
+
+def usage_tokens(message) -> int:
+    """Total tokens the API billed for a message, including prompt-cache traffic."""
+    usage = message.usage
+    return (usage.input_tokens + usage.output_tokens
+            + (getattr(usage, 'cache_creation_input_tokens', None) or 0)
+            + (getattr(usage, 'cache_read_input_tokens', None) or 0))
+
+
+class _ResilientStream:
+    """
+    Context manager wrapping messages.stream().
+
+    Opening the stream is retried like create(); once text has started
+    flowing, a failure is surfaced to the caller rather than retried.
+    """
+
+    def __init__(self, messages: 'ResilientMessages', params: Dict):
+        self._messages = messages
+        self._params = params
+        self._manager = None
+        self._stream = None
+        self._estimate = 0
+
+    def __enter__(self):
+        self._estimate, (self._manager, self._stream) = self._messages._call(self._open, self._params)
+        return self._stream
+
+    def _open(self):
+        manager = self._messages._inner.stream(**self._params)
+        return manager, manager.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        owner = self._messages._owner
+        try:
+            return self._manager.__exit__(exc_type, exc_value, traceback)
+        finally:
+            if exc_type is None:
+                owner.breaker.record_success()
+            else:
+                owner.record_outcome(exc_value)
+            # The snapshot is the final message after a full stream, and the
+            # partial one if the caller stopped reading early or the stream failed
+            owner.limiter.settle(self._estimate, self._used_tokens())
+
+    def _used_tokens(self) -> int:
+        """Tokens billed so far, or 0 if no message snapshot arrived."""
+        try:
+            return usage_tokens(self._stream.current_message_snapshot)
+        except (AttributeError, AssertionError):
+            return 0
+
+
+class ResilientMessages:
+    """Drop-in replacement for client.messages with limits, retries and a breaker."""
+
+    def __init__(self, owner: 'ResilientClient', inner):
+        self._owner = owner
+        self._inner = inner
+
+    def __getattr__(self, name):
+        # messages.batches and anything else pass straight through
+        return getattr(self._inner, name)
+
+    def _call(self, func, params: Dict):
+        """
+        Run func() under the rate limiter, breaker and retry policy.
+
+        Returns:
+            Tuple of (estimated_tokens, func() result)
+        """
+        owner = self._owner
+        estimate = estimate_tokens(params)
+        attempt = 0
+        while True:
+            owner.breaker.before_call()
+            owner.limiter.acquire(estimate)
+            try:
+                result = func()
+            except Exception as e:
+                owner.record_outcome(e)
+                owner.limiter.settle(estimate, 0)
+                if not is_retryable(e) or attempt >= owner.max_retries:
+                    raise
+                delay = owner.backoff_delay(attempt, get_retry_after(e))
+                owner.count_retry()
+                logger.warning(f"Claude API call failed ({e.__class__.__name__}); "
+                               f"retry {attempt + 1}/{owner.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            return estimate, result
+
+    def create(self, **params):
+        """messages.create() with rate limiting, retries and circuit breaking."""
+        estimate, message = self._call(lambda: self._inner.create(**params), params)
+        self._owner.breaker.record_success()
+        self._owner.limiter.settle(estimate, usage_tokens(message))
+        return message
+
+    def stream(self, **params) -> _ResilientStream:
+        """messages.stream() whose connection is rate limited and retried."""
+        return _ResilientStream(self, params)
+
+
+class AsyncResilientMessages:
+    """Async counterpart of ResilientMessages for AsyncAnthropic."""
+
+    def __init__(self, owner: 'ResilientClient', inner):
+        self._owner = owner
+        self._inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    async def create(self, **params):
+        """await messages.create() with rate limiting, retries and circuit breaking."""
+        owner = self._owner
+        estimate = estimate_tokens(params)
+        attempt = 0
+        while True:
+            owner.breaker.before_call()
+            await owner.limiter.acquire_async(estimate)
+            try:
+                message = await self._inner.create(**params)
+            except Exception as e:
+                owner.record_outcome(e)
+                owner.limiter.settle(estimate, 0)
+                if not is_retryable(e) or attempt >= owner.max_retries:
+                    raise
+                delay = owner.backoff_delay(attempt, get_retry_after(e))
+                owner.count_retry()
+                logger.warning(f"Claude API call failed ({e.__class__.__name__}); "
+                               f"retry {attempt + 1}/{owner.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            owner.breaker.record_success()
+            owner.limiter.settle(estimate, usage_tokens(message))
+            return message
+
+
+class ResilientClient:
+    """
+    Wraps an Anthropic (or compatible) client with a resilient `messages` proxy.
+
+    Args:
+        client: Client to wrap; anything with a `messages` attribute
+        limiter: Shared RateLimiter (default: unlimited)
+        breaker: Shared CircuitBreaker (default: 5 failures, 30 s cool-down)
+        max_retries: Retries per call for transient errors
+        backoff_base: First backoff ceiling in seconds (doubles each retry)
+        backoff_max: Upper bound on any single backoff
+    """
+
+    messages_class = ResilientMessages
+
+    def __init__(self, client, limiter: Optional[RateLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.client = client
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.messages = self.messages_class(self, client.messages)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before retry number attempt + 1.
+
+        Full jitter: uniform in [0, min(backoff_max, base * 2**attempt)].
+        A server-provided retry-after is honoured as a lower bound.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def record_outcome(self, error: Exception) -> None:
+        """
+        Feed a failed call into the circuit breaker.
+
+        Only outages (connection errors, 5xx, overload) count as failures.
+        A 429 means the API is healthy but busy, and client errors such as
+        400 say nothing about availability.
+        """
+        if is_retryable(error) and not isinstance(error, _loaded_sdk().RateLimitError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def count_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def stats(self) -> Dict:
+        """Limiter, breaker and retry counters for the health endpoint."""
+        with self._lock:
+            retries = self.retries
+        return {
+            'max_retries': self.max_retries,
+            'retries': retries,
+            'rate_limiter': self.limiter.stats(),
+            'circuit_breaker': self.breaker.stats()
+        }
+
+
+class AsyncResilientClient(ResilientClient):
+    """ResilientClient for AsyncAnthropic (or a compatible async client)."""
+
+    messages_class = AsyncResilientMessages
+
+    async def close(self) -> None:
+        """Close the wrapped client's connection pool, if it has one."""
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            await close()
+
+
+def create_anthropic_client(api_key: Optional[str] = None, max_connections: int = 20,
+                            max_keepalive: int = 10, timeout: float = 60.0,
+                            connect_timeout: float = 5.0) -> 'Anthropic':
+    """
+    Build an Anthropic client with a bounded connection pool and explicit timeouts.
+
+    SDK-level retries are disabled; ResilientClient owns the retry policy.
+    """
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout)
+    )
+    return Anthropic(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def create_async_anthropic_client(api_key: Optional[str] = None, max_connections: int = 200,
+                                  max_keepalive: int = 50, timeout: float = 60.0,
+                                  connect_timeout: float = 5.0) -> 'AsyncAnthropic':
+    """
+    Build an AsyncAnthropic client with a bounded connection pool and explicit timeouts.
+
+    The pool is larger than the sync default: on the event loop a
+    connection, not a thread, is the cost of an in-flight call.
+    """
+    import httpx
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout)
+    )
+    return AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def _limiter_from_env() -> RateLimiter:
+    return RateLimiter(
+        requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '0')),
+        tokens_per_minute=float(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
+    )
+
+
+def _breaker_from_env() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+    )
+
+
+def _policy_from_env() -> Dict:
+    """Retry and backoff settings shared by the sync and async clients."""
+    return {
+        'max_retries': int(os.getenv('LLM_MAX_RETRIES', '3')),
+        'backoff_base': float(os.getenv('LLM_BACKOFF_BASE_SECONDS', '0.5')),
+        'backoff_max': float(os.getenv('LLM_BACKOFF_MAX_SECONDS', '30'))
+    }
+
+
+def create_llm_client_from_env(client=None) -> ResilientClient:
+    """
+    Build the resilient client from environment variables.
+
+    Environment:
+        LLM_MAX_CONNECTIONS: HTTP connection pool size (default 20)
+        LLM_MAX_KEEPALIVE: Idle connections kept open (default 10)
+        LLM_TIMEOUT_SECONDS: Per-call read timeout (default 60)
+        LLM_CONNECT_TIMEOUT_SECONDS: Connect timeout (default 5)
+        LLM_MAX_RETRIES: Retries for transient errors (default 3)
+        LLM_BACKOFF_BASE_SECONDS: First backoff ceiling (default 0.5)
+        LLM_BACKOFF_MAX_SECONDS: Longest single backoff (default 30)
+        LLM_REQUESTS_PER_MINUTE: Request rate limit, 0 = unlimited (default 0)
+        LLM_TOKENS_PER_MINUTE: Token rate limit, 0 = unlimited (default 0)
+        LLM_BREAKER_FAILURES: Consecutive failures that open the circuit (default 5)
+        LLM_BREAKER_RESET_SECONDS: Open-circuit cool-down (default 30)
+
+    Args:
+        client: Existing client to wrap (e.g. a fake); if None an Anthropic
+            client is created with ANTHROPIC_API_KEY
+
+    Returns:
+        Configured ResilientClient
+    """
+    if client is None:
+        client = create_anthropic_client(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '20')),
+            max_keepalive=int(os.getenv('LLM_MAX_KEEPALIVE', '10')),
+            timeout=float(os.getenv('LLM_TIMEOUT_SECONDS', '60')),
+            connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT_SECONDS', '5'))
+        )
+
+    return ResilientClient(client, limiter=_limiter_from_env(), breaker=_breaker_from_env(),
+                           **_policy_from_env())
+
+
+def create_async_llm_client_from_env(client=None,
+                                     share_with: Optional[ResilientClient] = None) -> AsyncResilientClient:
+    """
+    Build the async resilient client from environment variables.
+
+    Environment:
+        LLM_ASYNC_MAX_CONNECTIONS: HTTP connection pool size (default 200)
+        LLM_ASYNC_MAX_KEEPALIVE: Idle connections kept open (default 50)
+        Plus the timeout, retry, rate limit and breaker variables read by
+        create_llm_client_from_env()
+
+    Args:
+        client: Existing async client to wrap (e.g. a fake); if None an
+            AsyncAnthropic client is created with ANTHROPIC_API_KEY
+        share_with: Sync client whose rate limiter and circuit breaker are
+            reused (default: new ones from the environment)
+
+    Returns:
+        Configured AsyncResilientClient
+    """
+    if client is None:
+        client = create_async_anthropic_client(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            max_connections=int(os.getenv('LLM_ASYNC_MAX_CONNECTIONS', '200')),
+            max_keepalive=int(os.getenv('LLM_ASYNC_MAX_KEEPALIVE', '50')),
+            timeout=float(os.getenv('LLM_TIMEOUT_SECONDS', '60')),
+            connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT_SECONDS', '5'))
+        )
+
+    if share_with is not None:
+        limiter, breaker = share_with.limiter, share_with.breaker
+    else:
+        limiter, breaker = _limiter_from_env(), _breaker_from_env()
+    return AsyncResilientClient(client, limiter=limiter, breaker=breaker, **_policy_from_env())
@@ -0,0 +1,381 @@
+"""
+Content-addressed cache for generated session plans.
+
+Plans are keyed by a hash of the fully rendered prompt (system and user
+blocks), the model and the token budget, so identical requests (same age
+group, objective, duration, players and coach persona) are served
+without another API call.
+
+The cache is a chain of tiers checked in order:
+- MemoryTier: in-process LRU with TTL, fastest, lost on restart
+- SQLiteTier: on-disk store with TTL and size-based eviction
+
+Any object with get/set/clear/stats methods can be used as a tier. set()
+takes an optional expires_at time, so an entry promoted from a slower
+tier expires when its source does. A get_entry method, if present,
+returns (value, expires_at) for promotion; a set_many method is used for
+bulk loads, and a max_entries attribute caps how many entries a bulk
+load pushes through set().
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def make_cache_key(system_prompt: str, user_prompt: str, model: str, max_tokens: int) -> str:
+    """
+    Build a cache key for a rendered prompt.
+
+    Args:
+        system_prompt: Static system block
+        user_prompt: Variable user message
+        model: Model name the prompt is sent to
+        max_tokens: Output token budget for the call
+
+    Returns:
+        Hex SHA-256 digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (model, str(max_tokens), system_prompt, user_prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """
+    In-memory LRU tier bounded by entry count.
+
+    Each entry keeps its expiry time (default: ttl_seconds after it was
+    stored; None never expires). Expired entries are treated as misses.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict, expires_at: Optional[float] = None) -> None:
+        if expires_at is None and self.ttl_seconds:
+            expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class SQLiteTier:
+    """
+    On-disk tier backed by a single SQLite file.
+
+    Entries older than ttl_seconds are treated as misses and purged.
+    When the stored payload exceeds max_bytes, the least recently used
+    entries are evicted first.
+    """
+
+    name = 'disk'
+
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS plan_cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_plan_cache_accessed ON plan_cache (accessed_at)'
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, float]]:
+        """Look up a live entry; returns (value, expires_at) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM plan_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM plan_cache WHERE key = ?', (key,))
+                self._conn.commit()
+                self.expirations += 1
+                return None
+            self._conn.execute(
+                'UPDATE plan_cache SET accessed_at = ? WHERE key = ?', (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value), created_at + self.ttl_seconds
+
+    def set(self, key: str, value: Dict, expires_at: Optional[float] = None) -> None:
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO plan_cache (key, value, size, created_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def set_many(self, items: List[Tuple[str, Dict, float]]) -> None:
+        """
+        Store many entries in one transaction (bulk load).
+
+        Args:
+            items: (key, value, created_at) triples; created_at is when the
+                plan was generated, so the TTL runs from then
+        """
+        now = time.time()
+        rows = []
+        for key, value, created_at in items:
+            payload = json.dumps(value)
+            rows.append((key, payload, len(payload), created_at, now))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO plan_cache (key, value, size, created_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then LRU entries until under max_bytes."""
+        cursor = self._conn.execute(
+            'DELETE FROM plan_cache WHERE created_at < ?', (now - self.ttl_seconds,)
+        )
+        self.expirations += cursor.rowcount
+
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM plan_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            'SELECT key, size FROM plan_cache ORDER BY accessed_at ASC'
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany('DELETE FROM plan_cache WHERE key = ?', doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM plan_cache')
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plan_cache'
+            ).fetchone()
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class PlanCache:
+    """
+    Tiered plan cache with hit/miss counters.
+
+    A hit in a slower tier is promoted into every faster tier, keeping
+    the slower tier's expiry time.
+    """
+
+    def __init__(self, tiers: List):
+        self.tiers = tiers
+        ttls = [tier.ttl_seconds for tier in tiers if getattr(tier, 'ttl_seconds', None)]
+        self.ttl_seconds = min(ttls) if ttls else None
+        self.hits = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached plan.
+
+        Args:
+            key: Key from make_cache_key()
+
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        for index, tier in enumerate(self.tiers):
+            if hasattr(tier, 'get_entry'):
+                value, expires_at = tier.get_entry(key) or (None, None)
+            else:
+                value, expires_at = tier.get(key), None
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value, expires_at)
+                with self._lock:
+                    self.hits[tier.name] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict) -> None:
+        """Store a result in every tier."""
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def preload(self, items: Iterable[Tuple[str, Dict, float]]) -> int:
+        """
+        Bulk-store pre-generated results in every tier, e.g. at startup.
+
+        Tiers with set_many() (SQLite) take every entry with its original
+        creation time. Entry-bounded tiers (memory) only take the newest
+        max_entries, rather than churning the whole load through the LRU,
+        and each expires the shortest tier TTL after its creation time.
+
+        Args:
+            items: (key, result, created_at) triples, created_at being the
+                time.time() the plan was generated
+
+        Returns:
+            Number of entries loaded
+        """
+        items = sorted(items, key=lambda item: item[2])
+        for tier in self.tiers:
+            if hasattr(tier, 'set_many'):
+                tier.set_many(items)
+                continue
+            capacity = getattr(tier, 'max_entries', None)
+            if capacity is not None:
+                newest = items[-capacity:] if capacity > 0 else []
+            else:
+                newest = items
+            for key, value, created_at in newest:
+                expires_at = created_at + self.ttl_seconds if self.ttl_seconds else None
+                tier.set(key, value, expires_at)
+        return len(items)
+
+    def clear(self) -> None:
+        """Remove all entries from every tier."""
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> Dict:
+        """
+        Get cache counters for the health endpoint.
+
+        Returns:
+            Dictionary with total hits, misses, hit rate and per-tier stats
+        """
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+        total_hits = sum(hits.values())
+        lookups = total_hits + misses
+        return {
+            'hits': total_hits,
+            'misses': misses,
+            'hit_rate': round(total_hits / lookups, 3) if lookups else 0.0,
+            'tiers': {
+                tier.name: dict(tier.stats(), hits=hits[tier.name])
+                for tier in self.tiers
+            }
+        }
+
+
+def create_plan_cache_from_env() -> Optional[PlanCache]:
+    """
+    Build the plan cache from environment variables.
+
+    Environment:
+        PLAN_CACHE_ENABLED: 'false' disables caching entirely
+        PLAN_CACHE_MEMORY_ENTRIES: LRU size (default 256)
+        PLAN_CACHE_DB: SQLite file path; empty string disables the disk tier
+        PLAN_CACHE_TTL_SECONDS: Entry lifetime in both tiers (default 7 days)
+        PLAN_CACHE_MAX_BYTES: Disk payload budget (default 50 MB)
+
+    Returns:
+        Configured PlanCache, or None if caching is disabled
+    """
+    if os.getenv('PLAN_CACHE_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return None
+
+    ttl_seconds = int(os.getenv('PLAN_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    tiers = [MemoryTier(max_entries=int(os.getenv('PLAN_CACHE_MEMORY_ENTRIES', '256')),
+                        ttl_seconds=ttl_seconds)]
+
+    default_db = os.path.join(os.path.dirname(__file__), '..', 'data', 'plan_cache.sqlite3')
+    db_path = os.getenv('PLAN_CACHE_DB', default_db)
+    if db_path:
+        tiers.append(SQLiteTier(
+            db_path,
+            ttl_seconds=ttl_seconds,
+            max_bytes=int(os.getenv('PLAN_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+        ))
+
+    return PlanCache(tiers)
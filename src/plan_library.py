@@ -0,0 +1,396 @@
+"""
+Precomputed plan library for popular session configurations.
+
+The first request for each age group and common objective pays the full
+generation latency. This module pre-generates those plans off-peak and
+keeps them in an append-only JSONL library; the web app loads the fresh
+entries into the plan cache at startup, so popular requests are cache
+hits from the first one.
+
+A library entry covers one configuration (coach persona, age group,
+objective, duration, players) and records the plan cache key it was
+generated under. An entry is:
+- fresh: the key still matches the current prompts, model, token budget
+  and output format, and it is younger than the maximum age
+- stale: older than the maximum age (regenerated by the next build)
+- outdated: the key no longer matches (e.g. a prompt template changed)
+- missing: never generated, or its generation failed
+
+Usage:
+    python src/plan_library.py build                      # popular objectives x all age groups
+    python src/plan_library.py build --durations 45 60 90 --workers 4
+    python src/plan_library.py build --fake               # offline, no API key
+    python src/plan_library.py report
+
+Objectives are read one per line from context/popular_objectives.txt
+(PLAN_LIBRARY_OBJECTIVES); blank lines and lines starting with # are
+ignored.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from plan_cache import make_cache_key
+from prompts import AGE_GROUPS, PROMPT_VERSION, get_persona_prompt
+from scoring import score_plan
+from token_budget import generate_complete
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_LIBRARY_PATH = os.path.join(PROJECT_ROOT, 'data', 'plan_library.jsonl')
+DEFAULT_OBJECTIVES_PATH = os.path.join(PROJECT_ROOT, 'context', 'popular_objectives.txt')
+
+# Durations and squad size matching the form defaults and common sessions
+STANDARD_DURATIONS = (45, 60, 90)
+STANDARD_PLAYERS = (16,)
+
+# Personas served by /generate ('base') and /generate-dual ('A', 'B')
+LIBRARY_COACHES = ('base', 'A', 'B')
+
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+# Fields identifying a configuration, in order
+SESSION_FIELDS = ('coach', 'age_group', 'objective', 'duration', 'players')
+
+
+def read_objectives(path: str) -> List[str]:
+    """Objectives from a text file, one per line (# comments skipped)."""
+    with open(path, encoding='utf-8') as handle:
+        lines = (line.strip() for line in handle)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def library_configurations(objectives: Iterable[str], age_groups: Iterable[str] = AGE_GROUPS,
+                           durations: Iterable[int] = STANDARD_DURATIONS,
+                           players: Iterable[int] = STANDARD_PLAYERS,
+                           coaches: Iterable[str] = LIBRARY_COACHES) -> List[Dict]:
+    """
+    Every configuration the library should cover.
+
+    Returns:
+        List of session dictionaries with the SESSION_FIELDS keys
+    """
+    return [
+        {'coach': coach, 'age_group': age_group, 'objective': objective,
+         'duration': duration, 'players': squad}
+        for objective, age_group, duration, squad, coach in product(
+            objectives, age_groups, durations, players, coaches)
+    ]
+
+
+def session_id(session: Dict) -> Tuple:
+    """Hashable identity of a configuration."""
+    return tuple(session[field] for field in SESSION_FIELDS)
+
+
+def render_session(session: Dict, model: str, max_tokens: int,
+                   structured: bool = False) -> Tuple[str, str, str]:
+    """
+    Prompts and plan cache key for a configuration, as the web app builds them.
+
+    Returns:
+        Tuple of (system prompt, user prompt, cache key)
+    """
+    system_prompt, user_prompt = get_persona_prompt(
+        session['coach'], session['age_group'], session['objective'],
+        session['duration'], session['players'], structured
+    )
+    return system_prompt, user_prompt, make_cache_key(system_prompt, user_prompt, model, max_tokens)
+
+
+def read_library(path: str) -> Dict[Tuple, Dict]:
+    """
+    Latest library record per configuration.
+
+    The file is append-only, so a later record replaces an earlier one for
+    the same configuration. Unreadable lines are skipped.
+
+    Returns:
+        Mapping of session_id() to record (empty if the file does not exist)
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+                records[session_id(record)] = record
+            except (ValueError, KeyError, TypeError):
+                continue
+    return records
+
+
+def entry_status(record: Optional[Dict], cache_key: str, max_age: float,
+                 now: Optional[float] = None) -> str:
+    """
+    Classify a library record: 'fresh', 'stale', 'outdated' or 'missing'.
+
+    Args:
+        record: Library record, or None
+        cache_key: Key the configuration renders to now
+        max_age: Seconds after which an entry is stale
+        now: Current time (default time.time())
+    """
+    if record is None or 'result' not in record:
+        return 'missing'
+    if record.get('cache_key') != cache_key:
+        return 'outdated'
+    if (now if now is not None else time.time()) - record.get('generated_at', 0) > max_age:
+        return 'stale'
+    return 'fresh'
+
+
+def fresh_entries(records: Dict[Tuple, Dict], model: str, max_tokens: int, structured: bool = False,
+                  max_age: float = DEFAULT_MAX_AGE_SECONDS) -> Iterator[Dict]:
+    """
+    Library entries that are safe to serve.
+
+    Yields:
+        Dictionaries with 'session', 'system_prompt', 'cache_key',
+        'generated_at' and 'result' (a request_plan()-style result without
+        'cached')
+    """
+    now = time.time()
+    for record in records.values():
+        session = {field: record[field] for field in SESSION_FIELDS}
+        system_prompt, _, cache_key = render_session(session, model, max_tokens, structured)
+        if entry_status(record, cache_key, max_age, now) == 'fresh':
+            yield {
+                'session': session,
+                'system_prompt': system_prompt,
+                'cache_key': cache_key,
+                'generated_at': record['generated_at'],
+                'result': record['result']
+            }
+
+
+def library_report(records: Dict[Tuple, Dict], configurations: List[Dict], model: str,
+                   max_tokens: int, structured: bool = False,
+                   max_age: float = DEFAULT_MAX_AGE_SECONDS) -> Dict:
+    """
+    Coverage and staleness of the library against the wanted configurations.
+
+    Returns:
+        Dictionary with configurations, fresh/stale/outdated/missing counts,
+        coverage (fresh share), oldest_fresh_age_seconds, and per age group
+        coverage
+    """
+    now = time.time()
+    counts = {'fresh': 0, 'stale': 0, 'outdated': 0, 'missing': 0}
+    by_age_group: Dict[str, List[int]] = {}
+    oldest = None
+    for session in configurations:
+        record = records.get(session_id(session))
+        _, _, cache_key = render_session(session, model, max_tokens, structured)
+        status = entry_status(record, cache_key, max_age, now)
+        counts[status] += 1
+        group = by_age_group.setdefault(session['age_group'], [0, 0])
+        group[1] += 1
+        if status == 'fresh':
+            group[0] += 1
+            age = now - record['generated_at']
+            oldest = age if oldest is None else max(oldest, age)
+
+    total = len(configurations)
+    return dict(
+        counts,
+        configurations=total,
+        coverage=round(counts['fresh'] / total, 3) if total else 0.0,
+        oldest_fresh_age_seconds=round(oldest) if oldest is not None else None,
+        max_age_seconds=max_age,
+        prompt_version=PROMPT_VERSION,
+        by_age_group={age: round(fresh / wanted, 3) for age, (fresh, wanted) in by_age_group.items()}
+    )
+
+
+def build_library(request_fn: Callable[[str, str], Dict], configurations: List[Dict], path: str,
+                  model: str, max_tokens: int, structured: bool = False,
+                  max_age: float = DEFAULT_MAX_AGE_SECONDS, workers: int = 4,
+                  force: bool = False) -> Dict:
+    """
+    Generate and score plans for configurations without a fresh entry.
+
+    Each plan is appended to the library as soon as it is scored, so an
+    interrupted build keeps the plans it finished.
+
+    Args:
+        request_fn: Generates a plan for (system prompt, user prompt) and
+            returns a request_plan()-style result dict
+        configurations: Output of library_configurations()
+        path: Library JSONL path (appended)
+        model: Model name the prompts are keyed for
+        max_tokens: Output token budget the prompts are keyed for
+        structured: Whether the web app requests JSON plans
+        max_age: Seconds after which an entry is regenerated
+        workers: Concurrent generations
+        force: Regenerate fresh entries too
+
+    Returns:
+        Dictionary with generated, failed and skipped counts
+    """
+    records = read_library(path)
+    now = time.time()
+    pending = []
+    for session in configurations:
+        system_prompt, user_prompt, cache_key = render_session(session, model, max_tokens, structured)
+        if force or entry_status(records.get(session_id(session)), cache_key, max_age, now) != 'fresh':
+            pending.append((session, system_prompt, user_prompt, cache_key))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    summary = {'generated': 0, 'failed': 0, 'skipped': len(configurations) - len(pending)}
+    lock = threading.Lock()
+
+    def generate(item: Tuple[Dict, str, str, str]) -> None:
+        session, system_prompt, user_prompt, cache_key = item
+        try:
+            result = request_fn(system_prompt, user_prompt)
+        except Exception as e:
+            print(f"Failed {session['coach']}/{session['age_group']}/{session['objective']!r}/"
+                  f"{session['duration']}: {e}", file=sys.stderr)
+            with lock:
+                summary['failed'] += 1
+            return
+        record = dict(
+            session,
+            cache_key=cache_key,
+            model=model,
+            max_tokens=max_tokens,
+            structured=structured,
+            prompt_version=PROMPT_VERSION,
+            generated_at=time.time(),
+            result=result,
+            score=score_plan(result['plan'])
+        )
+        with lock:
+            with open(path, 'a', encoding='utf-8') as output:
+                output.write(json.dumps(record) + '\n')
+            summary['generated'] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='library') as executor:
+        list(executor.map(generate, pending))
+    return summary
+
+
+def make_request_fn(client, model: str, max_tokens: int, prompt_caching: bool = True,
+                    max_continuations: int = 2) -> Callable[[str, str], Dict]:
+    """
+    Plan generator for build_library() using a Messages API client.
+
+    Builds requests and reads responses with the web app's helpers
+    (llm_client.message_params() and extract_result()), so library keys and
+    results match its own. Plans stopped by max_tokens are continued like
+    the web app's; one still cut off after max_continuations raises
+    ValueError, so it is not stored.
+    """
+    # Imported here: llm_client pulls in asyncio, which `report` never needs
+    from llm_client import extract_result, message_params
+
+    def create(params: Dict) -> Dict:
+        return extract_result(client.messages.create(**params))
+
+    def request(system_prompt: str, user_prompt: str) -> Dict:
+        params = message_params(system_prompt, user_prompt, model, max_tokens, prompt_caching)
+        result = generate_complete(create, params, max_continuations)
+        if result['truncated']:
+            raise ValueError(f"Plan still cut off at max_tokens after {max_continuations} continuations")
+        return result
+    return request
+
+
+def settings_from_env() -> Dict:
+    """
+    Library settings shared by the CLI and the web app.
+
+    Environment:
+        PLAN_LIBRARY: Library JSONL path (default data/plan_library.jsonl);
+            an empty value disables loading at startup
+        PLAN_LIBRARY_OBJECTIVES: Popular objectives file
+        PLAN_LIBRARY_DURATIONS: Comma-separated durations (default 45,60,90)
+        PLAN_LIBRARY_PLAYERS: Comma-separated squad sizes (default 16)
+        PLAN_LIBRARY_MAX_AGE_SECONDS: Entry lifetime (default 7 days)
+        ANTHROPIC_MODEL, MAX_TOKENS_GENERATION, STRUCTURED_PLANS,
+        PROMPT_CACHING: As for the web app, so keys match its requests
+        TOKEN_CONTINUATIONS: Continuations of a plan cut off by max_tokens (default 2)
+    """
+    def numbers(name: str, default: Iterable[int]) -> Tuple[int, ...]:
+        value = os.getenv(name)
+        return tuple(int(item) for item in value.split(',') if item.strip()) if value else tuple(default)
+
+    return {
+        'path': os.getenv('PLAN_LIBRARY', DEFAULT_LIBRARY_PATH),
+        'objectives_path': os.getenv('PLAN_LIBRARY_OBJECTIVES', DEFAULT_OBJECTIVES_PATH),
+        'durations': numbers('PLAN_LIBRARY_DURATIONS', STANDARD_DURATIONS),
+        'players': numbers('PLAN_LIBRARY_PLAYERS', STANDARD_PLAYERS),
+        'max_age': float(os.getenv('PLAN_LIBRARY_MAX_AGE_SECONDS', str(DEFAULT_MAX_AGE_SECONDS))),
+        'model': os.getenv('ANTHROPIC_MODEL', 'claude-sonnet-4-20250514'),
+        'max_tokens': int(os.getenv('MAX_TOKENS_GENERATION', '1500')),
+        'structured': os.getenv('STRUCTURED_PLANS', 'false').lower() in ('1', 'true', 'yes'),
+        'prompt_caching': os.getenv('PROMPT_CACHING', 'true').lower() not in ('0', 'false', 'no'),
+        'continuations': int(os.getenv('TOKEN_CONTINUATIONS', '2'))
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns a process exit code."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    settings = settings_from_env()
+
+    parser = argparse.ArgumentParser(description='Pre-generate plans for popular session configurations.')
+    parser.add_argument('command', choices=('build', 'report'),
+                        help='build: generate missing and stale plans; report: coverage as JSON')
+    parser.add_argument('--library', default=settings['path'], help='Library JSONL path')
+    parser.add_argument('--objectives', default=settings['objectives_path'],
+                        help='Text file with one objective per line')
+    parser.add_argument('--age-groups', nargs='+', default=AGE_GROUPS, help='Age groups (default: all)')
+    parser.add_argument('--durations', nargs='+', type=int, default=list(settings['durations']),
+                        help='Durations in minutes')
+    parser.add_argument('--players', nargs='+', type=int, default=list(settings['players']),
+                        help='Squad sizes')
+    parser.add_argument('--coaches', nargs='+', default=list(LIBRARY_COACHES), choices=LIBRARY_COACHES,
+                        help='Coach personas (default: base A B)')
+    parser.add_argument('--max-age', type=float, default=settings['max_age'],
+                        help='Seconds before an entry is regenerated')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent generations')
+    parser.add_argument('--force', action='store_true', help='Regenerate fresh entries too')
+    parser.add_argument('--fake', action='store_true', help='Use the offline fake client')
+    args = parser.parse_args(argv)
+
+    configurations = library_configurations(
+        read_objectives(args.objectives), args.age_groups, args.durations, args.players, args.coaches
+    )
+
+    if args.command == 'build':
+        if args.fake:
+            sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+            from fake_anthropic import FakeAnthropic
+            client = FakeAnthropic(latency=0)
+        else:
+            from llm_client import create_llm_client_from_env
+            client = create_llm_client_from_env()
+        summary = build_library(
+            make_request_fn(client, settings['model'], settings['max_tokens'], settings['prompt_caching'],
+                            settings['continuations']),
+            configurations, args.library, settings['model'], settings['max_tokens'],
+            settings['structured'], args.max_age, args.workers, args.force
+        )
+        print(f"Generated {summary['generated']} plans ({summary['failed']} failed, "
+              f"{summary['skipped']} already fresh) in {args.library}", file=sys.stderr)
+        if summary['failed']:
+            return 1
+
+    report = library_report(read_library(args.library), configurations, settings['model'],
+                            settings['max_tokens'], settings['structured'], args.max_age)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Structured session plans.
+
+Turns model output into the step structure of
+context/artefacts/session_plan_schema.yaml (title, objectives, duration,
+steps with name, instructions, duration, equipment and tags).
+
+Two inputs are understood:
+- JSON, as requested by the structured output prompt
+  (prompt_templates/*/structured_output.txt), optionally inside a
+  ```json fence
+- Free-text markdown plans, where each heading (or bold line) that is
+  not just a section grouping sub-headings becomes a step, and durations
+  are read from "(10 minutes)" / "Duration: 5-10 mins" style text
+
+Plans are held in __slots__ classes with tuple fields rather than dicts
+and lists, so many parsed plans stay small in memory. Step durations can
+be checked against the requested session length without rescanning the
+text. JSON plans are scored on their plan_to_text() rendering, the same
+text stored debates keep, so live and batch scores agree.
+"""
+
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# "10 minutes", "5-10 mins", "5 to 10 min"; ranges count at their upper bound
+DURATION_PATTERN = re.compile(
+    r'(\d{1,3})(?:\s*(?:-|–|to)\s*(\d{1,3}))?\s*(?:minutes|minute|mins|min)\b', re.IGNORECASE
+)
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*\S)\s*$')
+BOLD_LINE_PATTERN = re.compile(r'^\*\*([^*]+?)\*\*:?\s*$')
+FIELD_PATTERN = re.compile(r'^[\s\-*•]*\**(equipment|duration)\**\s*:\**\s*(.*)$', re.IGNORECASE)
+JSON_FENCE_PATTERN = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+
+# Bold lines sit below every markdown heading level
+BOLD_LINE_LEVEL = 7
+
+# Phase tags inferred from step names of free-text plans
+PHASE_TAGS = (
+    ('warmup', ('warm', 'activat')),
+    ('cooldown', ('cool', 'recovery')),
+)
+
+# Allowed gap (minutes) between summed step durations and the session length
+DURATION_TOLERANCE = 5
+
+
+def parse_minutes(text: str) -> Optional[int]:
+    """
+    First duration mentioned in text, in minutes.
+
+    Args:
+        text: Text such as "Warm-up (5-10 minutes)"
+
+    Returns:
+        Minutes (upper bound of a range), or None if none is mentioned
+    """
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    return int(match.group(2) or match.group(1))
+
+
+class PlanStep:
+    """One activity of a session plan."""
+
+    __slots__ = ('name', 'instructions', 'duration', 'equipment', 'tags')
+
+    def __init__(self, name: str, instructions: str = '', duration: Optional[int] = None,
+                 equipment: Iterable[str] = (), tags: Iterable[str] = ()):
+        self.name = name
+        self.instructions = instructions
+        self.duration = duration
+        self.equipment = tuple(equipment)
+        self.tags = tuple(tags)
+
+    def to_dict(self) -> Dict:
+        """Step in the session_plan_schema.yaml shape (without an id)."""
+        return {
+            'name': self.name,
+            'instructions': self.instructions,
+            'duration': self.duration,
+            'equipment': list(self.equipment),
+            'tags': list(self.tags)
+        }
+
+    def __repr__(self) -> str:
+        return f'PlanStep({self.name!r}, duration={self.duration!r})'
+
+
+class StructuredPlan:
+    """
+    A session plan as fields instead of free text.
+
+    Attributes:
+        title: Plan title
+        objectives: Tuple of objective strings
+        duration: Total session minutes stated by the plan (None if absent)
+        steps: Tuple of PlanStep
+        source: 'json' if parsed from structured output, 'text' otherwise
+    """
+
+    __slots__ = ('title', 'objectives', 'duration', 'steps', 'source')
+
+    def __init__(self, title: str, steps: Iterable[PlanStep], objectives: Iterable[str] = (),
+                 duration: Optional[int] = None, source: str = 'text'):
+        self.title = title
+        self.objectives = tuple(objectives)
+        self.duration = duration
+        self.steps = tuple(steps)
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, record: Dict, source: str = 'json') -> 'StructuredPlan':
+        """
+        Build a plan from a schema-shaped dictionary.
+
+        Raises:
+            ValueError: If steps are missing or malformed
+        """
+        steps = record.get('steps')
+        if not isinstance(steps, list):
+            raise ValueError("Plan record has no 'steps' list")
+        parsed = []
+        for step in steps:
+            if not isinstance(step, dict) or not step.get('name'):
+                raise ValueError(f'Malformed plan step: {str(step)[:80]}')
+            parsed.append(PlanStep(
+                str(step['name']),
+                str(step.get('instructions') or ''),
+                _as_minutes(step.get('duration')),
+                [str(item) for item in step.get('equipment') or ()],
+                [str(item) for item in step.get('tags') or ()]
+            ))
+        return cls(
+            str(record.get('title') or ''),
+            parsed,
+            [str(item) for item in record.get('objectives') or ()],
+            _as_minutes(record.get('duration')),
+            source
+        )
+
+    @property
+    def planned_minutes(self) -> int:
+        """Sum of the step durations that are known."""
+        return sum(step.duration for step in self.steps if step.duration)
+
+    def check_duration(self, expected: int, tolerance: int = DURATION_TOLERANCE) -> Dict:
+        """
+        Compare summed step durations with the requested session length.
+
+        Args:
+            expected: Requested session duration in minutes
+            tolerance: Allowed difference in minutes
+
+        Returns:
+            Dictionary with expected, planned, difference (planned minus
+            expected), untimed_steps (steps without a duration) and ok
+        """
+        planned = self.planned_minutes
+        untimed = [step.name for step in self.steps if not step.duration]
+        return {
+            'expected': expected,
+            'planned': planned,
+            'difference': planned - expected,
+            'untimed_steps': untimed,
+            'ok': bool(self.steps) and not untimed and abs(planned - expected) <= tolerance
+        }
+
+    def to_dict(self) -> Dict:
+        """Plan in the session_plan_schema.yaml shape (content fields only)."""
+        return {
+            'title': self.title,
+            'objectives': list(self.objectives),
+            'duration': self.duration,
+            'steps': [step.to_dict() for step in self.steps]
+        }
+
+    def to_text(self) -> str:
+        """Render the plan as plain text for display (see plan_to_text())."""
+        return plan_to_text(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f'StructuredPlan({self.title!r}, steps={len(self.steps)}, source={self.source!r})'
+
+
+def _as_minutes(value) -> Optional[int]:
+    """Coerce a JSON duration (int, float or "10 minutes") to whole minutes."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value).strip()
+    return int(value) if value.isdigit() else parse_minutes(value)
+
+
+def plan_to_text(record: Dict) -> str:
+    """
+    Render a session_plan_schema.yaml record as plain plan text.
+
+    Args:
+        record: Plan dictionary with title, objectives, duration and steps
+
+    Returns:
+        Text with a "Name (N minutes)" heading line per step, suitable for
+        display and score_plan()
+    """
+    lines = [record.get('title', '')]
+    if record.get('objectives'):
+        lines.append('Objectives: ' + ', '.join(record['objectives']))
+    if record.get('duration'):
+        lines.append(f"Duration: {record['duration']} minutes")
+
+    for step in record.get('steps', []):
+        heading = step.get('name', '')
+        if step.get('duration'):
+            heading += f" ({step['duration']} minutes)"
+        lines.append('')
+        lines.append(heading)
+        if step.get('instructions'):
+            lines.append(step['instructions'])
+        if step.get('equipment'):
+            lines.append('Equipment: ' + ', '.join(step['equipment']))
+        if step.get('tags'):
+            lines.append('Tags: ' + ', '.join(step['tags']))
+
+    return '\n'.join(lines)
+
+
+def parse_plan_json(text: str) -> StructuredPlan:
+    """
+    Parse structured (JSON) model output.
+
+    Args:
+        text: A JSON object, optionally wrapped in a ```json fence or prose
+
+    Returns:
+        StructuredPlan with source 'json'
+
+    Raises:
+        ValueError: If no schema-shaped JSON object is found
+    """
+    fenced = JSON_FENCE_PATTERN.search(text)
+    if fenced:
+        candidate = fenced.group(1)
+    else:
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError('No JSON object in plan text')
+        candidate = text[start:end + 1]
+    try:
+        record = json.loads(candidate)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Invalid plan JSON: {e}') from e
+    if not isinstance(record, dict):
+        raise ValueError('Plan JSON is not an object')
+    return StructuredPlan.from_dict(record, source='json')
+
+
+def _heading(line: str) -> Optional[Tuple[int, str]]:
+    """(level, text) if the line is a markdown heading or a bold-only line."""
+    match = HEADING_PATTERN.match(line)
+    if match:
+        return len(match.group(1)), match.group(2).strip('*# ').strip()
+    match = BOLD_LINE_PATTERN.match(line.strip())
+    if match:
+        return BOLD_LINE_LEVEL, match.group(1).strip()
+    return None
+
+
+def _phase_tags(name: str) -> List[str]:
+    lowered = name.lower()
+    return [tag for tag, markers in PHASE_TAGS if any(marker in lowered for marker in markers)]
+
+
+def parse_plan_text(text: str) -> StructuredPlan:
+    """
+    Parse a free-text markdown plan into steps.
+
+    Each heading becomes a step unless the next heading is nested below
+    it (e.g. "## Main Activities (40 minutes)" followed by "### Drill 1"),
+    in which case it only groups the steps under it. A level-1 heading (or
+    the first line) is the title. A step's duration comes from its heading,
+    or failing that from a "Duration:" line in its body.
+
+    Args:
+        text: Plan text
+
+    Returns:
+        StructuredPlan with source 'text' (no steps if it has no headings)
+    """
+    lines = text.splitlines()
+    sections = []  # (level, name, body lines)
+    title = ''
+    preamble = []
+    for line in lines:
+        heading = _heading(line)
+        if heading and heading[0] == 1 and not title and not sections:
+            title = heading[1]
+        elif heading:
+            sections.append((heading[0], heading[1], []))
+        elif sections:
+            sections[-1][2].append(line)
+        else:
+            preamble.append(line)
+
+    if not title:
+        first = next((line.strip('#* ').strip() for line in preamble if line.strip()), '')
+        title = first
+
+    steps = []
+    for index, (level, name, body) in enumerate(sections):
+        next_level = sections[index + 1][0] if index + 1 < len(sections) else None
+        if next_level is not None and next_level > level:
+            continue
+
+        duration = parse_minutes(name)
+        equipment = []
+        instructions = []
+        for line in body:
+            field = FIELD_PATTERN.match(line)
+            if field and field.group(1).lower() == 'equipment':
+                equipment.extend(item.strip(' .*') for item in field.group(2).split(',') if item.strip(' .*'))
+                continue
+            if field and duration is None:
+                duration = parse_minutes(field.group(2))
+            if line.strip():
+                instructions.append(line.strip())
+
+        steps.append(PlanStep(name, '\n'.join(instructions), duration, equipment, _phase_tags(name)))
+
+    return StructuredPlan(title, steps, duration=parse_minutes(' '.join(preamble)), source='text')
+
+
+def parse_plan(text: str) -> StructuredPlan:
+    """
+    Parse model output, preferring structured JSON over free text.
+
+    Args:
+        text: Plan text as returned by the model
+
+    Returns:
+        StructuredPlan ('json' source if the text held a valid plan object)
+    """
+    if '{' in text:
+        try:
+            return parse_plan_json(text)
+        except ValueError:
+            pass
+    return parse_plan_text(text)
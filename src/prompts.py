@@ -5,11 +5,143 @@ This module contains prompt templates for different coaching philosophies:
 - Base prompt (Stage 1)
 - Coach A: Game-Based approach (Stage 2+)
 - Coach B: Structured approach (Stage 2+)
+
+Each prompt is split into a static system block (the persona and its
+format requirements) and a small variable user block (age group,
+objective, duration, players). The static block is identical on every
+call, so the API can cache it between requests.
+
+The template text lives in versioned directories under prompt_templates/
+(one file per persona plus the session request), so the philosophies can
+be edited without code changes. PromptRegistry loads a directory once,
+checks its placeholders, and memoizes rendered prompts in a bounded LRU.
+Its version hash changes whenever any template file changes, so it can
+be stored with generated plans or used in downstream cache keys.
+
+A directory may also hold structured_output.txt, which asks the model for
+a JSON plan in the session_plan_schema.yaml step shape (parsed by
+plan_parser). Requesting a structured prompt appends it to the persona's
+system block, so the combined block is still cached per persona.
 """
 
-def get_base_session_prompt(age_group: str, objective: str, duration: int, players: int) -> str:
+import hashlib
+import os
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Tuple
+
+# Age group options
+AGE_GROUPS = ['U7', 'U8', 'U9', 'U10', 'U11', 'U12']
+
+# Template file for each coach persona's system prompt
+PERSONA_TEMPLATE_FILES = {
+    'base': 'base.txt',
+    'A': 'coach_a.txt',
+    'B': 'coach_b.txt'
+}
+
+SESSION_REQUEST_FILE = 'session_request.txt'
+
+# Optional instructions appended to a persona for JSON (structured) output
+STRUCTURED_OUTPUT_FILE = 'structured_output.txt'
+SESSION_REQUEST_FIELDS = frozenset(('age_group', 'objective', 'duration', 'players'))
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'prompt_templates', 'v1')
+
+
+class PromptRegistry:
     """
-    Generate the base prompt for session plan creation.
+    Versioned prompt templates loaded once from a directory.
+
+    Args:
+        template_dir: Directory holding the persona and session request files
+        cache_size: Rendered prompts kept in the LRU memo
+
+    Raises:
+        FileNotFoundError: If a template file is missing
+        ValueError: If the session request uses unknown placeholders
+    """
+
+    def __init__(self, template_dir: str = DEFAULT_TEMPLATE_DIR, cache_size: int = 4096):
+        self.template_dir = os.path.abspath(template_dir)
+        self.system_prompts = {
+            persona: self._load(filename) for persona, filename in PERSONA_TEMPLATE_FILES.items()
+        }
+        self.session_request = self._load(SESSION_REQUEST_FILE)
+        structured_path = os.path.join(self.template_dir, STRUCTURED_OUTPUT_FILE)
+        self.structured_output = (
+            self._load(STRUCTURED_OUTPUT_FILE) if os.path.exists(structured_path) else None
+        )
+
+        fields = {name for _, name, _, _ in Formatter().parse(self.session_request) if name}
+        unknown = fields - SESSION_REQUEST_FIELDS
+        if unknown:
+            raise ValueError(f'{SESSION_REQUEST_FILE} uses unknown placeholders: {sorted(unknown)}')
+
+        digest = hashlib.sha256()
+        for name in sorted(PERSONA_TEMPLATE_FILES.values()) + [SESSION_REQUEST_FILE]:
+            digest.update(name.encode('utf-8') + b'\x00')
+        for persona in sorted(self.system_prompts):
+            digest.update(self.system_prompts[persona].encode('utf-8') + b'\x00')
+        digest.update(self.session_request.encode('utf-8'))
+        if self.structured_output is not None:
+            digest.update(b'\x00' + STRUCTURED_OUTPUT_FILE.encode('utf-8') + b'\x00')
+            digest.update(self.structured_output.encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+        self.render = lru_cache(maxsize=cache_size)(self._render)
+
+    def _load(self, filename: str) -> str:
+        with open(os.path.join(self.template_dir, filename), encoding='utf-8') as handle:
+            return handle.read().rstrip('\n')
+
+    def _render(self, persona: str, age_group: str, objective: str, duration: int,
+                players: int, structured: bool = False) -> Tuple[str, str]:
+        """Uncached render; use self.render (memoized) instead."""
+        system_prompt = self.system_prompts[persona]
+        if structured:
+            if self.structured_output is None:
+                raise ValueError(f'{STRUCTURED_OUTPUT_FILE} is missing from {self.template_dir}')
+            system_prompt += '\n\n' + self.structured_output
+        return (
+            system_prompt,
+            self.session_request.format(
+                age_group=age_group, objective=objective, duration=duration, players=players
+            )
+        )
+
+    def stats(self) -> Dict:
+        """Template version and render memo counters."""
+        info = self.render.cache_info()
+        return {
+            'version': self.version,
+            'template_dir': self.template_dir,
+            'structured_output': self.structured_output is not None,
+            'render_cache': {
+                'hits': info.hits,
+                'misses': info.misses,
+                'size': info.currsize,
+                'max_size': info.maxsize
+            }
+        }
+
+
+# Default registry, chosen with PROMPT_TEMPLATE_DIR (e.g. prompt_templates/v2)
+registry = PromptRegistry(
+    os.getenv('PROMPT_TEMPLATE_DIR') or DEFAULT_TEMPLATE_DIR,
+    cache_size=int(os.getenv('PROMPT_RENDER_CACHE_SIZE', '4096'))
+)
+
+# Static system prompt by coach persona
+PERSONA_SYSTEM_PROMPTS = registry.system_prompts
+
+# Changes whenever any template file changes
+PROMPT_VERSION = registry.version
+
+
+def get_session_request(age_group: str, objective: str, duration: int, players: int) -> str:
+    """
+    Generate the variable user message shared by every persona.
 
     Args:
         age_group: Age group (e.g., "U10", "U12")
@@ -18,36 +150,53 @@ def get_base_session_prompt(age_group: str, objective: str, duration: int, playe
         players: Number of players
 
     Returns:
-        Formatted prompt string for Claude API
+        User message text
+    """
+    return registry.render('base', age_group, objective, duration, players)[1]
+
+
+def get_persona_prompt(persona: str, age_group: str, objective: str, duration: int,
+                       players: int, structured: bool = False) -> Tuple[str, str]:
     """
-    prompt = f"""You are a rugby coach following RFU guidelines for {age_group}.
+    Generate the (system, user) prompt pair for a coach persona.
 
-Create a training session plan for:
-- Objective: {objective}
-- Duration: {duration} minutes
-- Number of players: {players}
-- Focus: Player enjoyment and development over performance
+    Args:
+        persona: Key of PERSONA_SYSTEM_PROMPTS ('base', 'A' or 'B')
+        age_group: Age group (e.g., "U10", "U12")
+        objective: Session objective
+        duration: Session duration in minutes
+        players: Number of players
+        structured: Ask for a JSON plan (see plan_parser) instead of free text
 
-Your session must include:
-1. Warm-up/Activate (5-10 minutes)
-2. Main activities (35-45 minutes total)
-3. Cool down (5 minutes)
+    Returns:
+        Tuple of (static system prompt, variable user message)
+
+    Raises:
+        ValueError: If structured output is requested but the template
+            directory has no structured_output.txt
+    """
+    return registry.render(persona, age_group, objective, duration, players, structured)
 
-For each activity, provide:
-- Activity name
-- Duration
-- Setup/organization
-- Key coaching points (max 3)
-- Safety considerations
 
-Format your response as clear sections with headings."""
+def get_base_session_prompt(age_group: str, objective: str, duration: int, players: int) -> str:
+    """
+    Generate the base prompt for session plan creation as a single message.
 
-    return prompt
+    Args:
+        age_group: Age group (e.g., "U10", "U12")
+        objective: Session objective (e.g., "Improve passing under pressure")
+        duration: Session duration in minutes
+        players: Number of players
+
+    Returns:
+        Formatted prompt string for Claude API
+    """
+    return '\n\n'.join(get_persona_prompt('base', age_group, objective, duration, players))
 
 
 def get_coach_a_prompt(age_group: str, objective: str, duration: int, players: int) -> str:
     """
-    Generate Coach A's prompt (Game-Based / Player-Centered approach).
+    Generate Coach A's prompt (Game-Based / Player-Centered approach) as a single message.
 
     Philosophy: Player-led discovery, constraints-led approach, minimal instruction,
     learning through play, fun-first.
@@ -61,54 +210,12 @@ def get_coach_a_prompt(age_group: str, objective: str, duration: int, players: i
     Returns:
         Formatted prompt string for Coach A
     """
-    prompt = f"""You are COACH A - a rugby coach who follows a GAME-BASED, PLAYER-CENTERED coaching philosophy.
-
-Your core beliefs:
-- Players learn best through discovery and play, not direct instruction
-- Fun and enjoyment are the primary drivers of development
-- Questions are more powerful than commands
-- Skills emerge naturally through properly designed games and constraints
-- Players should talk more than the coach
-- Variety and engagement over repetition and drilling
-
-Create a training session plan for {age_group} players with:
-- Objective: {objective}
-- Duration: {duration} minutes
-- Number of players: {players}
-
-Your session MUST reflect your game-based philosophy:
-
-1. **Warm-up (5-10 minutes):** Fun, playful game that connects to the session theme
-2. **Main Activities (35-45 minutes):** Prioritize small-sided games and opposed practice
-   - Design activities where skills emerge through gameplay
-   - Use constraint manipulation (rule changes, space modifications, player numbers)
-   - Include "questioning breaks" where YOU ask players open-ended questions
-   - Minimize stoppages - let the game flow
-   - Focus on decision-making opportunities, not perfect technique
-3. **Cool Down (5 minutes):** Reflective activity or player-led discussion
-
-For each activity, provide:
-- Activity name
-- Duration
-- Setup/organization
-- **Constraints to manipulate** (e.g., "3-second possession rule", "narrow pitch")
-- **Key coaching QUESTIONS** (not instructions - ask "How could we...?", "What happens if...?")
-- Safety considerations
-
-Your coaching style:
-- Ask questions rather than give answers
-- Let players problem-solve
-- Value creativity and decision-making over perfect execution
-- Emphasize enjoyment and player voice
-
-Format your response as clear sections with headings."""
-
-    return prompt
+    return '\n\n'.join(get_persona_prompt('A', age_group, objective, duration, players))
 
 
 def get_coach_b_prompt(age_group: str, objective: str, duration: int, players: int) -> str:
     """
-    Generate Coach B's prompt (Structured / Coach-Centered approach).
+    Generate Coach B's prompt (Structured / Coach-Centered approach) as a single message.
 
     Philosophy: Progressive skill development, technical focus, systematic building blocks,
     explicit instruction, high repetition.
@@ -122,50 +229,4 @@ def get_coach_b_prompt(age_group: str, objective: str, duration: int, players: i
     Returns:
         Formatted prompt string for Coach B
     """
-    prompt = f"""You are COACH B - a rugby coach who follows a STRUCTURED, COACH-CENTERED coaching philosophy.
-
-Your core beliefs:
-- Proper technique is the foundation of all rugby skills
-- Progressive skill development requires systematic building blocks
-- Clear instruction and demonstration create faster learning
-- Repetition and practice groove correct movement patterns
-- The coach's expertise guides player development
-- Structure and discipline lead to mastery
-
-Create a training session plan for {age_group} players with:
-- Objective: {objective}
-- Duration: {duration} minutes
-- Number of players: {players}
-
-Your session MUST reflect your structured philosophy:
-
-1. **Warm-up (5-10 minutes):** Structured activation with technique elements
-2. **Main Activities (35-45 minutes):** Progressive skill development sequence
-   - Start with technical drills (unopposed, controlled)
-   - Build complexity gradually (add pressure, opposition)
-   - Provide explicit demonstrations and key teaching points
-   - Use high-repetition practice to groove technique
-   - Stop and correct errors immediately
-   - End with application in game-like scenarios
-3. **Cool Down (5 minutes):** Structured recovery with technique review
-
-For each activity, provide:
-- Activity name
-- Duration
-- Setup/organization (detailed, specific)
-- **Key Teaching Points** (explicit technical instructions - "Keep hands up", "Step before pass")
-- **Progressions** (how to increase difficulty systematically)
-- **Common Errors to Correct** (what to watch for and fix)
-- Safety considerations
-
-Your coaching style:
-- Give clear, direct instructions
-- Demonstrate correct technique
-- Provide immediate corrective feedback
-- Emphasize precision and proper form
-- Build skills systematically from simple to complex
-- Maintain control and structure
-
-Format your response as clear sections with headings."""
-
-    return prompt
+    return '\n\n'.join(get_persona_prompt('B', age_group, objective, duration, players))
@@ -0,0 +1,389 @@
+"""
+Vectorised rubric sweeps for tuning the heuristic judge.
+
+Tuning the keyword tables and thresholds in scoring.py by rescoring every
+stored plan once per variant is slow. This module reads a corpus once
+into a plans x keywords count matrix (NumPy), then scores any number of
+rubric variants as matrix products:
+
+- presence hits ('any'/'distinct' criteria) = (counts > 0) @ keyword masks
+- occurrence hits ('occurrences' criteria) = counts @ keyword masks
+- score = sum over criteria of weight * (hits >= threshold)
+
+Keyword counts use str.count() on the lowercased text, exactly as
+count_criterion_hits() does, so the baseline rubric reproduces
+score_plan() totals. For corpora of plan pairs (debate exports),
+each variant's winners are compared with compare_plans() to give a
+winner-flip rate.
+
+The matrix is dense: the vocabulary is a few dozen keywords, so even a
+100,000-plan corpus is a few megabytes.
+
+Usage:
+    python src/rubric_sweep.py debates.jsonl
+    python src/rubric_sweep.py debates.jsonl --thresholds organization=1-4 timing=2,3,4,5
+    python src/rubric_sweep.py plans/ --ablate --add engagement:drill safety:"tackle height"
+    python src/rubric_sweep.py debates.jsonl --variants variants.json -o sweep.jsonl --top 10
+
+A variants file is a JSON list of {"name": ..., "criteria": {criterion:
+{"keywords": [...], "threshold": n, "weight": w, "mode": ...}}}; omitted
+fields keep their baseline values.
+
+Accepted inputs are those of batch_scoring.py. A record with 'plan_a' and
+'plan_b' (or a full debate document with plans.A.text and plans.B.text)
+is a pair; any other record is a single plan.
+"""
+
+import argparse
+import json
+import sys
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from batch_scoring import iter_records, record_to_text
+from scoring import CRITERION_MODES, CRITERION_THRESHOLDS, RUBRIC_KEYWORDS
+
+CRITERIA = tuple(RUBRIC_KEYWORDS)
+
+# Thresholds swept when no variant options are given
+DEFAULT_THRESHOLD_GRID = {
+    'organization': range(1, 4),
+    'timing': range(2, 5),
+    'coaching': range(2, 5),
+    'engagement': range(1, 4)
+}
+
+# Variants scored per block; bounds the plans x (variants x criteria) temporaries
+VARIANT_BLOCK = 32
+
+
+def baseline_rubric() -> Dict:
+    """The rubric score_plan() applies, as a variant."""
+    return {
+        'name': 'baseline',
+        'criteria': {
+            criterion: {
+                'keywords': tuple(RUBRIC_KEYWORDS[criterion]),
+                'mode': CRITERION_MODES[criterion],
+                'threshold': CRITERION_THRESHOLDS[criterion],
+                'weight': 1.0
+            }
+            for criterion in CRITERIA
+        }
+    }
+
+
+def make_variant(name: str, overrides: Dict[str, Dict], base: Optional[Dict] = None) -> Dict:
+    """
+    A rubric variant: base (default: baseline) with per-criterion overrides.
+
+    Args:
+        name: Variant name used in reports
+        overrides: criterion -> dict of keywords/mode/threshold/weight
+
+    Raises:
+        ValueError: If a criterion or mode is unknown
+    """
+    base = base or baseline_rubric()
+    criteria = {criterion: dict(settings) for criterion, settings in base['criteria'].items()}
+    for criterion, settings in overrides.items():
+        if criterion not in criteria:
+            raise ValueError(f'Unknown criterion: {criterion}')
+        if settings.get('mode', criteria[criterion]['mode']) not in ('any', 'distinct', 'occurrences'):
+            raise ValueError(f"Unknown mode for {criterion}: {settings['mode']}")
+        criteria[criterion].update(settings)
+        criteria[criterion]['keywords'] = tuple(criteria[criterion]['keywords'])
+    return {'name': name, 'criteria': criteria}
+
+
+def threshold_variants(grid: Dict[str, Iterable[int]]) -> List[Dict]:
+    """Every combination of the given criterion thresholds."""
+    criteria = list(grid)
+    return [
+        make_variant(','.join(f'{criterion}>={value}' for criterion, value in zip(criteria, values)),
+                     {criterion: {'threshold': value} for criterion, value in zip(criteria, values)})
+        for values in product(*(list(grid[criterion]) for criterion in criteria))
+    ]
+
+
+def weight_variants(grid: Dict[str, Iterable[float]]) -> List[Dict]:
+    """Every combination of the given criterion weights."""
+    criteria = list(grid)
+    return [
+        make_variant(','.join(f'{criterion}*{value:g}' for criterion, value in zip(criteria, values)),
+                     {criterion: {'weight': value} for criterion, value in zip(criteria, values)})
+        for values in product(*(list(grid[criterion]) for criterion in criteria))
+    ]
+
+
+def ablation_variants() -> List[Dict]:
+    """One variant per baseline keyword, with that keyword removed."""
+    return [
+        make_variant(f'-{criterion}:{keyword.strip()}',
+                     {criterion: {'keywords': [other for other in keywords if other != keyword]}})
+        for criterion, keywords in RUBRIC_KEYWORDS.items()
+        for keyword in keywords
+    ]
+
+
+def addition_variants(additions: Iterable[Tuple[str, str]]) -> List[Dict]:
+    """One variant per (criterion, keyword), with that keyword added."""
+    return [
+        make_variant(f'+{criterion}:{keyword}',
+                     {criterion: {'keywords': RUBRIC_KEYWORDS[criterion] + (keyword,)}})
+        for criterion, keyword in additions
+    ]
+
+
+def load_variants(path: str) -> List[Dict]:
+    """Variants from a JSON file (see the module docstring)."""
+    with open(path, encoding='utf-8') as handle:
+        records = json.load(handle)
+    return [make_variant(record.get('name') or f'{path}[{index}]', record.get('criteria', {}))
+            for index, record in enumerate(records)]
+
+
+def vocabulary_of(rubrics: Iterable[Dict]) -> List[str]:
+    """Every keyword any rubric uses, in first-seen order."""
+    seen = {}
+    for rubric in rubrics:
+        for settings in rubric['criteria'].values():
+            for keyword in settings['keywords']:
+                seen.setdefault(keyword, None)
+    return list(seen)
+
+
+def count_matrix(texts: Iterable[str], vocabulary: List[str]) -> np.ndarray:
+    """
+    Non-overlapping keyword occurrence counts per plan.
+
+    Returns:
+        int32 array of shape (plans, keywords)
+    """
+    rows = [[text.count(keyword) for keyword in vocabulary]
+            for text in (text.lower() for text in texts)]
+    return np.array(rows, dtype=np.int32).reshape(len(rows), len(vocabulary))
+
+
+def _pair_texts(record) -> Optional[Tuple[str, str]]:
+    """(plan_a, plan_b) text for pair records, None for single plans."""
+    if not isinstance(record, dict):
+        return None
+    if 'plan_a' in record and 'plan_b' in record:
+        return record_to_text(record['plan_a']), record_to_text(record['plan_b'])
+    plans = record.get('plans')
+    if isinstance(plans, dict) and 'A' in plans and 'B' in plans:
+        return record_to_text(plans['A']), record_to_text(plans['B'])
+    return None
+
+
+def _single_text(record) -> str:
+    if isinstance(record, dict) and isinstance(record.get('result'), dict):
+        return record_to_text(record['result'])
+    return record_to_text(record)
+
+
+def load_corpus(source: str, vocabulary: List[str]) -> Dict:
+    """
+    Read a corpus once into a count matrix.
+
+    Args:
+        source: File or directory accepted by batch_scoring.iter_records()
+        vocabulary: Keywords to count (see vocabulary_of())
+
+    Returns:
+        Dictionary with 'vocabulary', 'counts' (plans x keywords),
+        'ids' (one per plan) and 'pairs' (int array of shape (pairs, 2)
+        indexing the counts rows of plan A and plan B)
+    """
+    texts = []
+    ids = []
+    pairs = []
+    for record_id, record in iter_records(source):
+        pair = _pair_texts(record)
+        if pair is None:
+            ids.append(record_id)
+            texts.append(_single_text(record))
+        else:
+            pairs.append((len(texts), len(texts) + 1))
+            ids.extend((f'{record_id}:A', f'{record_id}:B'))
+            texts.extend(pair)
+    return {
+        'vocabulary': list(vocabulary),
+        'counts': count_matrix(texts, vocabulary),
+        'ids': ids,
+        'pairs': np.array(pairs, dtype=np.int64).reshape(len(pairs), 2)
+    }
+
+
+def _block_operands(rubrics: List[Dict], index: Dict[str, int],
+                    counted: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matrices for the criteria of a block of rubrics that count occurrences
+    (counted=True) or keyword presence (counted=False).
+
+    Returns:
+        Tuple of (keyword masks, thresholds, weights), with one column (one
+        weights row) per (rubric, criterion); weights map columns to rubrics
+    """
+    columns = [(position, rubric['criteria'][criterion])
+               for position, rubric in enumerate(rubrics) for criterion in CRITERIA
+               if (rubric['criteria'][criterion]['mode'] == 'occurrences') == counted]
+    masks = np.zeros((len(index), len(columns)), dtype=np.float32)
+    thresholds = np.empty(len(columns), dtype=np.float32)
+    weights = np.zeros((len(columns), len(rubrics)), dtype=np.float32)
+    for column, (position, settings) in enumerate(columns):
+        for keyword in settings['keywords']:
+            masks[index[keyword], column] = 1
+        threshold = settings['threshold']
+        if settings['mode'] == 'any' and threshold > 1:
+            # 'any' hits are capped at 1, so a higher threshold never passes
+            threshold = np.inf
+        thresholds[column] = threshold
+        weights[column, position] = settings['weight']
+    return masks, thresholds, weights
+
+
+def evaluate(corpus: Dict, rubrics: List[Dict], block: int = VARIANT_BLOCK) -> np.ndarray:
+    """
+    Score every plan under every rubric.
+
+    Products run in float32 so NumPy hands them to BLAS; counts stay
+    exact well beyond any plan length. An 'any' criterion is scored as a
+    presence sum with its threshold capped, which passes exactly when
+    min(hits, 1) would.
+
+    Args:
+        corpus: load_corpus() result; its vocabulary must cover the rubrics
+        rubrics: Variants from baseline_rubric()/make_variant()
+        block: Variants scored per matrix pass
+
+    Returns:
+        float32 array of shape (plans, rubrics) of total scores
+    """
+    matrices = {
+        True: corpus['counts'].astype(np.float32),
+        False: (corpus['counts'] > 0).astype(np.float32)
+    }
+    index = {keyword: position for position, keyword in enumerate(corpus['vocabulary'])}
+    scores = np.zeros((corpus['counts'].shape[0], len(rubrics)), dtype=np.float32)
+    for start in range(0, len(rubrics), block):
+        chunk = rubrics[start:start + block]
+        for counted, matrix in matrices.items():
+            masks, thresholds, weights = _block_operands(chunk, index, counted)
+            if masks.shape[1]:
+                passed = (matrix @ masks >= thresholds).astype(np.float32)
+                scores[:, start:start + len(chunk)] += passed @ weights
+    return scores
+
+
+def sweep(corpus: Dict, rubrics: List[Dict], block: int = VARIANT_BLOCK) -> List[Dict]:
+    """
+    Compare every rubric variant with the baseline rubric.
+
+    Returns:
+        One dictionary per variant, in input order, with name, mean_score,
+        changed_rate (share of plans whose total differs from baseline)
+        and, for pair corpora, flip_rate (share of pairs whose winner
+        differs from compare_plans()) and tie_rate
+    """
+    scores = evaluate(corpus, [baseline_rubric()] + list(rubrics), block)
+    baseline, variants = scores[:, :1], scores[:, 1:]
+    plans = scores.shape[0]
+    changed = (variants != baseline).mean(axis=0) if plans else np.zeros(len(rubrics))
+    means = variants.mean(axis=0) if plans else np.zeros(len(rubrics))
+
+    pairs = corpus['pairs']
+    if len(pairs):
+        baseline_winners = np.sign(baseline[pairs[:, 0]] - baseline[pairs[:, 1]])
+        winners = np.sign(variants[pairs[:, 0]] - variants[pairs[:, 1]])
+        flips = (winners != baseline_winners).mean(axis=0)
+        ties = (winners == 0).mean(axis=0)
+
+    report = []
+    for position, rubric in enumerate(rubrics):
+        row = {
+            'name': rubric['name'],
+            'mean_score': round(float(means[position]), 3),
+            'changed_rate': round(float(changed[position]), 4)
+        }
+        if len(pairs):
+            row['flip_rate'] = round(float(flips[position]), 4)
+            row['tie_rate'] = round(float(ties[position]), 4)
+        report.append(row)
+    return report
+
+
+def _parse_grid(items: List[str], cast) -> Dict[str, List]:
+    """Parse criterion=1-4 / criterion=0.5,1,2 options into a grid."""
+    grid = {}
+    for item in items:
+        criterion, _, values = item.partition('=')
+        if criterion not in RUBRIC_KEYWORDS or not values:
+            raise ValueError(f'Expected criterion=values, got {item!r}')
+        if '-' in values and cast is int:
+            low, high = values.split('-', 1)
+            grid[criterion] = list(range(int(low), int(high) + 1))
+        else:
+            grid[criterion] = [cast(value) for value in values.split(',')]
+    return grid
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns a process exit code."""
+    parser = argparse.ArgumentParser(description='Score rubric variants over a plan corpus in one pass.')
+    parser.add_argument('source', help='JSONL/JSON/text file or directory of plans or debates')
+    parser.add_argument('--thresholds', nargs='+', default=[], metavar='CRITERION=VALUES',
+                        help='Threshold grid, e.g. organization=1-4 timing=2,3,5')
+    parser.add_argument('--weights', nargs='+', default=[], metavar='CRITERION=VALUES',
+                        help='Weight grid, e.g. safety=1,2')
+    parser.add_argument('--ablate', action='store_true', help='Drop each baseline keyword in turn')
+    parser.add_argument('--add', nargs='+', default=[], metavar='CRITERION:KEYWORD',
+                        help='Add each keyword to a criterion in turn')
+    parser.add_argument('--variants', help='JSON file of variants')
+    parser.add_argument('-o', '--output', help='Output JSONL path (default: stdout)')
+    parser.add_argument('--top', type=int, default=0,
+                        help='Print the N variants with the most winner flips (or changed scores)')
+    args = parser.parse_args(argv)
+
+    try:
+        rubrics = []
+        if args.thresholds:
+            rubrics += threshold_variants(_parse_grid(args.thresholds, int))
+        if args.weights:
+            rubrics += weight_variants(_parse_grid(args.weights, float))
+        if args.ablate:
+            rubrics += ablation_variants()
+        if args.add:
+            additions = [item.partition(':')[::2] for item in args.add]
+            rubrics += addition_variants((criterion, keyword.lower()) for criterion, keyword in additions)
+        if args.variants:
+            rubrics += load_variants(args.variants)
+        if not rubrics:
+            rubrics = threshold_variants(DEFAULT_THRESHOLD_GRID) + ablation_variants()
+    except (KeyError, ValueError) as e:
+        parser.error(str(e))
+
+    corpus = load_corpus(args.source, vocabulary_of([baseline_rubric()] + rubrics))
+    report = sweep(corpus, rubrics)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for row in report:
+            output.write(json.dumps(row) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    key = 'flip_rate' if len(corpus['pairs']) else 'changed_rate'
+    for row in sorted(report, key=lambda row: -row[key])[:args.top]:
+        print(f"{row[key]:8.2%}  {row['name']}", file=sys.stderr)
+    print(f"Scored {len(rubrics)} variants over {corpus['counts'].shape[0]} plans "
+          f"({len(corpus['pairs'])} pairs)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
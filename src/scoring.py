@@ -6,7 +6,223 @@ This provides automated winner selection before implementing AI judge in Stage 4
 """
 
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
+
+
+# Keyword tables for each criterion, compiled once at import.
+# See context/scoring_rubric.md for the rationale behind each list.
+RUBRIC_KEYWORDS = {
+    'warmup': ('warm-up', 'warm up', 'warmup', 'activate', 'activation'),
+    'cooldown': ('cool-down', 'cool down', 'cooldown', 'recovery', 'cool-off'),
+    'safety': ('safety', 'safe', 'injury', 'injuries', 'contact control', 'controlled contact'),
+    'organization': ('setup', 'organisation', 'organization', 'area', 'grid', 'space'),
+    'timing': ('duration', 'minutes', 'mins', 'min ', 'seconds', 'secs'),
+    'coaching': ('coaching point', 'teaching point', 'key point', 'question',
+                 'what ', 'how ', 'why ', 'coaching ', 'teaching '),
+    'engagement': ('fun', 'game', 'play', 'challenge', 'competition', 'score', 'teams')
+}
+
+# How hits are counted for each criterion:
+# - 'any': 1 if any keyword appears (stops at the first match)
+# - 'distinct': number of distinct keywords that appear
+# - 'occurrences': total non-overlapping occurrences of every keyword
+CRITERION_MODES = {
+    'warmup': 'any',
+    'cooldown': 'any',
+    'safety': 'distinct',
+    'organization': 'distinct',
+    'timing': 'occurrences',
+    'coaching': 'distinct',
+    'engagement': 'distinct'
+}
+
+# Hits a criterion needs to earn its point
+CRITERION_THRESHOLDS = {
+    'warmup': 1,
+    'cooldown': 1,
+    'safety': 1,
+    'organization': 2,
+    'timing': 3,
+    'coaching': 3,
+    'engagement': 2
+}
+
+
+def count_criterion_hits(text_lower: str) -> Dict[str, int]:
+    """
+    Count keyword hits for every rubric criterion.
+
+    Each keyword check is a single C-level substring search. A combined
+    regex or Aho-Corasick pass over the text benchmarks slower than these
+    searches in CPython, so the tables are kept as plain tuples.
+
+    Args:
+        text_lower: Lowercased plan text
+
+    Returns:
+        Dictionary mapping criterion name to hit count (see CRITERION_MODES)
+    """
+    contains = text_lower.__contains__
+    hits = {}
+    for criterion, keywords in RUBRIC_KEYWORDS.items():
+        mode = CRITERION_MODES[criterion]
+        if mode == 'any':
+            hits[criterion] = int(any(map(contains, keywords)))
+        elif mode == 'distinct':
+            hits[criterion] = sum(map(contains, keywords))
+        else:
+            hits[criterion] = sum(map(text_lower.count, keywords))
+    return hits
+
+
+def _has_border(keyword: str) -> bool:
+    """True if a proper prefix of keyword is also its suffix (matches can overlap)."""
+    return any(keyword[:size] == keyword[-size:] for size in range(1, len(keyword)))
+
+
+class PlanScorer:
+    """
+    Incremental scorer fed with text chunks instead of a whole document.
+
+    Only a tail of the text (one character shorter than the longest
+    keyword) is kept between chunks, so a multi-word keyword such as
+    "coaching point" split across two chunks is still found, and memory
+    stays constant however long the plan is. After any sequence of
+    feed() calls, score() equals score_plan() on the concatenated text.
+
+    Small chunks (single stream deltas) are buffered and searched together
+    once buffer_chars accumulate, or when hits are read, so per-chunk
+    overhead stays low. Presence checks ('any'/'distinct') stop searching
+    for a keyword once it has been seen. Occurrence counts remember where the last counted match
+    of each keyword ended, so matches in the carried-over tail are never
+    counted twice and str.count()'s non-overlapping semantics are kept.
+
+    Args:
+        buffer_chars: Characters buffered before a search pass
+
+    Usage:
+        scorer = PlanScorer()
+        for chunk in chunks:
+            scorer.feed(chunk)
+        result = scorer.score()
+    """
+
+    def __init__(self, buffer_chars: int = 1024):
+        self.buffer_chars = buffer_chars
+        self._buffer = []
+        self._buffered = 0
+        self._tail = ''
+        self._offset = 0  # Lowercased characters consumed so far
+        self._found = set()
+        self._pending = {}
+        self._counts = {}
+        self._next_start = {}
+        for criterion, keywords in RUBRIC_KEYWORDS.items():
+            if CRITERION_MODES[criterion] == 'occurrences':
+                for keyword in keywords:
+                    self._counts[keyword] = 0
+                    self._next_start[keyword] = 0
+            else:
+                self._pending[criterion] = keywords
+        self._overlapping = {keyword for keyword in self._counts if _has_border(keyword)}
+        self._tail_size = max(len(keyword) for keywords in RUBRIC_KEYWORDS.values()
+                              for keyword in keywords) - 1
+
+    def feed(self, chunk: str) -> None:
+        """
+        Consume the next piece of plan text.
+
+        Args:
+            chunk: Text following everything fed so far
+        """
+        if not chunk:
+            return
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= self.buffer_chars:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Search the buffered text together with the carried-over tail."""
+        if not self._buffer:
+            return
+        chunk = ''.join(self._buffer).lower()
+        self._buffer = []
+        self._buffered = 0
+        window = self._tail + chunk
+        window_offset = self._offset - len(self._tail)
+
+        if self._pending:
+            contains = window.__contains__
+            for criterion, keywords in list(self._pending.items()):
+                new = [keyword for keyword in keywords if contains(keyword)]
+                if not new:
+                    continue
+                self._found.update(new)
+                if CRITERION_MODES[criterion] == 'any':
+                    del self._pending[criterion]
+                else:
+                    remaining = tuple(keyword for keyword in keywords if keyword not in self._found)
+                    if remaining:
+                        self._pending[criterion] = remaining
+                    else:
+                        del self._pending[criterion]
+
+        for keyword, next_start in self._next_start.items():
+            start = max(next_start - window_offset, 0)
+            if keyword in self._overlapping:
+                position = window.find(keyword, start)
+                while position != -1:
+                    self._counts[keyword] += 1
+                    start = position + len(keyword)
+                    position = window.find(keyword, start)
+                self._next_start[keyword] = window_offset + start
+            else:
+                count = window.count(keyword, start)
+                if count:
+                    self._counts[keyword] += count
+                    self._next_start[keyword] = (window_offset + window.rfind(keyword, start)
+                                                 + len(keyword))
+
+        self._offset += len(chunk)
+        self._tail = window[-self._tail_size:] if self._tail_size else ''
+
+    def hits(self) -> Dict[str, int]:
+        """Per-criterion hit counts so far, as count_criterion_hits() returns."""
+        self._flush()
+        hits = {}
+        for criterion, keywords in RUBRIC_KEYWORDS.items():
+            mode = CRITERION_MODES[criterion]
+            if mode == 'any':
+                hits[criterion] = int(any(keyword in self._found for keyword in keywords))
+            elif mode == 'distinct':
+                hits[criterion] = sum(keyword in self._found for keyword in keywords)
+            else:
+                hits[criterion] = sum(self._counts[keyword] for keyword in keywords)
+        return hits
+
+    def score(self) -> Dict:
+        """Score of the text fed so far, identical to score_plan() on it."""
+        return build_score(self.hits())
+
+
+def score_chunks(chunks: Iterable[str]) -> Dict:
+    """
+    Score a plan supplied as an iterable of text pieces.
+
+    Suits open files and other streams: score_chunks(open(path)) reads a
+    multi-megabyte export line by line in constant memory.
+
+    Args:
+        chunks: Consecutive pieces of the plan text
+
+    Returns:
+        Same dictionary as score_plan()
+    """
+    scorer = PlanScorer()
+    for chunk in chunks:
+        scorer.feed(chunk)
+    return scorer.score()
 
 
 def score_plan(plan_text: str) -> Dict:
@@ -27,8 +243,20 @@ def score_plan(plan_text: str) -> Dict:
             - feedback: List of feedback messages explaining the score
     """
     # Convert to lowercase for case-insensitive matching
-    text_lower = plan_text.lower()
+    hits = count_criterion_hits(plan_text.lower())
+    return build_score(hits)
 
+
+def build_score(hits: Dict[str, int]) -> Dict:
+    """
+    Turn per-criterion hit counts into a score dictionary.
+
+    Args:
+        hits: Output of count_criterion_hits()
+
+    Returns:
+        Same dictionary as score_plan()
+    """
     # Initialize scoring breakdown
     breakdown = {
         'warmup': False,
@@ -43,68 +271,64 @@ def score_plan(plan_text: str) -> Dict:
     feedback = []
 
     # 1. Warm-up present (1 point)
-    warmup_keywords = ['warm-up', 'warm up', 'warmup', 'activate', 'activation']
-    if any(keyword in text_lower for keyword in warmup_keywords):
+    if hits['warmup'] >= CRITERION_THRESHOLDS['warmup']:
         breakdown['warmup'] = True
         feedback.append("✓ Warm-up section present")
     else:
         feedback.append("✗ Missing warm-up section")
 
     # 2. Cool-down present (1 point)
-    cooldown_keywords = ['cool-down', 'cool down', 'cooldown', 'recovery', 'cool-off']
-    if any(keyword in text_lower for keyword in cooldown_keywords):
+    if hits['cooldown'] >= CRITERION_THRESHOLDS['cooldown']:
         breakdown['cooldown'] = True
         feedback.append("✓ Cool-down section present")
     else:
         feedback.append("✗ Missing cool-down section")
 
     # 3. Safety considerations (1 point)
-    safety_keywords = ['safety', 'safe', 'injury', 'injuries', 'contact control', 'controlled contact']
-    safety_count = sum(1 for keyword in safety_keywords if keyword in text_lower)
-    if safety_count > 0:
+    safety_count = hits['safety']
+    if safety_count >= CRITERION_THRESHOLDS['safety']:
         breakdown['safety'] = True
         feedback.append(f"✓ Safety considerations mentioned ({safety_count} references)")
     else:
         feedback.append("✗ No safety considerations mentioned")
 
     # 4. Activity organization (1 point)
-    # Count occurrences of organization-related keywords
-    org_keywords = ['setup', 'organisation', 'organization', 'area', 'grid', 'space']
-    org_count = sum(1 for keyword in org_keywords if keyword in text_lower)
-    if org_count >= 2:
+    # Count distinct organization-related keywords
+    org_count = hits['organization']
+    org_needed = CRITERION_THRESHOLDS['organization']
+    if org_count >= org_needed:
         breakdown['organization'] = True
         feedback.append(f"✓ Activity organization details provided ({org_count} references)")
     else:
-        feedback.append(f"✗ Limited organization details ({org_count} references, need 2+)")
+        feedback.append(f"✗ Limited organization details ({org_count} references, need {org_needed}+)")
 
     # 5. Time management (1 point)
-    # Count timing references
-    timing_keywords = ['duration', 'minutes', 'mins', 'min ', 'seconds', 'secs']
-    timing_count = sum(text_lower.count(keyword) for keyword in timing_keywords)
-    if timing_count >= 3:
+    # Count every timing reference
+    timing_count = hits['timing']
+    timing_needed = CRITERION_THRESHOLDS['timing']
+    if timing_count >= timing_needed:
         breakdown['timing'] = True
         feedback.append(f"✓ Timing specified for activities ({timing_count} references)")
     else:
-        feedback.append(f"✗ Insufficient timing information ({timing_count} references, need 3+)")
+        feedback.append(f"✗ Insufficient timing information ({timing_count} references, need {timing_needed}+)")
 
     # 6. Coaching points/questions (1 point)
-    coaching_keywords = ['coaching point', 'teaching point', 'key point', 'question',
-                        'what ', 'how ', 'why ', 'coaching ', 'teaching ']
-    coaching_count = sum(1 for keyword in coaching_keywords if keyword in text_lower)
-    if coaching_count >= 3:
+    coaching_count = hits['coaching']
+    coaching_needed = CRITERION_THRESHOLDS['coaching']
+    if coaching_count >= coaching_needed:
         breakdown['coaching'] = True
         feedback.append(f"✓ Coaching guidance provided ({coaching_count} references)")
     else:
-        feedback.append(f"✗ Limited coaching guidance ({coaching_count} references, need 3+)")
+        feedback.append(f"✗ Limited coaching guidance ({coaching_count} references, need {coaching_needed}+)")
 
     # 7. Player engagement (1 point)
-    engagement_keywords = ['fun', 'game', 'play', 'challenge', 'competition', 'score', 'teams']
-    engagement_count = sum(1 for keyword in engagement_keywords if keyword in text_lower)
-    if engagement_count >= 2:
+    engagement_count = hits['engagement']
+    engagement_needed = CRITERION_THRESHOLDS['engagement']
+    if engagement_count >= engagement_needed:
         breakdown['engagement'] = True
         feedback.append(f"✓ Engagement elements present ({engagement_count} references)")
     else:
-        feedback.append(f"✗ Limited engagement elements ({engagement_count} references, need 2+)")
+        feedback.append(f"✗ Limited engagement elements ({engagement_count} references, need {engagement_needed}+)")
 
     # Calculate total score
     total_score = sum(1 for criteria in breakdown.values() if criteria)
@@ -133,9 +357,20 @@ def compare_plans(plan_a: str, plan_b: str) -> Dict:
             - margin: Point difference
             - verdict: Human-readable explanation
     """
-    score_a = score_plan(plan_a)
-    score_b = score_plan(plan_b)
+    return compare_scores(score_plan(plan_a), score_plan(plan_b))
 
+
+def compare_scores(score_a: Dict, score_b: Dict) -> Dict:
+    """
+    Compare two existing score_plan() results without re-scoring.
+
+    Args:
+        score_a: Coach A's score dict
+        score_b: Coach B's score dict
+
+    Returns:
+        Same dictionary as compare_plans()
+    """
     # Determine winner
     diff = score_a['total_score'] - score_b['total_score']
 
@@ -164,6 +399,116 @@ def compare_plans(plan_a: str, plan_b: str) -> Dict:
     }
 
 
+RANKING_METHODS = ('round_robin', 'bracket')
+
+
+def rank_plans(scores: Dict[str, Dict], method: str = 'round_robin') -> Dict:
+    """
+    Rank any number of scored plans from their existing scores.
+
+    Each plan is scored once by the caller; ranking only compares totals.
+    - 'round_robin': every pair meets once (win 1 point, tie 0.5). As
+      totals are numbers, results follow from counting lower and equal
+      totals, so no pairwise comparison is actually run.
+    - 'bracket': single elimination in entry order (byes when the field
+      is not a power of two); a tied match goes to the earlier entrant.
+      Plans are ranked by the round they went out in, then by total.
+
+    Args:
+        scores: Mapping of entrant id to score_plan() result, in seed order
+        method: 'round_robin' or 'bracket'
+
+    Returns:
+        Dictionary containing:
+            - method: Ranking method used
+            - winner: Id of the top plan (None if there are no plans)
+            - standings: List of dicts (id, rank, total_score, and wins,
+              ties, losses and points for round robin, or eliminated_in
+              for bracket), best first
+            - matches: Number of pairings decided
+            - rounds: Bracket rounds as lists of [id, id or None, winner]
+              (bracket only)
+
+    Raises:
+        ValueError: If method is unknown
+    """
+    if method not in RANKING_METHODS:
+        raise ValueError(f'Unknown ranking method: {method}')
+    entrants = list(scores)
+    totals = {entrant: scores[entrant]['total_score'] for entrant in entrants}
+    seed = {entrant: index for index, entrant in enumerate(entrants)}
+    if method == 'round_robin':
+        result = _round_robin(entrants, totals, seed)
+    else:
+        result = _bracket(entrants, totals, seed)
+    standings = result['standings']
+    return dict(result, method=method, winner=standings[0]['id'] if standings else None)
+
+
+def _round_robin(entrants: List[str], totals: Dict[str, int], seed: Dict[str, int]) -> Dict:
+    frequency: Dict[int, int] = {}
+    for total in totals.values():
+        frequency[total] = frequency.get(total, 0) + 1
+    below = {}
+    running = 0
+    for total in sorted(frequency):
+        below[total] = running
+        running += frequency[total]
+
+    standings = []
+    for entrant in entrants:
+        total = totals[entrant]
+        wins = below[total]
+        ties = frequency[total] - 1
+        losses = len(entrants) - 1 - wins - ties
+        standings.append({'id': entrant, 'total_score': total, 'wins': wins, 'ties': ties,
+                          'losses': losses, 'points': wins + ties / 2})
+    standings.sort(key=lambda row: (-row['points'], seed[row['id']]))
+    for index, row in enumerate(standings):
+        tied_with_previous = index and row['points'] == standings[index - 1]['points']
+        row['rank'] = standings[index - 1]['rank'] if tied_with_previous else index + 1
+    return {'standings': standings, 'matches': len(entrants) * (len(entrants) - 1) // 2}
+
+
+def _bracket(entrants: List[str], totals: Dict[str, int], seed: Dict[str, int]) -> Dict:
+    eliminated_in = {}
+    rounds = []
+    field = list(entrants)
+    matches = 0
+    round_number = 0
+    while len(field) > 1:
+        round_number += 1
+        pairs = []
+        survivors = []
+        for index in range(0, len(field), 2):
+            first = field[index]
+            second = field[index + 1] if index + 1 < len(field) else None
+            if second is None:
+                winner = first
+            else:
+                matches += 1
+                winner = second if totals[second] > totals[first] else first
+                eliminated_in[second if winner == first else first] = round_number
+            pairs.append([first, second, winner])
+            survivors.append(winner)
+        rounds.append(pairs)
+        field = survivors
+
+    final_round = round_number + 1
+    for entrant in field:
+        eliminated_in[entrant] = final_round
+    standings = sorted(
+        ({'id': entrant, 'total_score': totals[entrant], 'eliminated_in': eliminated_in[entrant]}
+         for entrant in entrants),
+        key=lambda row: (-row['eliminated_in'], -row['total_score'], seed[row['id']])
+    )
+    for index, row in enumerate(standings):
+        row['rank'] = index + 1
+        if row['eliminated_in'] == final_round:
+            row['eliminated_in'] = None
+    return {'standings': standings, 'matches': matches, 'rounds': rounds}
+
+
 def get_score_interpretation(score: int, max_score: int = 7) -> Tuple[str, str]:
     """
     Get interpretation and color for a score.
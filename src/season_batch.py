@@ -0,0 +1,254 @@
+"""
+Bulk season plan generation through the Message Batches API.
+
+Builds one request per age group x objective x duration x coach persona,
+submits them as message batches (processed asynchronously at reduced
+cost), polls until they finish, and appends each plan with its
+score_plan() result to a JSONL results store.
+
+Usage:
+    python src/season_batch.py --objectives objectives.txt --durations 60 90
+    python src/season_batch.py --objectives objectives.txt --coaches A B --output data/season.jsonl
+    python src/season_batch.py --resume msgbatch_123 --manifest data/season.manifest.json
+    python src/season_batch.py --objectives objectives.txt --fake   # offline, no API key
+
+The manifest maps each batch request id back to its session inputs, so an
+interrupted run can be collected later with --resume.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from itertools import product
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from prompts import AGE_GROUPS, PERSONA_SYSTEM_PROMPTS, PROMPT_VERSION, get_persona_prompt
+from scoring import score_plan
+
+# The Message Batches API accepts at most this many requests per batch
+MAX_BATCH_REQUESTS = 100000
+
+
+def make_custom_id(age_group: str, objective: str, duration: int, players: int, coach: str) -> str:
+    """
+    Build a stable batch request id for a session configuration.
+
+    Batch ids are limited to 64 characters from [a-zA-Z0-9_-], so the
+    free-text objective is hashed.
+    """
+    digest = hashlib.sha256(objective.encode('utf-8')).hexdigest()[:12]
+    return f'{coach}-{age_group}-{duration}-{players}-{digest}'
+
+
+def build_season_requests(objectives: Iterable[str], age_groups: Iterable[str] = AGE_GROUPS,
+                          durations: Iterable[int] = (60,), players: Iterable[int] = (16,),
+                          coaches: Iterable[str] = ('A', 'B'), model: str = 'claude-sonnet-4-20250514',
+                          max_tokens: int = 1500) -> Iterator[Dict]:
+    """
+    Build batch requests for every combination of session inputs.
+
+    Args:
+        objectives: Session objectives
+        age_groups: Age groups to cover (default: all)
+        durations: Session durations in minutes
+        players: Squad sizes
+        coaches: Persona keys from prompts.PERSONA_SYSTEM_PROMPTS
+        model: Model name
+        max_tokens: Output token budget per plan
+
+    Yields:
+        Dictionaries with 'custom_id', 'params' (Messages API arguments)
+        and 'session' (the inputs, for the manifest)
+    """
+    for objective, age_group, duration, squad, coach in product(
+            objectives, age_groups, durations, players, coaches):
+        system_prompt, user_prompt = get_persona_prompt(coach, age_group, objective, duration, squad)
+        yield {
+            'custom_id': make_custom_id(age_group, objective, duration, squad, coach),
+            'params': {
+                'model': model,
+                'max_tokens': max_tokens,
+                'system': [{
+                    'type': 'text',
+                    'text': system_prompt,
+                    'cache_control': {'type': 'ephemeral'}
+                }],
+                'messages': [{'role': 'user', 'content': user_prompt}]
+            },
+            'session': {
+                'age_group': age_group,
+                'objective': objective,
+                'duration': duration,
+                'players': squad,
+                'coach': coach,
+                'prompt_version': PROMPT_VERSION
+            }
+        }
+
+
+def submit_batches(client, requests: List[Dict]) -> List[str]:
+    """
+    Submit requests as one or more message batches.
+
+    Args:
+        client: Anthropic client (or fake with messages.batches)
+        requests: Output of build_season_requests()
+
+    Returns:
+        List of batch ids
+    """
+    batch_ids = []
+    for start in range(0, len(requests), MAX_BATCH_REQUESTS):
+        chunk = requests[start:start + MAX_BATCH_REQUESTS]
+        batch = client.messages.batches.create(requests=[
+            {'custom_id': item['custom_id'], 'params': item['params']} for item in chunk
+        ])
+        print(f'Submitted batch {batch.id} with {len(chunk)} requests', file=sys.stderr)
+        batch_ids.append(batch.id)
+    return batch_ids
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: float = 60.0,
+                   timeout: Optional[float] = None):
+    """
+    Poll a batch until processing has ended.
+
+    Args:
+        client: Anthropic client
+        batch_id: Batch to wait for
+        poll_interval: Seconds between status checks
+        timeout: Give up after this many seconds (None waits indefinitely)
+
+    Returns:
+        The final MessageBatch object
+
+    Raises:
+        TimeoutError: If the batch has not ended before the timeout
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == 'ended':
+            return batch
+        counts = batch.request_counts
+        print(f'Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded',
+              file=sys.stderr)
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f'Batch {batch_id} still {batch.processing_status}')
+        time.sleep(poll_interval)
+
+
+def collect_results(client, batch_id: str, sessions: Dict[str, Dict]) -> Iterator[Dict]:
+    """
+    Stream scored results for a finished batch.
+
+    Args:
+        client: Anthropic client
+        batch_id: Finished batch id
+        sessions: Manifest mapping custom_id to session inputs
+
+    Yields:
+        Result records with session inputs, plan, token usage and score,
+        or an 'error' field for requests that did not succeed
+    """
+    for entry in client.messages.batches.results(batch_id):
+        record = dict(sessions.get(entry.custom_id, {}), custom_id=entry.custom_id, batch_id=batch_id)
+        result = entry.result
+        if result.type != 'succeeded':
+            error = getattr(result, 'error', None)
+            record['error'] = f'{result.type}: {error}' if error else result.type
+            yield record
+            continue
+
+        message = result.message
+        plan = message.content[0].text if message.content else ''
+        record.update({
+            'model': message.model,
+            'plan': plan,
+            'input_tokens': message.usage.input_tokens,
+            'output_tokens': message.usage.output_tokens,
+            'cache_creation_input_tokens': getattr(message.usage, 'cache_creation_input_tokens', None) or 0,
+            'cache_read_input_tokens': getattr(message.usage, 'cache_read_input_tokens', None) or 0,
+            'stop_reason': message.stop_reason,
+            'score': score_plan(plan)
+        })
+        yield record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns a process exit code."""
+    parser = argparse.ArgumentParser(description='Generate season plans with the Message Batches API.')
+    parser.add_argument('--objectives', help='Text file with one objective per line')
+    parser.add_argument('--age-groups', nargs='+', default=AGE_GROUPS, help='Age groups (default: all)')
+    parser.add_argument('--durations', nargs='+', type=int, default=[60], help='Durations in minutes')
+    parser.add_argument('--players', nargs='+', type=int, default=[16], help='Squad sizes')
+    parser.add_argument('--coaches', nargs='+', default=['A', 'B'], choices=sorted(PERSONA_SYSTEM_PROMPTS),
+                        help='Coach personas (default: A B)')
+    parser.add_argument('--output', default='data/season_plans.jsonl', help='Results JSONL (appended)')
+    parser.add_argument('--manifest', help='Manifest path (default: <output>.manifest.json)')
+    parser.add_argument('--resume', nargs='+', metavar='BATCH_ID', help='Collect existing batches')
+    parser.add_argument('--poll-interval', type=float, default=60.0, help='Seconds between polls')
+    parser.add_argument('--timeout', type=float, default=None, help='Max seconds to wait per batch')
+    parser.add_argument('--fake', action='store_true', help='Use the offline fake client')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    model = os.getenv('ANTHROPIC_MODEL', 'claude-sonnet-4-20250514')
+    max_tokens = int(os.getenv('MAX_TOKENS_GENERATION', '1500'))
+    manifest_path = args.manifest or os.path.splitext(args.output)[0] + '.manifest.json'
+
+    if args.fake:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+        from fake_anthropic import FakeAnthropic
+        client = FakeAnthropic(latency=0)
+        args.poll_interval = min(args.poll_interval, 0.1)
+    else:
+        from anthropic import Anthropic
+        client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+
+    if args.resume:
+        with open(manifest_path, encoding='utf-8') as handle:
+            sessions = json.load(handle)
+        batch_ids = args.resume
+    else:
+        if not args.objectives:
+            parser.error('--objectives is required unless --resume is given')
+        with open(args.objectives, encoding='utf-8') as handle:
+            lines = [line.strip() for line in handle if line.strip()]
+        # Repeats would repeat a custom_id, and the Batches API rejects the whole batch
+        objectives = list(dict.fromkeys(lines))
+        if len(objectives) < len(lines):
+            print(f'Skipped {len(lines) - len(objectives)} duplicate objectives', file=sys.stderr)
+
+        requests = list(build_season_requests(
+            objectives, dict.fromkeys(args.age_groups), dict.fromkeys(args.durations),
+            dict.fromkeys(args.players), dict.fromkeys(args.coaches), model, max_tokens
+        ))
+        sessions = {item['custom_id']: item['session'] for item in requests}
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as handle:
+            json.dump(sessions, handle)
+        batch_ids = submit_batches(client, requests)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    succeeded = failed = 0
+    with open(args.output, 'a', encoding='utf-8') as output:
+        for batch_id in batch_ids:
+            wait_for_batch(client, batch_id, args.poll_interval, args.timeout)
+            for record in collect_results(client, batch_id, sessions):
+                output.write(json.dumps(record) + '\n')
+                if 'error' in record:
+                    failed += 1
+                else:
+                    succeeded += 1
+
+    print(f'Wrote {succeeded} plans ({failed} failed) to {args.output}', file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Near-duplicate plan cache keyed on objective similarity.
+
+Objectives are free text, so "improve passing under pressure" and
+"passing under pressure improvement" miss the exact plan cache even
+though one plan serves both. SemanticPlanCache keeps an in-process index
+of generated plans and returns a stored plan when a new objective is
+similar enough to one already answered for the same coach, age group,
+duration and number of players (block timings and squad organisation
+are written for those), and the two objectives name the same
+content words (so "improve tackling under pressure" is never served the
+plan for "improve passing under pressure", however close the n-grams).
+
+Objectives are embedded as TF-IDF weighted character n-grams (hashed
+into a fixed number of dimensions, so the vocabulary never grows) and
+compared by cosine similarity with NumPy. Raw n-gram counts are stored,
+and IDF weights are applied at query time from the current document
+frequencies, so the weighting stays correct as the index fills. Each
+partition caches its IDF-weighted, normalised rows, so a lookup is one
+matrix-vector product.
+
+No external service is involved and nothing is persisted: the index is
+rebuilt from traffic (or a warm-up job) after a restart.
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Hashed feature space for character n-grams
+DEFAULT_DIMENSIONS = 2048
+
+NGRAM_SIZES = (3, 4)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Words that do not change what a session is about; paraphrases add and
+# drop these freely
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'at', 'by', 'for', 'from', 'in', 'into', 'of', 'on', 'or',
+    'the', 'their', 'to', 'under', 'when', 'while', 'with', 'our', 'my',
+    'improve', 'improving', 'improvement', 'better', 'develop', 'developing',
+    'development', 'work', 'working', 'session', 'skill', 'skills', 'practice'
+))
+
+# Leading letters two content words must share to count as the same word
+# ("pass" / "passing", "tackle" / "tackling")
+STEM_LETTERS = 5
+
+
+def normalize_objective(objective: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return ' '.join(_NON_WORD.sub(' ', objective.lower()).split())
+
+
+def content_words(objective: str) -> frozenset:
+    """Words of an objective other than STOP_WORDS."""
+    return frozenset(word for word in normalize_objective(objective).split()
+                     if word not in STOP_WORDS)
+
+
+def _same_word(a: str, b: str) -> bool:
+    """True if two words share their first STEM_LETTERS letters (or all of the shorter)."""
+    size = min(len(a), len(b), STEM_LETTERS)
+    return a[:size] == b[:size]
+
+
+def same_content(a: frozenset, b: frozenset) -> bool:
+    """True if every content word of each objective has a match in the other."""
+    return (all(any(_same_word(word, other) for other in b) for word in a)
+            and all(any(_same_word(word, other) for other in a) for word in b))
+
+
+def ngram_counts(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    """
+    Hashed character n-gram counts of a text.
+
+    Each word is padded with spaces and split into n-grams separately, so
+    word order does not matter and shared stems ("improve" /
+    "improvement") still overlap.
+
+    Args:
+        text: Objective text
+        dimensions: Size of the hashed feature space
+
+    Returns:
+        float32 vector of n-gram counts
+    """
+    indices = []
+    for word in normalize_objective(text).split():
+        padded = f' {word} '
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                indices.append(zlib.crc32(padded[start:start + size].encode('utf-8')) % dimensions)
+    if not indices:
+        return np.zeros(dimensions, dtype=np.float32)
+    return np.bincount(indices, minlength=dimensions).astype(np.float32)
+
+
+class _Partition:
+    """
+    Rows for one (scope, age group, duration, players) partition.
+
+    counts holds raw n-gram counts; weighted holds the same rows with IDF
+    applied and L2-normalised, valid while version matches the cache's
+    IDF version, so a lookup is a single matrix-vector product.
+    """
+
+    __slots__ = ('ids', 'counts', 'weighted', 'version', 'size')
+
+    def __init__(self, dimensions: int, capacity: int = 16):
+        self.ids: List[int] = []
+        self.counts = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.weighted = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.version = -1
+        self.size = 0
+
+    def append(self, entry_id: int, counts: np.ndarray, weighted: Optional[np.ndarray]) -> None:
+        if self.size == len(self.counts):
+            for name in ('counts', 'weighted'):
+                matrix = getattr(self, name)
+                grown = np.zeros((self.size * 2, matrix.shape[1]), dtype=np.float32)
+                grown[:self.size] = matrix[:self.size]
+                setattr(self, name, grown)
+        self.counts[self.size] = counts
+        if weighted is None:
+            self.version = -1
+        else:
+            self.weighted[self.size] = weighted
+        self.ids.append(entry_id)
+        self.size += 1
+
+    def remove(self, entry_id: int) -> np.ndarray:
+        """Drop an entry (swapping the last row into its place); returns its counts."""
+        index = self.ids.index(entry_id)
+        counts = self.counts[index].copy()
+        last = self.size - 1
+        for matrix in (self.counts, self.weighted):
+            matrix[index] = matrix[last]
+            matrix[last] = 0
+        self.ids[index] = self.ids[last]
+        self.ids.pop()
+        self.size = last
+        return counts
+
+    def reweight(self, idf: np.ndarray, version: int) -> None:
+        """Recompute the weighted rows for new IDF weights."""
+        rows = self.counts[:self.size] * idf
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        self.weighted[:self.size] = rows / np.maximum(norms, 1e-12)
+        self.version = version
+
+
+def _weigh(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """IDF-weighted, L2-normalised vector."""
+    vector = counts * idf
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class SemanticPlanCache:
+    """
+    In-memory similarity index of generated plans.
+
+    IDF weights are recomputed when the index has grown or shrunk by more
+    than IDF_REFRESH since they were last computed (and always while it is
+    small); partitions re-apply them lazily on their next lookup.
+
+    A hit also needs the two objectives to share their content words (see
+    same_content()); character n-grams alone rate "tackling" and "passing"
+    under pressure as close as a paraphrase.
+
+    Args:
+        threshold: Minimum cosine similarity (0-1) for a hit
+        max_entries: Plans kept; the least recently used are evicted
+        dimensions: Hashed n-gram feature space
+    """
+
+    # Relative change in entry count that triggers new IDF weights
+    IDF_REFRESH = 0.1
+
+    def __init__(self, threshold: float = 0.75, max_entries: int = 5000,
+                 dimensions: int = DEFAULT_DIMENSIONS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._partitions: Dict[Tuple, _Partition] = {}
+        # entry id -> (partition key, objective, content words, result), in LRU order
+        self._entries: 'OrderedDict[int, Tuple[Tuple, str, frozenset, Dict]]' = OrderedDict()
+        self._document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self._idf = np.ones(dimensions, dtype=np.float32)
+        self._idf_entries = 0
+        self._idf_version = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def partition_key(self, scope: str, age_group: str, duration: int, players: int) -> Tuple:
+        """
+        Partition a request belongs to.
+
+        Duration and players are exact: a plan timed for 30 minutes and 8
+        players does not fit a 44-minute session for 11.
+
+        Args:
+            scope: Identifies everything else that shapes the plan (persona
+                system prompt, model, token budget), e.g. a prompt hash
+            age_group: Age group
+            duration: Session minutes
+            players: Number of players
+        """
+        return (scope, age_group, duration, players)
+
+    def _current_idf(self) -> np.ndarray:
+        """Smoothed IDF weights, refreshed as the index changes size. Caller holds the lock."""
+        total = len(self._entries)
+        drift = abs(total - self._idf_entries)
+        if drift and (total < 100 or drift > self.IDF_REFRESH * self._idf_entries):
+            self._idf = (np.log((1.0 + total) / (1.0 + self._document_frequency)) + 1.0).astype(np.float32)
+            self._idf_entries = total
+            self._idf_version += 1
+        return self._idf
+
+    def lookup(self, key: Tuple, objective: str) -> Optional[Tuple[Dict, str, float]]:
+        """
+        Most similar stored plan in a partition, if above the threshold.
+
+        Args:
+            key: partition_key() of the request
+            objective: Requested objective
+
+        Returns:
+            Tuple of (stored result, its objective, similarity), or None
+        """
+        counts = ngram_counts(objective, self.dimensions)
+        words = content_words(objective)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None or not partition.size or not counts.any():
+                self.misses += 1
+                return None
+            idf = self._current_idf()
+            if partition.version != self._idf_version:
+                partition.reweight(idf, self._idf_version)
+            similarities = partition.weighted[:partition.size] @ _weigh(counts, idf)
+            # Most similar first among rows above the threshold
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for index in candidates[np.argsort(-similarities[candidates], kind='stable')]:
+                entry_id = partition.ids[index]
+                _, stored_objective, stored_words, result = self._entries[entry_id]
+                if same_content(words, stored_words):
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return result, stored_objective, float(similarities[index])
+            self.misses += 1
+        return None
+
+    def add(self, key: Tuple, objective: str, result: Dict) -> None:
+        """
+        Index a freshly generated plan.
+
+        Args:
+            key: partition_key() of the request
+            objective: Objective the plan was generated for
+            result: Result dict to return on later hits
+        """
+        counts = ngram_counts(objective, self.dimensions)
+        if not counts.any():
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            partition = self._partitions.get(key)
+            if partition is None:
+                partition = self._partitions[key] = _Partition(self.dimensions)
+            self._document_frequency += counts > 0
+            self._entries[entry_id] = (key, objective, content_words(objective), result)
+            # Weigh the new row now if the partition's other rows are current
+            weighted = (_weigh(counts, self._idf)
+                        if partition.version == self._idf_version else None)
+            partition.append(entry_id, counts, weighted)
+            # Evict only once the row is in place: eviction can empty and
+            # drop this very partition
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        """Drop the least recently used entry. Caller holds the lock."""
+        entry_id, (key, _, _, _) = self._entries.popitem(last=False)
+        partition = self._partitions[key]
+        counts = partition.remove(entry_id)
+        self._document_frequency -= counts > 0
+        if not partition.size:
+            del self._partitions[key]
+        self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+            self._entries.clear()
+            self._document_frequency[:] = 0
+            self._idf[:] = 1
+            self._idf_entries = 0
+            self._idf_version += 1
+
+    def stats(self) -> Dict:
+        """Entry, partition and hit counters for the health endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'partitions': len(self._partitions),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+def create_semantic_cache_from_env() -> Optional[SemanticPlanCache]:
+    """
+    Build the semantic plan cache from environment variables.
+
+    Environment:
+        SEMANTIC_CACHE_ENABLED: 'true' enables near-duplicate serving (default off)
+        SEMANTIC_CACHE_THRESHOLD: Minimum cosine similarity (default 0.75)
+        SEMANTIC_CACHE_MAX_ENTRIES: Plans kept in the index (default 5000)
+
+    Returns:
+        Configured SemanticPlanCache, or None if disabled
+    """
+    if os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    return SemanticPlanCache(
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.75')),
+        max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '5000'))
+    )
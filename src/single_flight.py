@@ -0,0 +1,175 @@
+"""
+Single-flight deduplication of identical in-flight calls.
+
+When a club shares a link, dozens of identical forms arrive within
+seconds, long before the first plan is cached. SingleFlight lets the
+first caller for a key (the leader) make the call while concurrent
+callers with the same key (followers) wait for its result instead of
+making their own. A failure is shared too, so an outage is not retried
+once per waiting user.
+
+Followers wait at most wait_timeout seconds; after that they make their
+own call rather than hang on a stuck leader.
+
+SingleFlight is for threads (the Flask app), AsyncSingleFlight for
+coroutines (the ASGI path). Both report each caller's role: 'leader',
+'follower' or 'timeout'.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """One in-flight call and the outcome its followers will read."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group.
+
+    Args:
+        wait_timeout: Longest a follower waits for the leader, in seconds
+            (None waits indefinitely)
+    """
+
+    def __init__(self, wait_timeout: Optional[float] = 90.0):
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Run func() once per key among concurrent callers.
+
+        Args:
+            key: Identity of the call (e.g. the plan cache key)
+            func: Makes the call; run by the leader (and by timed-out followers)
+
+        Returns:
+            Tuple of (func() result, role)
+
+        Raises:
+            Whatever func() raised, in the leader and every follower
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, 'leader'
+
+        if not call.done.wait(self.wait_timeout):
+            with self._lock:
+                self.timeouts += 1
+            return func(), 'timeout'
+        if call.error is not None:
+            raise call.error
+        return call.result, 'follower'
+
+    def has_leader(self, key: Hashable) -> bool:
+        """True if a call for key is in flight, so do() would follow it (unless it ends first)."""
+        with self._lock:
+            return key in self._calls
+
+    def stats(self) -> Dict:
+        """In-flight keys and caller counts by role."""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'timeouts': self.timeouts
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Single-flight group for coroutines on one event loop.
+
+    The leader's call runs as its own task, so a leader whose client
+    disconnects does not cancel the call its followers are waiting on.
+
+    Args:
+        wait_timeout: Longest a follower waits for the leader, in seconds
+            (None waits indefinitely)
+    """
+
+    def __init__(self, wait_timeout: Optional[float] = 90.0):
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark a failure retrieved even if every waiter has gone
+            task.exception()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Await func() once per key among concurrent callers.
+
+        Returns:
+            Tuple of (func() result, role)
+
+        Raises:
+            Whatever func() raised, in the leader and every follower
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.leaders += 1
+            return await asyncio.shield(task), 'leader'
+
+        self.followers += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.wait_timeout), 'follower'
+        except asyncio.TimeoutError:
+            if task.done():
+                # Finished as the wait expired (or itself raised TimeoutError)
+                return task.result(), 'follower'
+            self.timeouts += 1
+            return await func(), 'timeout'
+
+    def has_leader(self, key: Hashable) -> bool:
+        """True if a call for key is in flight, so do() would follow it (unless it ends first)."""
+        return key in self._calls
+
+    def stats(self) -> Dict:
+        """In-flight keys and caller counts by role."""
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'timeouts': self.timeouts
+        }
@@ -0,0 +1,240 @@
+"""
+Per-request output token budgets and max_tokens continuation.
+
+One global MAX_TOKENS_GENERATION is too much for a 30-minute U7 plan
+(the reserved budget lengthens the latency tail) and too little for a
+120-minute plan (the plan is cut off mid-activity). TokenBudget sizes
+max_tokens per request from the persona and session duration: until a
+(persona, duration bucket) has enough history it scales the configured
+default by duration, then it uses a high quantile of the output lengths
+recorded for complete plans in that bucket, plus headroom.
+
+A plan that still hits max_tokens is not shown or scored half-finished:
+generate_complete() sends the text so far back as an assistant prefill
+and asks the model to carry on, up to max_continuations times, stitching
+the pieces and summing their token usage. Results report how many
+continuations were needed and whether the plan is still truncated.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+# Stop reasons of a plan the model finished on its own
+COMPLETE_STOP_REASONS = ('end_turn', 'stop_sequence')
+
+# Budgets are rounded up to a multiple of this many tokens
+BUDGET_STEP = 64
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+def continuation_params(params: Dict, text: str) -> Dict:
+    """
+    Messages API arguments that continue a truncated plan.
+
+    The text so far becomes (or replaces) a trailing assistant message, so
+    the model picks up where it stopped. A prefill may not end in
+    whitespace, so trailing whitespace is trimmed; the model writes it
+    again if it needs it.
+
+    Args:
+        params: Arguments of the original call
+        text: Plan text generated so far (all segments)
+    """
+    messages = list(params['messages'])
+    if messages and messages[-1]['role'] == 'assistant':
+        messages.pop()
+    messages.append({'role': 'assistant', 'content': text.rstrip()})
+    return dict(params, messages=messages)
+
+
+def merge_results(earlier: Dict, later: Dict) -> Dict:
+    """
+    Stitch a continuation onto the result it continues.
+
+    Token counts are summed; every other field (stop_reason and so on)
+    comes from the later result.
+    """
+    merged = dict(later)
+    merged['plan'] = earlier['plan'].rstrip() + later['plan']
+    for field in USAGE_FIELDS:
+        merged[field] = earlier.get(field, 0) + later.get(field, 0)
+    return merged
+
+
+def _needs_continuation(result: Dict) -> bool:
+    return result.get('stop_reason') == 'max_tokens' and bool(result['plan'].strip())
+
+
+def _finish(result: Dict, continuations: int) -> Dict:
+    return dict(result, continuations=continuations, truncated=result.get('stop_reason') == 'max_tokens')
+
+
+def generate_complete(call: Callable[[Dict], Dict], params: Dict, max_continuations: int = 2) -> Dict:
+    """
+    Make a generation call, continuing it while it stops on max_tokens.
+
+    Args:
+        call: Sends Messages API arguments and returns an
+            app.extract_result()-style dict (with 'stop_reason')
+        params: Arguments of the first call
+        max_continuations: Most extra calls to make
+
+    Returns:
+        The stitched result, plus 'continuations' (extra calls made) and
+        'truncated' (still stopped on max_tokens)
+    """
+    result = call(params)
+    continuations = 0
+    while continuations < max_continuations and _needs_continuation(result):
+        result = merge_results(result, call(continuation_params(params, result['plan'])))
+        continuations += 1
+    return _finish(result, continuations)
+
+
+async def generate_complete_async(call: Callable[[Dict], Awaitable[Dict]], params: Dict,
+                                  max_continuations: int = 2) -> Dict:
+    """Coroutine counterpart of generate_complete()."""
+    result = await call(params)
+    continuations = 0
+    while continuations < max_continuations and _needs_continuation(result):
+        result = merge_results(result, await call(continuation_params(params, result['plan'])))
+        continuations += 1
+    return _finish(result, continuations)
+
+
+class TokenBudget:
+    """
+    Thread-safe max_tokens sizing learned from recorded plan lengths.
+
+    Args:
+        default: Budget for a 60-minute session before anything is
+            learned, and for requests without a duration
+        minimum: Smallest budget handed out
+        maximum: Largest budget handed out
+        adaptive: False always returns default (lengths are still recorded)
+        quantile: Quantile of recent complete lengths the budget covers
+        headroom: Multiplier on that quantile
+        min_samples: Complete plans a bucket needs before it is learned
+        window: Recent lengths kept per bucket
+        duration_bucket: Minutes per duration bucket
+    """
+
+    def __init__(self, default: int = 1500, minimum: int = 512, maximum: int = 4096,
+                 adaptive: bool = True, quantile: float = 0.95, headroom: float = 1.15,
+                 min_samples: int = 20, window: int = 200, duration_bucket: int = 15):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.adaptive = adaptive
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.window = window
+        self.duration_bucket = duration_bucket
+        self._lengths: Dict[Tuple[str, int], Deque[int]] = {}
+        self._learned: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, persona: str, duration: int) -> Tuple[str, int]:
+        return persona, duration // self.duration_bucket
+
+    def _clamp(self, tokens: float) -> int:
+        rounded = int(math.ceil(tokens / BUDGET_STEP)) * BUDGET_STEP
+        return max(self.minimum, min(self.maximum, rounded))
+
+    def prior(self, duration: int) -> int:
+        """Budget before any history: default at 60 minutes, half of it plus a share per minute."""
+        return self._clamp(self.default * (0.5 + duration / 120))
+
+    def budget(self, persona: str, duration: Optional[int]) -> int:
+        """
+        max_tokens for a plan.
+
+        Args:
+            persona: Coach persona ('base', 'A', 'B')
+            duration: Session minutes, or None if unknown
+        """
+        if not self.adaptive or duration is None:
+            return self.default
+        with self._lock:
+            learned = self._learned.get(self._key(persona, duration))
+        return learned if learned is not None else self.prior(duration)
+
+    def record(self, persona: str, duration: Optional[int], output_tokens: int) -> None:
+        """
+        Record the output length of a complete plan (including any continuations).
+
+        Truncated or early-stopped plans must not be recorded: their length
+        says nothing about how long the plan wanted to be.
+        """
+        if duration is None or output_tokens <= 0:
+            return
+        key = self._key(persona, duration)
+        with self._lock:
+            lengths = self._lengths.get(key)
+            if lengths is None:
+                lengths = self._lengths[key] = deque(maxlen=self.window)
+            lengths.append(output_tokens)
+            if len(lengths) >= self.min_samples:
+                ordered = sorted(lengths)
+                index = min(len(ordered) - 1, int(math.ceil(self.quantile * len(ordered))) - 1)
+                self._learned[key] = self._clamp(ordered[index] * self.headroom)
+
+    def seed(self, samples: Iterable[Tuple[str, int, int]]) -> int:
+        """
+        Record historical (persona, duration, output_tokens) samples.
+
+        Returns:
+            Number of samples recorded
+        """
+        count = 0
+        for persona, duration, output_tokens in samples:
+            self.record(persona, duration, output_tokens)
+            count += 1
+        return count
+
+    def stats(self) -> Dict:
+        """Learned budgets per bucket for the health endpoint."""
+        with self._lock:
+            buckets = {
+                f'{persona}/{bucket * self.duration_bucket}-{(bucket + 1) * self.duration_bucket - 1}min': {
+                    'samples': len(lengths),
+                    'budget': self._learned.get((persona, bucket))
+                }
+                for (persona, bucket), lengths in sorted(self._lengths.items())
+            }
+        return {
+            'adaptive': self.adaptive,
+            'default': self.default,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'buckets': buckets
+        }
+
+
+def create_token_budget_from_env(default: int) -> TokenBudget:
+    """
+    Build the token budget from environment variables.
+
+    Args:
+        default: The configured MAX_TOKENS_GENERATION
+
+    Environment:
+        TOKEN_BUDGET_ADAPTIVE: 'false' uses default for every request (default on)
+        TOKEN_BUDGET_MIN: Smallest budget (default 512)
+        TOKEN_BUDGET_MAX: Largest budget (default 4096)
+        TOKEN_BUDGET_HEADROOM: Multiplier on the learned p95 length (default 1.15)
+        TOKEN_BUDGET_MIN_SAMPLES: Complete plans before a bucket is learned (default 20)
+    """
+    return TokenBudget(
+        default=default,
+        minimum=int(os.getenv('TOKEN_BUDGET_MIN', '512')),
+        maximum=int(os.getenv('TOKEN_BUDGET_MAX', '4096')),
+        adaptive=os.getenv('TOKEN_BUDGET_ADAPTIVE', 'true').lower() not in ('0', 'false', 'no'),
+        headroom=float(os.getenv('TOKEN_BUDGET_HEADROOM', '1.15')),
+        min_samples=int(os.getenv('TOKEN_BUDGET_MIN_SAMPLES', '20'))
+    )
@@ -0,0 +1,19 @@
+"""
+Shared pytest setup.
+
+Puts src/ (flat modules) and benchmarks/ (the offline fake Anthropic
+client) on the import path, and configures the app for offline runs
+before any test imports it.
+"""
+
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(TESTS_DIR, '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'offline-test')
+os.environ.setdefault('PLAN_CACHE_ENABLED', 'false')
+os.environ.setdefault('DEBATE_DB', '')
@@ -0,0 +1,114 @@
+"""Tests for FairScheduler admission, rejection and Retry-After hints."""
+
+import threading
+import time
+
+import pytest
+
+from admission import DEFAULT_TENANT, AdmissionRejected, FairScheduler, normalize_tenant
+
+
+def test_admits_within_capacity_and_releases_slots():
+    scheduler = FairScheduler(capacity=2)
+
+    with scheduler.admit('club', slots=2) as admission:
+        assert admission.slots == 2
+        assert scheduler.stats()['active_slots'] == {'interactive': 2, 'bulk': 0}
+
+    assert scheduler.stats()['active_slots'] == {'interactive': 0, 'bulk': 0}
+    assert scheduler.stats()['admitted']['interactive'] == 1
+
+
+def test_bulk_slots_are_capped_at_bulk_share():
+    scheduler = FairScheduler(capacity=8, bulk_share=0.5)
+
+    admission = scheduler.admit('club', 'bulk', slots=12)
+
+    assert admission.slots == 4
+    admission.release()
+
+
+def test_waiter_is_admitted_when_slots_free():
+    scheduler = FairScheduler(capacity=1)
+    held = scheduler.admit('a')
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(scheduler.admit('b')))
+    waiter.start()
+    while not scheduler.queued()['interactive']:
+        time.sleep(0.01)
+
+    held.release()
+    waiter.join(timeout=5)
+
+    assert admitted and admitted[0].tenant == 'b'
+    assert admitted[0].waited > 0
+    admitted[0].release()
+
+
+def test_rejects_when_queue_is_full_with_retry_after():
+    scheduler = FairScheduler(capacity=1, max_queue=0)
+    held = scheduler.admit('a')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.admit('b')
+
+    assert rejected.value.reason == 'queue_full'
+    assert rejected.value.retry_after >= 1
+    assert scheduler.stats()['rejected']['queue_full'] == 1
+    held.release()
+
+
+def test_rejects_club_over_request_budget_with_retry_after():
+    scheduler = FairScheduler(capacity=4, requests_per_minute=1)
+    scheduler.admit('club').release()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.admit('club')
+
+    assert rejected.value.reason == 'budget'
+    assert 1 <= rejected.value.retry_after <= 60
+    # Other clubs keep their own budget
+    scheduler.admit('other').release()
+
+
+def test_interactive_wait_times_out():
+    scheduler = FairScheduler(capacity=1, max_wait=0.05)
+    held = scheduler.admit('a')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.admit('b')
+
+    assert rejected.value.reason == 'timeout'
+    assert rejected.value.retry_after >= 1
+    assert scheduler.queued() == {'interactive': 0, 'bulk': 0}
+    held.release()
+    assert scheduler.stats()['active_slots'] == {'interactive': 0, 'bulk': 0}
+
+
+def test_settle_refunds_unused_token_estimate():
+    scheduler = FairScheduler(capacity=4, tokens_per_minute=1000)
+    admission = scheduler.admit('club', cost=900)
+    assert scheduler.stats()['clubs']['club']['tokens_available'] == 100
+
+    admission.settle(0)
+    admission.release()
+
+    assert scheduler.stats()['clubs']['club']['tokens_available'] == 1000
+
+
+def test_only_configured_clubs_get_their_own_tenant():
+    clubs = FairScheduler(weights={'academy': 2, 'vets': 1}).weights
+
+    assert normalize_tenant(' academy ', clubs) == 'academy'
+    assert normalize_tenant('rotated-id-1234', clubs) == DEFAULT_TENANT
+    assert normalize_tenant('', clubs) == DEFAULT_TENANT
+    assert normalize_tenant(None, clubs) == DEFAULT_TENANT
+
+
+def test_unconfigured_club_ids_share_the_public_budget():
+    scheduler = FairScheduler(capacity=4, requests_per_minute=1, weights={'academy': 1})
+    scheduler.admit(normalize_tenant('club-1', scheduler.weights)).release()
+
+    with pytest.raises(AdmissionRejected):
+        scheduler.admit(normalize_tenant('club-2', scheduler.weights))
+    scheduler.admit(normalize_tenant('academy', scheduler.weights)).release()
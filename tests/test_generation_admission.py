@@ -0,0 +1,212 @@
+"""Tests that only uncached, uncoalesced generations are admitted and charged."""
+
+import threading
+import time
+
+import pytest
+
+import app
+from admission import Admission, AdmissionRejected, FairScheduler
+from fake_anthropic import FakeAnthropic
+from plan_cache import MemoryTier, PlanCache
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeAnthropic(latency=0.2, output_tokens=200)
+    monkeypatch.setattr(app, '_client', client)
+    monkeypatch.setattr(app, '_client_created', True)
+    monkeypatch.setattr(app, 'plan_cache', PlanCache([MemoryTier()]))
+    monkeypatch.setattr(app, 'semantic_cache', None)
+    monkeypatch.setattr(app, 'in_flight', SingleFlight(5.0))
+    monkeypatch.setattr(app, 'scheduler', FairScheduler(capacity=4))
+    return client
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    """Club -> tokens each admission was settled at."""
+    charges = {}
+    settle = Admission.settle
+
+    def record(admission, actual_tokens):
+        charges.setdefault(admission.tenant, []).append(actual_tokens)
+        settle(admission, actual_tokens)
+
+    monkeypatch.setattr(Admission, 'settle', record)
+    return charges
+
+
+def admitted():
+    return app.scheduler.stats()['admitted']['interactive']
+
+
+def test_fresh_tokens_skips_cached_and_coalesced_results():
+    usage = {'input_tokens': 10, 'output_tokens': 20, 'cache_creation_input_tokens': 5}
+    results = [dict(usage, cached=False, coalesced=False), dict(usage, cached=True),
+               dict(usage, cached=False, coalesced=True)]
+
+    assert app.fresh_tokens(results) == 35
+
+
+def test_cache_hit_is_served_without_admission(fake, settled):
+    first = app.request_plan('system', 'user', club='a')
+    assert first['cached'] is False
+    assert settled == {'a': [app.fresh_tokens([first])]}
+
+    app.scheduler.max_queue = 0
+    held = app.scheduler.admit('other', slots=4)
+    try:
+        hit = app.request_plan('system', 'user', club='a')
+        with pytest.raises(AdmissionRejected):
+            app.request_plan('system', 'another user', club='a')
+    finally:
+        held.release()
+
+    assert hit['cached'] is True
+    assert fake.messages.calls == 1
+    assert settled == {'a': [app.fresh_tokens([first])]}
+
+
+def request_concurrently(clubs, user='user'):
+    results = {}
+    threads = [threading.Thread(target=lambda club=club: results.update({club: app.request_plan(
+        'system', user, club=club)})) for club in clubs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_only_the_leader_of_coalesced_requests_is_admitted(fake, settled):
+    results = request_concurrently(('a', 'b', 'c'))
+
+    assert fake.messages.calls == 1
+    leaders = [club for club, result in results.items() if not result['coalesced']]
+    assert len(leaders) == 1
+    assert admitted() == 1
+    assert settled == {leaders[0]: [app.fresh_tokens([results[leaders[0]]])]}
+
+
+def test_follower_of_a_rejected_leader_is_admitted_as_its_own_club(fake, monkeypatch):
+    admit = app.scheduler.admit
+
+    def reject_a_once_b_follows(tenant, *args):
+        if tenant == 'a':
+            while not app.in_flight.stats()['followers']:
+                time.sleep(0.005)
+            raise AdmissionRejected('budget', 30, 'over budget')
+        return admit(tenant, *args)
+
+    monkeypatch.setattr(app.scheduler, 'admit', reject_a_once_b_follows)
+    outcomes = {}
+
+    def request(club):
+        try:
+            outcomes[club] = app.request_plan('system', 'user', club=club)
+        except AdmissionRejected as e:
+            outcomes[club] = e
+
+    leader = threading.Thread(target=request, args=('a',))
+    leader.start()
+    while not app.in_flight.stats()['in_flight']:
+        time.sleep(0.005)
+    request('b')
+    leader.join(timeout=10)
+
+    assert isinstance(outcomes['a'], AdmissionRejected)
+    assert outcomes['b']['cached'] is False
+    assert outcomes['b']['coalesced'] is False
+    assert fake.messages.calls == 1
+
+
+def test_run_coaches_does_not_admit_a_coach_joining_an_in_flight_call(fake, monkeypatch):
+    slots = []
+    admit = app.scheduler.admit
+    monkeypatch.setattr(app.scheduler, 'admit', lambda *args: slots.append(args[3]) or admit(*args))
+    leader = threading.Thread(target=app.request_plan, args=('system a', 'user'), kwargs={'coach': 'A'})
+    leader.start()
+    while not app.in_flight.stats()['in_flight']:
+        time.sleep(0.005)
+
+    results, errors = app.run_coaches({'A': ('system a', 'user'), 'B': ('system b', 'user')})
+    leader.join(timeout=10)
+
+    assert not errors
+    assert results['A']['coalesced'] is True
+    assert results['B']['coalesced'] is False
+    assert fake.messages.calls == 2
+    assert slots == [1, 1]
+
+
+def test_run_coaches_admits_only_cache_misses(fake, monkeypatch):
+    app.request_plan('system a', 'user', coach='A')
+    slots = []
+    admit = app.scheduler.admit
+    monkeypatch.setattr(app.scheduler, 'admit', lambda *args: slots.append(args[3]) or admit(*args))
+
+    results, errors = app.run_coaches({'A': ('system a', 'user'), 'B': ('system b', 'user')})
+
+    assert not errors
+    assert results['A']['cached'] is True
+    assert results['B']['cached'] is False
+    assert slots == [1]
+
+
+def test_tournament_submits_no_more_calls_than_admitted_slots(fake, monkeypatch):
+    monkeypatch.setattr(app, 'scheduler', FairScheduler(capacity=4, bulk_share=0.5))
+    running = []
+    peak = []
+    lock = threading.Lock()
+    generate_plan = app.generate_plan
+
+    def tracked(*args, **kwargs):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        try:
+            return generate_plan(*args, **kwargs)
+        finally:
+            with lock:
+                running.pop()
+
+    monkeypatch.setattr(app, 'generate_plan', tracked)
+
+    tournament = app.run_tournament('U10', 'passing', 60, 12, ['A', 'B'], samples=3)
+
+    assert len(tournament['entrants']) == 6
+    assert fake.messages.calls == 6
+    assert max(peak) == app.scheduler.bulk_limit == 2
+
+
+def test_cached_stream_is_served_without_admission(fake, settled):
+    client = app.create_app(preload_client=False).test_client()
+    query = {'age_group': 'U10', 'objective': 'passing', 'duration': '60', 'players': '12'}
+    prompt = app.build_prompt('base', 'U10', 'passing', 60, 12)
+    cached = app.generate_plan(*prompt)
+    app.plan_cache.set(app.make_cache_key(*prompt, app.MODEL, app.MAX_TOKENS), cached)
+
+    app.scheduler.max_queue = 0
+    held = app.scheduler.admit('other', slots=4)
+    try:
+        hit = client.get('/generate/stream', query_string=query, headers={'X-Club-Id': 'a'})
+        miss = client.get('/generate/stream', query_string=dict(query, objective='tackling'),
+                          headers={'X-Club-Id': 'a'})
+    finally:
+        held.release()
+
+    assert hit.status_code == 200
+    assert '"cached": true' in hit.get_data(as_text=True)
+    assert miss.status_code == 429
+    assert admitted() == 1
+    assert 'a' not in settled
+
+
+def test_admission_key_honours_only_configured_clubs(monkeypatch):
+    monkeypatch.setattr(app, 'scheduler', FairScheduler(weights={'academy': 2}))
+
+    assert app.admission_key({'x-club-id': 'academy'}, {}) == ('academy', 'interactive')
+    assert app.admission_key({}, {'club': 'someone-else'}) == ('public', 'interactive')
+    assert app.admission_key({'x-club-id': 'vets', 'x-priority': 'bulk'}, {}) == ('public', 'bulk')
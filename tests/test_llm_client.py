@@ -0,0 +1,36 @@
+"""Tests for ResilientClient token accounting."""
+
+import pytest
+
+from fake_anthropic import FakeAnthropic
+from llm_client import RateLimiter, ResilientClient
+
+PARAMS = {'model': 'claude', 'max_tokens': 2000,
+          'messages': [{'role': 'user', 'content': 'plan a session'}]}
+
+
+class Cancelled(Exception):
+    pass
+
+
+@pytest.fixture
+def client():
+    return ResilientClient(FakeAnthropic(latency=0), limiter=RateLimiter(tokens_per_minute=100000))
+
+
+def test_cancelled_stream_settles_its_partial_usage(client):
+    with pytest.raises(Cancelled):
+        with client.messages.stream(**PARAMS) as stream:
+            for _ in stream.text_stream:
+                raise Cancelled()
+
+    used = 100000 - client.limiter.tokens.available()
+    assert 0 < used < 2000
+
+
+def test_stream_failing_before_any_text_is_refunded(client):
+    with pytest.raises(Cancelled):
+        with client.messages.stream(**PARAMS):
+            raise Cancelled()
+
+    assert client.limiter.tokens.available() == pytest.approx(100000)
@@ -0,0 +1,54 @@
+"""Tests for PlanCache tiers, promotion and expiry."""
+
+import time
+
+from plan_cache import MemoryTier, PlanCache, SQLiteTier
+
+
+def test_memory_entry_expires_after_its_ttl():
+    tier = MemoryTier(ttl_seconds=60)
+    tier.set('fresh', {'plan': 'a'})
+    tier.set('stale', {'plan': 'b'}, expires_at=time.time() - 1)
+
+    assert tier.get('fresh') == {'plan': 'a'}
+    assert tier.get('stale') is None
+    assert tier.stats()['expirations'] == 1
+
+
+def test_promoted_entry_keeps_disk_expiry(tmp_path):
+    memory = MemoryTier()
+    disk = SQLiteTier(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+    cache = PlanCache([memory, disk])
+    disk.set_many([('key', {'plan': 'a'}, time.time() - 59.5)])
+
+    assert cache.get('key') == {'plan': 'a'}
+    assert memory.get('key') == {'plan': 'a'}
+
+    time.sleep(0.6)
+
+    assert memory.get('key') is None
+    assert cache.get('key') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_preload_expires_memory_entries_from_creation_time(tmp_path):
+    memory = MemoryTier(max_entries=2)
+    disk = SQLiteTier(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+    cache = PlanCache([memory, disk])
+    now = time.time()
+
+    cache.preload([('old', {'plan': 'old'}, now - 120), ('a', {'plan': 'a'}, now - 10),
+                   ('b', {'plan': 'b'}, now - 5)])
+
+    assert memory.stats()['entries'] == 2
+    assert memory.get('a') == {'plan': 'a'}
+    assert cache.get('old') is None
+
+
+def test_preload_into_zero_entry_memory_tier_loads_nothing():
+    memory = MemoryTier(max_entries=0)
+    cache = PlanCache([memory])
+
+    assert cache.preload([('a', {'plan': 'a'}, time.time())]) == 1
+    assert memory.stats()['entries'] == 0
+    assert memory.stats()['evictions'] == 0
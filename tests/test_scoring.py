@@ -0,0 +1,38 @@
+"""Tests that incremental PlanScorer scores match score_plan()."""
+
+import pytest
+
+from fake_anthropic import make_plan_text
+from scoring import PlanScorer, score_plan
+
+PLANS = [
+    make_plan_text('U10 passing', 300),
+    # Overlapping and repeated timing keywords, multi-word coaching keywords
+    'Warm-up: 10 mins min min minutes. Coaching point: why? How? What? '
+    'Key point - teaching point. Safe contact control, grid and area setup. '
+    'Fun game, teams score. Cool down 5 minutes, seconds secs duration.',
+    'WARM UP activation coaching coaching coaching point minminutes mins mins',
+]
+
+
+def scored(chunks, buffer_chars):
+    scorer = PlanScorer(buffer_chars=buffer_chars)
+    for chunk in chunks:
+        scorer.feed(chunk)
+    return scorer.score()
+
+
+@pytest.mark.parametrize('plan', PLANS, ids=['fake_plan', 'dense_keywords', 'run_together'])
+@pytest.mark.parametrize('buffer_chars', [0, 16, 1024])
+def test_split_at_every_offset_matches_score_plan(plan, buffer_chars):
+    expected = score_plan(plan)
+    for offset in range(len(plan) + 1):
+        assert scored([plan[:offset], plan[offset:]], buffer_chars) == expected, offset
+
+
+@pytest.mark.parametrize('plan', PLANS, ids=['fake_plan', 'dense_keywords', 'run_together'])
+@pytest.mark.parametrize('size', [1, 3, 7])
+def test_fixed_size_chunks_match_score_plan(plan, size):
+    chunks = [plan[start:start + size] for start in range(0, len(plan), size)]
+
+    assert scored(chunks, buffer_chars=0) == score_plan(plan)
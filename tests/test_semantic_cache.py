@@ -0,0 +1,109 @@
+"""Tests for SemanticPlanCache lookups and LRU eviction."""
+
+import pytest
+
+from semantic_cache import SemanticPlanCache
+
+KEY = ('scope', 'U10', 4, 3)
+OTHER_KEY = ('scope', 'U12', 4, 3)
+
+
+def plan(name):
+    return {'plan': name}
+
+
+def test_lookup_serves_paraphrase():
+    cache = SemanticPlanCache(threshold=0.5)
+    cache.add(KEY, 'improve passing under pressure', plan('passing'))
+
+    result, objective, similarity = cache.lookup(KEY, 'passing under pressure improvement')
+
+    assert result == plan('passing')
+    assert objective == 'improve passing under pressure'
+    assert similarity >= 0.5
+    assert cache.lookup(OTHER_KEY, 'improve passing under pressure') is None
+
+
+@pytest.mark.parametrize('objective', ['passing under pressure improvement',
+                                       'improving passing under pressure'])
+def test_default_threshold_serves_paraphrase(objective):
+    cache = SemanticPlanCache()
+    cache.add(KEY, 'improve passing under pressure', plan('passing'))
+
+    assert cache.lookup(KEY, objective)[0] == plan('passing')
+
+
+@pytest.mark.parametrize('objective', ['improve tackling under pressure',
+                                       'improve kicking under pressure',
+                                       'improve catching under pressure'])
+def test_different_skill_is_not_served_at_default_threshold(objective):
+    cache = SemanticPlanCache()
+    cache.add(KEY, 'improve passing under pressure', plan('passing'))
+    cache.add(KEY, 'scrum engagement', plan('scrum'))
+
+    assert cache.lookup(KEY, objective) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_lookup_falls_back_to_a_less_similar_plan_with_the_same_content():
+    cache = SemanticPlanCache(threshold=0.3)
+    # The first plan is the closer n-gram match but lacks "drills"
+    cache.add(KEY, 'improve tackling under pressure', plan('pressure'))
+    cache.add(KEY, 'tackling drills for pressure', plan('drills'))
+
+    assert cache.lookup(KEY, 'improve tackling under pressure drills')[0] == plan('drills')
+
+
+def test_single_entry_cache_replaces_entry_in_same_partition():
+    cache = SemanticPlanCache(threshold=0.5, max_entries=1)
+
+    cache.add(KEY, 'improve passing under pressure', plan('first'))
+    cache.add(KEY, 'tackling technique and safety', plan('second'))
+    cache.add(KEY, 'kicking out of hand', plan('third'))
+
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['partitions'] == 1
+    assert cache.stats()['evictions'] == 2
+    assert cache.lookup(KEY, 'kicking out of hand')[0] == plan('third')
+    assert cache.lookup(KEY, 'improve passing under pressure') is None
+
+
+def test_evicting_last_entry_of_partition_keeps_new_entry_servable():
+    cache = SemanticPlanCache(threshold=0.5, max_entries=2)
+    cache.add(KEY, 'improve passing under pressure', plan('passing'))
+    cache.add(OTHER_KEY, 'scrum engagement', plan('scrum'))
+
+    # Evicts the only other row of KEY's partition
+    cache.add(KEY, 'tackling technique and safety', plan('tackling'))
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['partitions'] == 2
+    assert cache.lookup(KEY, 'tackling technique and safety')[0] == plan('tackling')
+    assert cache.lookup(KEY, 'improve passing under pressure') is None
+    assert cache.lookup(OTHER_KEY, 'scrum engagement')[0] == plan('scrum')
+
+
+def test_eviction_follows_lookup_recency():
+    cache = SemanticPlanCache(threshold=0.5, max_entries=2)
+    cache.add(KEY, 'improve passing under pressure', plan('passing'))
+    cache.add(KEY, 'tackling technique and safety', plan('tackling'))
+
+    cache.lookup(KEY, 'improve passing under pressure')
+    cache.add(KEY, 'kicking out of hand', plan('kicking'))
+
+    assert cache.lookup(KEY, 'improve passing under pressure')[0] == plan('passing')
+    assert cache.lookup(KEY, 'tackling technique and safety') is None
+    assert cache.lookup(KEY, 'kicking out of hand')[0] == plan('kicking')
+
+
+def test_plans_are_only_shared_for_the_same_duration_and_players():
+    cache = SemanticPlanCache()
+    planned = cache.partition_key('scope', 'U10', 30, 8)
+    cache.add(planned, 'improve passing under pressure', plan('passing'))
+
+    assert cache.lookup(cache.partition_key('scope', 'U10', 30, 8),
+                        'improve passing under pressure')[0] == plan('passing')
+    assert cache.lookup(cache.partition_key('scope', 'U10', 44, 11),
+                        'improve passing under pressure') is None
+    assert cache.lookup(cache.partition_key('scope', 'U10', 30, 9),
+                        'improve passing under pressure') is None
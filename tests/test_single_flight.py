@@ -0,0 +1,136 @@
+"""Tests for SingleFlight and AsyncSingleFlight roles and failure sharing."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+class Outage(Exception):
+    pass
+
+
+def run_together(group, callers, func):
+    """
+    Start `callers` threads at a barrier; func blocks until every
+    follower has joined, so exactly one thread leads.
+    """
+    barrier = threading.Barrier(callers)
+    outcomes = []
+    lock = threading.Lock()
+
+    def caller():
+        barrier.wait()
+        try:
+            outcome = group.do('key', func)
+        except Outage as e:
+            outcome = (e, 'raised')
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return outcomes
+
+
+def wait_for_followers(group, followers):
+    deadline = time.monotonic() + 5
+    while group.stats()['followers'] < followers and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_one_leader_calls_and_followers_share_its_result():
+    group = SingleFlight(wait_timeout=5)
+    calls = []
+
+    def func():
+        calls.append(1)
+        wait_for_followers(group, 4)
+        return 'plan'
+
+    outcomes = run_together(group, 5, func)
+
+    assert len(calls) == 1
+    assert sorted(role for _, role in outcomes) == ['follower'] * 4 + ['leader']
+    assert all(result == 'plan' for result, _ in outcomes)
+    assert group.stats() == {'in_flight': 0, 'leaders': 1, 'followers': 4, 'timeouts': 0}
+
+
+def test_followers_see_the_leaders_exception():
+    group = SingleFlight(wait_timeout=5)
+    calls = []
+
+    def func():
+        calls.append(1)
+        wait_for_followers(group, 2)
+        raise Outage('api down')
+
+    outcomes = run_together(group, 3, func)
+
+    assert len(calls) == 1
+    assert [role for _, role in outcomes] == ['raised'] * 3
+    assert len({id(error) for error, _ in outcomes}) == 1
+
+
+def test_key_is_released_after_a_failure():
+    group = SingleFlight(wait_timeout=5)
+
+    def func():
+        raise Outage()
+
+    with pytest.raises(Outage):
+        group.do('key', func)
+
+    assert group.stats()['in_flight'] == 0
+    assert group.do('key', lambda: 'plan') == ('plan', 'leader')
+
+
+def test_follower_makes_its_own_call_after_wait_timeout():
+    group = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=('key', lambda: release.wait(5)))
+    leader.start()
+    while not group.stats()['in_flight']:
+        time.sleep(0.005)
+
+    try:
+        assert group.do('key', lambda: 'own plan') == ('own plan', 'timeout')
+    finally:
+        release.set()
+        leader.join(timeout=5)
+    assert group.stats()['timeouts'] == 1
+
+
+def test_async_followers_share_result_and_failure():
+    async def scenario():
+        group = AsyncSingleFlight(wait_timeout=5)
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'plan'
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise Outage()
+
+        shared = await asyncio.gather(*(group.do('key', func) for _ in range(3)))
+        failed = await asyncio.gather(*(group.do('other', failing) for _ in range(2)),
+                                      return_exceptions=True)
+        again = await group.do('other', func)
+        return calls, shared, failed, again, group.stats()
+
+    calls, shared, failed, again, stats = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert shared == [('plan', 'leader'), ('plan', 'follower'), ('plan', 'follower')]
+    assert all(isinstance(error, Outage) for error in failed)
+    assert again == ('plan', 'leader')
+    assert stats['in_flight'] == 0
@@ -0,0 +1,40 @@
+"""Tests that JSON plans score the same live and when stored debates are re-scored."""
+
+import json
+
+import app
+from batch_scoring import compare_many, record_to_text
+
+PLAN_A = {
+    'title': 'Passing under pressure',
+    'objectives': ['Pass accurately under pressure'],
+    'duration': 60,
+    'steps': [
+        {'name': 'Tag rush', 'duration': 10, 'tags': ['warmup'],
+         'instructions': 'Players jog and pass in a 20m grid.'},
+        {'name': 'Passing channels', 'duration': 40, 'equipment': ['cones', 'balls'],
+         'instructions': 'Three channels. Coaching point: hands early. Why did the gap close?'},
+        {'name': 'Stretch', 'duration': 10, 'tags': ['cooldown'], 'instructions': 'Light stretching.'}
+    ]
+}
+PLAN_B = {
+    'title': 'Conditioned touch',
+    'duration': 60,
+    'steps': [
+        {'name': 'Warm-up', 'duration': 15, 'instructions': 'Activation game, safe contact only.'},
+        {'name': 'Touch game', 'duration': 45, 'instructions': 'Teams play 6v6, score by passing.'}
+    ]
+}
+
+
+def test_live_comparison_matches_rescoring_stored_and_raw_plans():
+    results = [app.structure_result({'plan': json.dumps(plan)}, 60) for plan in (PLAN_A, PLAN_B)]
+    live = app.timed_compare_plans(results[0]['plan'], results[1]['plan'])
+
+    stored, = compare_many([('debate', results[0]['plan'], results[1]['plan'])], processes=1)
+    raw, = compare_many([('raw', record_to_text(PLAN_A), record_to_text(PLAN_B))], processes=1)
+
+    for rescored in (stored, raw):
+        assert rescored['winner'] == live['winner']
+        assert rescored['score_a'] == live['score_a']
+        assert rescored['score_b'] == live['score_b']